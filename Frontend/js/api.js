@@ -3,7 +3,7 @@ class API {
         this.baseUrl = baseUrl || window.CONFIG?.API_BASE_URL || 'https://your-backend-url.com/api';
     }
 
-    async request(endpoint, options = {}) {
+    async fetchRaw(endpoint, options = {}) {
         const initData = window.Telegram?.WebApp?.initData;
         
         const headers = {
@@ -35,13 +35,27 @@ class API {
                 throw new Error(errorMessage);
             }
 
-            return await response.json();
+            return response;
         } catch (error) {
             console.error('API Error:', error);
             throw error;
         }
     }
 
+    async request(endpoint, options = {}) {
+        const response = await this.fetchRaw(endpoint, options);
+        return await response.json();
+    }
+
+    // Списки с курсорной пагинацией: курсор следующей страницы приходит в заголовке
+    async requestPage(endpoint) {
+        const response = await this.fetchRaw(endpoint);
+        return {
+            items: await response.json(),
+            nextCursor: response.headers.get('X-Next-Cursor')
+        };
+    }
+
     // Matches
     async getMatches(filters = {}) {
         const params = new URLSearchParams();
@@ -53,6 +67,25 @@ class API {
         return this.request(endpoint);
     }
 
+    async getMatchesPage(filters = {}, cursor = null) {
+        const params = new URLSearchParams();
+        Object.entries(filters).forEach(([key, value]) => {
+            if (value) params.append(key, value);
+        });
+        if (cursor) params.append('cursor', cursor);
+        const queryString = params.toString();
+        return this.requestPage(queryString ? `/matches?${queryString}` : '/matches');
+    }
+
+    // Матчи в видимой области карты (bbox: "запад,юг,восток,север")
+    async getNearbyMatches(params = {}) {
+        const query = new URLSearchParams();
+        Object.entries(params).forEach(([key, value]) => {
+            if (value !== null && value !== undefined && value !== '') query.append(key, value);
+        });
+        return this.request(`/matches/nearby?${query.toString()}`);
+    }
+
     async getMatch(id) {
         return this.request(`/matches/${id}`);
     }
@@ -102,14 +135,17 @@ class API {
         return this.request(`/users/${id}`);
     }
 
-    async getUserMatches(userId, status = 'all') {
-        return this.request(`/users/${userId}/matches?status=${status}`);
+    async getUserMatchesPage(userId, status = 'all', cursor = null) {
+        const params = new URLSearchParams({ status });
+        if (cursor) params.append('cursor', cursor);
+        return this.requestPage(`/users/${userId}/matches?${params.toString()}`);
     }
 
     // Leaderboard
-    async getLeaderboard(limit = 100, offset = 0) {
+    async getLeaderboard(limit = 100, offset = 0, cursor = null) {
         try {
-            return await this.request(`/leaderboard?limit=${limit}&offset=${offset}`);
+            const page = cursor ? `cursor=${encodeURIComponent(cursor)}` : `offset=${offset}`;
+            return await this.request(`/leaderboard?limit=${limit}&${page}`);
         } catch (error) {
             // Мок данные для разработки
             console.warn('Using mock leaderboard data');
@@ -122,7 +158,8 @@ class API {
                     { rank: 5, name: 'Далер', wins: 17, win_rate: 74, rating: 32 },
                 ],
                 current_user: { name: 'Вы', matches: 15, rating: 28 },
-                current_user_rank: 8
+                current_user_rank: 8,
+                next_cursor: null
             };
         }
     }
@@ -131,6 +168,34 @@ class API {
     async getCities() {
         return this.request('/matches/cities/list');
     }
+
+    // Live updates (Server-Sent Events). EventSource не умеет слать заголовки,
+    // поэтому initData передаем в параметре запроса
+    subscribe(endpoint, onEvent) {
+        const initData = window.Telegram?.WebApp?.initData;
+        const separator = endpoint.includes('?') ? '&' : '?';
+        const url = initData
+            ? `${this.baseUrl}${endpoint}${separator}init_data=${encodeURIComponent(initData)}`
+            : `${this.baseUrl}${endpoint}`;
+
+        const source = new EventSource(url);
+        source.onmessage = (message) => {
+            try {
+                onEvent(JSON.parse(message.data));
+            } catch (error) {
+                console.error('Bad event:', error);
+            }
+        };
+        return () => source.close();
+    }
+
+    subscribeMatch(matchId, onEvent) {
+        return this.subscribe(`/matches/${matchId}/events`, onEvent);
+    }
+
+    subscribeCity(city, onEvent) {
+        return this.subscribe(`/matches/feed?city=${encodeURIComponent(city)}`, onEvent);
+    }
 }
 
 // Создаем глобальный экземпляр API
@@ -1,119 +1,265 @@
 from fastapi import Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 import hmac
 import hashlib
 import json
+import time
+from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
-from app.database import get_db
+from urllib.parse import parse_qsl
+from app.cache import LEADERBOARD_TAG, TTLCache, response_cache, user_tag
+from app.database import SessionLocal, get_db
 from app.models import User
 from app.config import settings
+from app.ranking import ranking, entry_from_row
+from app.state import state
+
+
+# Telegram Mini Apps sign initData with HMAC-SHA256 keyed by
+# HMAC-SHA256("WebAppData", bot_token); derive it once, not per request
+_SECRET_KEY = hmac.new(b"WebAppData", settings.BOT_TOKEN.encode(), hashlib.sha256).digest()
+
+# initData digest -> user id, and user id -> snapshot. Splitting the two
+# lets a profile/rating change drop one snapshot without touching sessions.
+_verified_sessions = TTLCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+_user_snapshots = TTLCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+
+PROFILE_FIELDS = ("username", "first_name", "photo_url")
+INVALIDATE_CHANNEL = "auth:invalidate"
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Read-only snapshot of the authenticated user, safe to share between requests"""
+    id: int
+    telegram_id: int
+    username: Optional[str]
+    first_name: str
+    photo_url: Optional[str]
+    rating: int
+    matches_played: int
+    wins: int
+    losses: int
+    created_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            telegram_id=user.telegram_id,
+            username=user.username,
+            first_name=user.first_name,
+            photo_url=user.photo_url,
+            rating=user.rating or 0,
+            matches_played=user.matches_played or 0,
+            wins=user.wins or 0,
+            losses=user.losses or 0,
+            created_at=user.created_at
+        )
+
+
+def invalidate_user(user_id: int):
+    """Forget the cached snapshot after the user's row changed, in every worker"""
+    _user_snapshots.pop(user_id)
+    if state.shared:
+        state.publish_nowait(INVALIDATE_CHANNEL, str(user_id))
+
+
+def follow_invalidations():
+    """Drop snapshots other workers invalidate; all of them after a pub/sub gap
+
+    Verified sessions are not shared: they only map a signed initData to
+    its user id, which is the same in every worker.
+    """
+    state.subscribe(INVALIDATE_CHANNEL, lambda user_id: _user_snapshots.pop(int(user_id)), include_own=False)
+    state.on_reconnect(_user_snapshots.clear)
+
+
+def _session_key(init_data: str) -> bytes:
+    return hashlib.blake2b(init_data.encode(), digest_size=16).digest()
 
 
 async def verify_telegram_auth(init_data: str) -> Optional[dict]:
     """Verify Telegram WebApp init data"""
     try:
-        # Parse data
-        data = {}
-        for item in init_data.split('&'):
-            if '=' in item:
-                key, value = item.split('=', 1)
-                data[key] = value
-
-        if 'hash' not in data:
-            return None
+        data = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=True))
+    except ValueError:
+        return None
 
-        hash_value = data['hash']
-        data_check_string = '\n'.join(f"{k}={v}" for k, v in sorted(data.items()) if k != 'hash')
+    hash_value = data.pop('hash', None)
+    if not hash_value:
+        return None
 
-        # Create secret key
-        secret_key = hashlib.sha256(settings.BOT_TOKEN.encode()).digest()
+    data_check_string = '\n'.join(f"{k}={v}" for k, v in sorted(data.items()))
+    calculated_hash = hmac.new(
+        _SECRET_KEY,
+        data_check_string.encode(),
+        hashlib.sha256
+    ).hexdigest()
 
-        # Calculate hash
-        calculated_hash = hmac.new(
-            secret_key,
-            data_check_string.encode(),
-            hashlib.sha256
-        ).hexdigest()
+    if not hmac.compare_digest(calculated_hash, hash_value):
+        return None
 
-        if calculated_hash != hash_value:
+    if settings.AUTH_MAX_AGE:
+        try:
+            auth_date = int(data.get('auth_date', 0))
+        except ValueError:
             return None
+        if time.time() - auth_date > settings.AUTH_MAX_AGE:
+            return None
+        data['auth_date'] = auth_date
 
-        # Parse user data
-        if 'user' in data:
-            try:
-                user_data = json.loads(data['user'])
-                return user_data
-            except:
-                return None
-
+    # Parse user data
+    try:
+        user_data = json.loads(data['user'])
+    except (KeyError, ValueError):
         return None
-    except Exception as e:
-        print(f"Auth error: {e}")
+    if not isinstance(user_data, dict) or 'id' not in user_data:
         return None
 
+    user_data['auth_date'] = data.get('auth_date')
+    return user_data
+
+
+async def verified_telegram_id(init_data: Optional[str]) -> Optional[int]:
+    """Telegram id behind ``init_data``, or None if it does not verify
+
+    Never touches the database: a warm session comes from the caches,
+    anything else is checked with the HMAC alone.
+    """
+    if not init_data:
+        return None
+    user_id = _verified_sessions.get(_session_key(init_data))
+    if user_id is not None:
+        snapshot = _user_snapshots.get(user_id)
+        if snapshot is not None:
+            return snapshot.telegram_id
+    user_data = await verify_telegram_auth(init_data)
+    return user_data['id'] if user_data else None
+
+
+async def _get_test_user(db: AsyncSession) -> User:
+    # Тестовый пользователь для разработки
+    user = (await db.execute(select(User).where(User.telegram_id == 123456789))).scalar_one_or_none()
+    if not user:
+        user = User(
+            telegram_id=123456789,
+            username="test_user",
+            first_name="Тестовый",
+            photo_url=None
+        )
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        ranking.update(entry_from_row(user))
+        await response_cache.invalidate(LEADERBOARD_TAG)
+    return user
+
+
+async def _find_user(db: AsyncSession, telegram_id: int) -> Optional[User]:
+    return (await db.execute(select(User).where(User.telegram_id == telegram_id))).scalar_one_or_none()
+
+
+async def _get_or_create_user(db: AsyncSession, user_data: dict) -> User:
+    user = await _find_user(db, user_data['id'])
+
+    if not user:
+        # A new user's first requests can reach several workers at once;
+        # only one of them may insert the row
+        async with state.lock(f"new-user:{user_data['id']}", ttl=10, timeout=5):
+            user = await _find_user(db, user_data['id'])
+            if not user:
+                user = User(
+                    telegram_id=user_data['id'],
+                    username=user_data.get('username'),
+                    first_name=user_data.get('first_name', ''),
+                    photo_url=user_data.get('photo_url')
+                )
+                db.add(user)
+                await db.commit()
+                await db.refresh(user)
+                ranking.update(entry_from_row(user))
+                await response_cache.invalidate(LEADERBOARD_TAG)
+                return user
+
+    # Keep the profile in sync with what Telegram reports
+    changes = {
+        field: user_data[field]
+        for field in PROFILE_FIELDS
+        if field in user_data and user_data[field] != getattr(user, field)
+    }
+    if changes:
+        await db.execute(update(User).where(User.id == user.id).values(**changes))
+        await db.commit()
+        await db.refresh(user)
+        invalidate_user(user.id)
+        ranking.update(entry_from_row(user))
+        await response_cache.invalidate(LEADERBOARD_TAG, user_tag(user.id))
+    return user
+
 
 async def get_current_user(
         request: Request,
-        db: Session = Depends(get_db)
-) -> User:
+        db: AsyncSession = Depends(get_db)
+) -> CurrentUser:
     """Get current user from Telegram init data"""
-    init_data = request.headers.get('X-Telegram-Init-Data')
+    return await authenticate(request.headers.get('X-Telegram-Init-Data'), db)
+
 
+async def get_stream_user(request: Request) -> CurrentUser:
+    """Authenticate a long-lived event stream
+
+    EventSource cannot set headers, so initData may also come as
+    ``?init_data=``. The session is closed before streaming starts so a
+    subscriber never pins a pooled connection.
+    """
+    init_data = request.headers.get('X-Telegram-Init-Data') or request.query_params.get('init_data')
+    async with SessionLocal() as db:
+        return await authenticate(init_data, db)
+
+
+async def authenticate(init_data: Optional[str], db: AsyncSession) -> CurrentUser:
     if not init_data:
         # Для разработки возвращаем тестового пользователя
         if settings.DEBUG:
-            user = db.query(User).filter(User.telegram_id == 123456789).first()
-            if not user:
-                user = User(
-                    telegram_id=123456789,
-                    username="test_user",
-                    first_name="Тестовый",
-                    photo_url=None
-                )
-                db.add(user)
-                db.commit()
-                db.refresh(user)
-            return user
+            return CurrentUser.from_user(await _get_test_user(db))
 
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Missing authentication data"
         )
 
+    # Repeated requests from the same Mini App session skip the HMAC
+    session_key = _session_key(init_data)
+    user_id = _verified_sessions.get(session_key)
+    if user_id is not None:
+        snapshot = _user_snapshots.get(user_id)
+        if snapshot is None:
+            user = await db.get(User, user_id)
+            if user:
+                snapshot = CurrentUser.from_user(user)
+                _user_snapshots.set(user_id, snapshot)
+        if snapshot is not None:
+            return snapshot
+
     user_data = await verify_telegram_auth(init_data)
 
-    if not user_data and not settings.DEBUG:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication data"
-        )
+    if not user_data:
+        if not settings.DEBUG:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication data"
+            )
+        return CurrentUser.from_user(await _get_test_user(db))
 
-    # Get or create user
-    if user_data:
-        user = db.query(User).filter(User.telegram_id == user_data['id']).first()
+    snapshot = CurrentUser.from_user(await _get_or_create_user(db, user_data))
 
-        if not user:
-            user = User(
-                telegram_id=user_data['id'],
-                username=user_data.get('username'),
-                first_name=user_data.get('first_name', ''),
-                photo_url=user_data.get('photo_url')
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-    else:
-        # Тестовый пользователь для разработки
-        user = db.query(User).filter(User.telegram_id == 123456789).first()
-        if not user:
-            user = User(
-                telegram_id=123456789,
-                username="test_user",
-                first_name="Тестовый",
-                photo_url=None
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
+    ttl = None
+    if settings.AUTH_MAX_AGE and user_data.get('auth_date'):
+        ttl = max(user_data['auth_date'] + settings.AUTH_MAX_AGE - time.time(), 0)
+    _verified_sessions.set(session_key, snapshot.id, ttl)
+    _user_snapshots.set(snapshot.id, snapshot)
 
-    return user
\ No newline at end of file
+    return snapshot
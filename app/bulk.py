@@ -0,0 +1,318 @@
+import csv
+import io
+import json
+import random
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, Table, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app import geo
+from app.config import settings
+from app.models import Match, MatchPlayer, User
+from app.serialization import dumps
+
+# Tables in foreign key order: import walks it forwards
+TABLES: Dict[str, Table] = {
+    "users": User.__table__,
+    "matches": Match.__table__,
+    "match_players": MatchPlayer.__table__,
+}
+FILE_FORMATS = ("csv", "jsonl")
+CHUNK_SIZE = 10_000
+
+Row = Dict[str, Any]
+
+
+class BulkError(ValueError):
+    pass
+
+
+def table(name: str) -> Table:
+    if name not in TABLES:
+        raise BulkError(f"Unknown table {name!r}, expected one of {', '.join(TABLES)}")
+    return TABLES[name]
+
+
+def chunked(rows: Iterable, size: int = CHUNK_SIZE) -> Iterator[list]:
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+async def _asyncpg(conn: AsyncConnection):
+    """The asyncpg connection behind ``conn``, or None on other drivers"""
+    if conn.dialect.driver != "asyncpg":
+        return None
+    return (await conn.get_raw_connection()).driver_connection
+
+
+# Encoding -----------------------------------------------------------------
+# CSV has no NULL: None is written as an empty field and read back as
+# None, so an empty string does not survive a CSV round trip
+
+def _parser(column) -> Callable[[Any], Any]:
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat
+    if isinstance(column.type, Boolean):
+        return lambda value: value if isinstance(value, bool) else value.lower() in ("1", "t", "true")
+    if isinstance(column.type, Integer):
+        return int
+    if isinstance(column.type, Float):
+        return float
+    return str
+
+
+def parse_row(tbl: Table, row: Row) -> Row:
+    """Column values from CSV strings or JSON scalars; unknown keys are dropped"""
+    parsed = {}
+    for column in tbl.columns:
+        if column.name not in row:
+            continue
+        value = row[column.name]
+        parsed[column.name] = None if value is None or value == "" else _parser(column)(value)
+    return parsed
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class RowWriter:
+    """Writes rows of one table to a binary stream as CSV or JSON lines"""
+
+    def __init__(self, out: BinaryIO, tbl: Table, file_format: str):
+        if file_format not in FILE_FORMATS:
+            raise BulkError(f"Unknown format {file_format!r}")
+        self.out = out
+        self.columns = list(tbl.columns.keys())
+        self.file_format = file_format
+        self.count = 0
+        if file_format == "csv":
+            self._write_csv([self.columns])
+
+    def _write_csv(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+        self.out.write(buffer.getvalue().encode())
+
+    def write(self, rows: List[Row]):
+        if self.file_format == "csv":
+            self._write_csv([[_csv_value(row.get(c)) for c in self.columns] for row in rows])
+        else:
+            self.out.write(b"".join(dumps({c: row.get(c) for c in self.columns}) + b"\n" for row in rows))
+        self.count += len(rows)
+
+
+def read_rows(source: BinaryIO, tbl: Table, file_format: str) -> Iterator[Row]:
+    """Parsed rows from a CSV (with header) or JSON lines stream, one at a time"""
+    stream = io.TextIOWrapper(source, encoding="utf-8", newline="")
+    if file_format == "csv":
+        rows = csv.DictReader(stream)
+    elif file_format == "jsonl":
+        rows = (json.loads(line) for line in stream if line.strip())
+    else:
+        raise BulkError(f"Unknown format {file_format!r}")
+    for row in rows:
+        yield parse_row(tbl, row)
+
+
+# Database -----------------------------------------------------------------
+
+async def export_table(conn: AsyncConnection, name: str, out: BinaryIO, file_format: str,
+                       chunk_size: int = CHUNK_SIZE) -> int:
+    """Stream a whole table to ``out`` in primary key order; returns rows written
+
+    CSV from PostgreSQL goes through COPY TO; everything else is a
+    server-side cursor read ``chunk_size`` rows at a time.
+    """
+    tbl = table(name)
+    pg = await _asyncpg(conn)
+    if pg is not None and file_format == "csv":
+        columns = list(tbl.columns.keys())
+        await pg.copy_from_query(
+            f"SELECT {', '.join(columns)} FROM {tbl.name} ORDER BY id",
+            output=out, format="csv", header=True
+        )
+        return (await conn.execute(select(func.count()).select_from(tbl))).scalar()
+
+    writer = RowWriter(out, tbl, file_format)
+    result = await conn.stream(select(tbl).order_by(tbl.c.id).execution_options(yield_per=chunk_size))
+    async for partition in result.mappings().partitions():
+        writer.write(partition)
+    return writer.count
+
+
+async def load_rows(conn: AsyncConnection, name: str, chunks: Iterable[List[Row]]) -> int:
+    """Insert chunks of rows, committing after each; returns rows inserted
+
+    PostgreSQL gets binary COPY (copy_records_to_table), other databases
+    one executemany INSERT per chunk. Rows carry their ids.
+    """
+    tbl = table(name)
+    pg = await _asyncpg(conn)
+    total = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if pg is not None:
+            columns = list(chunk[0])
+            await pg.copy_records_to_table(
+                tbl.name, columns=columns, records=[tuple(row.get(c) for c in columns) for row in chunk]
+            )
+        else:
+            await conn.execute(insert(tbl), chunk)
+        await conn.commit()
+        total += len(chunk)
+    return total
+
+
+async def import_table(conn: AsyncConnection, name: str, source: BinaryIO, file_format: str,
+                       chunk_size: int = CHUNK_SIZE) -> int:
+    """Load a CSV/JSONL export into ``name``; memory is bounded by ``chunk_size``"""
+    return await load_rows(conn, name, chunked(read_rows(source, table(name), file_format), chunk_size))
+
+
+async def reset_sequences(conn: AsyncConnection, names: Iterable[str]):
+    """Move PostgreSQL id sequences past imported ids so new rows do not collide"""
+    if conn.dialect.name != "postgresql":
+        return
+    for name in names:
+        tbl = table(name)
+        await conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{tbl.name}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {tbl.name}), 0) + 1, false)"
+        ))
+    await conn.commit()
+
+
+# Synthetic data -----------------------------------------------------------
+
+FORMATS = {"5x5": 10, "7x7": 14, "11x11": 22}
+FORMAT_WEIGHTS = (6, 3, 1)  # small-sided games are most common
+FIRST_NAMES = (
+    "Фаррух", "Рустам", "Бахтиёр", "Шерзод", "Далер", "Сухроб", "Умед", "Джамшед",
+    "Фируз", "Мехрон", "Исмоил", "Парвиз", "Комрон", "Алишер", "Бехруз", "Шахром",
+)
+KICKOFF_HOURS = (7, 8, 9, 16, 17, 18, 19, 20, 21)
+
+
+class Generator:
+    """Deterministic synthetic users, matches and rosters, produced in chunks
+
+    Matches are spread over ``history_days`` before now and ``ahead_days``
+    after it, at pitches clustered around the city centre with a few in
+    outlying villages. Players are drawn with a power-law skew so a core
+    of regulars plays most games. Nothing is kept per user or per match,
+    so memory stays constant at any size.
+    """
+
+    def __init__(self, users: int, matches: int, seed: int = 42, history_days: int = 365,
+                 ahead_days: int = 14, pitches: int = 40, now: Optional[datetime] = None):
+        if users < 1:
+            raise BulkError("Need at least one user")
+        self.users = users
+        self.matches = matches
+        self.seed = seed
+        self.history_days = history_days
+        self.ahead_days = ahead_days
+        self.now = now or datetime.utcnow()
+        rnd = random.Random(seed)
+        self.pitches = [self._pitch(rnd, i) for i in range(pitches)]
+
+    @staticmethod
+    def _pitch(rnd: random.Random, index: int) -> Tuple[str, float, float]:
+        # ~3 km around the centre, every fifth pitch out in the villages
+        spread = 0.12 if index % 5 == 4 else 0.025
+        lat = settings.DEFAULT_LAT + rnd.gauss(0, spread)
+        lon = settings.DEFAULT_LON + rnd.gauss(0, spread * 1.3)
+        return f"Поле {index + 1}", lat, lon
+
+    def user_rows(self) -> Iterator[Row]:
+        rnd = random.Random(self.seed + 1)
+        for user_id in range(1, self.users + 1):
+            yield {
+                "id": user_id,
+                "telegram_id": 100_000_000 + user_id,
+                "username": f"player{user_id}" if rnd.random() < 0.7 else None,
+                "first_name": rnd.choice(FIRST_NAMES),
+                "photo_url": None,
+                "rating": int(rnd.gauss(settings.RATING_INITIAL, 120)),
+                "matches_played": 0,
+                "wins": 0,
+                "losses": 0,
+                "created_at": self.now - timedelta(days=rnd.uniform(0, self.history_days + 30)),
+            }
+
+    def _roster(self, rnd: random.Random, size: int) -> List[int]:
+        if 2 * size >= self.users:
+            return rnd.sample(range(1, self.users + 1), min(size, self.users))
+        chosen = set()
+        while len(chosen) < size:
+            # u**2 puts low ids (the regulars) in far more games
+            chosen.add(int(self.users * rnd.random() ** 2) + 1)
+        return list(chosen)
+
+    def match_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[List[Row], List[Row]]]:
+        """(matches, match_players) per chunk of ``chunk_size`` matches"""
+        rnd = random.Random(self.seed + 2)
+        span = timedelta(days=self.history_days + self.ahead_days)
+        start = self.now - timedelta(days=self.history_days)
+        over_before = self.now - timedelta(minutes=settings.MATCH_DURATION_MINUTES)
+        player_id = 0
+        for first in range(0, self.matches, chunk_size):
+            matches, players = [], []
+            for match_id in range(first + 1, min(first + chunk_size, self.matches) + 1):
+                fmt = rnd.choices(list(FORMATS), FORMAT_WEIGHTS)[0]
+                max_players = FORMATS[fmt]
+                day = start + span * (match_id - 1) / max(self.matches, 1)
+                when = day.replace(hour=rnd.choice(KICKOFF_HOURS), minute=rnd.choice((0, 30)),
+                                   second=0, microsecond=0)
+                past = when < over_before
+                # Past games mostly filled up; upcoming ones fill as they near
+                if past:
+                    count = max_players if rnd.random() < 0.75 else rnd.randint(1, max_players)
+                else:
+                    closeness = 1 - min((when - self.now) / timedelta(days=self.ahead_days or 1), 1)
+                    count = max(1, min(max_players, round(rnd.betavariate(1 + 4 * closeness, 2) * max_players)))
+                roster = self._roster(rnd, count)
+                count = len(roster)
+                if past:
+                    status = "finished" if count >= 2 else "cancelled"
+                else:
+                    status = "full" if count >= max_players else "open"
+
+                name, lat, lon = rnd.choice(self.pitches)
+                matches.append({
+                    "id": match_id,
+                    "title": f"{fmt} на {name}",
+                    "stadium": name,
+                    "city": settings.DEFAULT_CITY,
+                    "date_time": when,
+                    "format": fmt,
+                    "max_players": max_players,
+                    "players_count": count,
+                    "status": status,
+                    "created_by": roster[0],
+                    "latitude": lat,
+                    "longitude": lon,
+                    "geohash": geo.encode(lat, lon),
+                    "created_at": when - timedelta(days=rnd.uniform(0.5, 7)),
+                })
+                teamed = count >= max_players or status == "finished"
+                for i, user_id in enumerate(roster):
+                    player_id += 1
+                    players.append({
+                        "id": player_id,
+                        "match_id": match_id,
+                        "user_id": user_id,
+                        "team": ("A", "B")[i % 2] if teamed else None,
+                        "joined_at": min(when, matches[-1]["created_at"] + timedelta(minutes=5 * (i + 1))),
+                    })
+            yield matches, players
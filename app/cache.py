@@ -0,0 +1,305 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, NamedTuple, Optional, Set, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+from app.config import settings
+from app.metrics import REGISTRY
+from app.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries also expire after a time-to-live"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Tuple[Tuple[str, str], ...]
+
+
+class LocalResponseStore:
+    """In-process LRU of serialized responses with a tag -> keys index
+
+    Stores count invalidations in a generation: ``get`` returns the
+    current one and ``set`` drops a response built before a later
+    invalidation, which may hold data that was already replaced.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[CachedResponse, FrozenSet[str]]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._generation = 0
+
+    async def get(self, key: str) -> Tuple[Optional[CachedResponse], int]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, self._generation
+        self._entries.move_to_end(key)
+        return entry[0], self._generation
+
+    async def set(self, key: str, response: CachedResponse, tags: Iterable[str], generation: int):
+        if generation != self._generation:
+            return
+        tags = frozenset(tags)
+        self._discard(key)
+        self._entries[key] = (response, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._discard(next(iter(self._entries)))
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        self._generation += 1
+        removed = 0
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                removed += self._discard(key)
+        return removed
+
+    async def clear(self):
+        self._generation += 1
+        self._entries.clear()
+        self._tags.clear()
+
+    def _discard(self, key: str) -> int:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return 0
+        for tag in entry[1]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return 1
+
+
+class SharedResponseStore:
+    """Responses in the shared state, so all workers serve and drop the same entries
+
+    An entry lives under ``cache:<key>`` and each tag is a set of entry
+    keys; the generation is a shared counter. Entries and tag sets
+    expire after ``ttl``, which also bounds how stale an entry can get
+    if an invalidation fails to reach the state.
+    """
+
+    GENERATION = "cache:generation"
+
+    def __init__(self, state, ttl: float):
+        self.state = state
+        self.ttl = ttl
+
+    @staticmethod
+    def _pack(response: CachedResponse) -> bytes:
+        head = json.dumps([response.etag, response.headers], separators=(",", ":")).encode()
+        return head + b"\n" + response.body
+
+    @staticmethod
+    def _unpack(raw: bytes) -> CachedResponse:
+        head, _, body = raw.partition(b"\n")
+        etag, headers = json.loads(head)
+        return CachedResponse(body, etag, tuple(map(tuple, headers)))
+
+    async def get(self, key: str) -> Tuple[Optional[CachedResponse], int]:
+        generation, raw = await self.state.mget(self.GENERATION, f"cache:{key}")
+        return (self._unpack(raw) if raw is not None else None), int(generation or 0)
+
+    async def set(self, key: str, response: CachedResponse, tags: Iterable[str], generation: int):
+        # Checked just before writing: narrows, but does not close, the
+        # window for a concurrent invalidation on another worker
+        if int(await self.state.get(self.GENERATION) or 0) != generation:
+            return
+        entry_key = f"cache:{key}"
+        await asyncio.gather(
+            self.state.set(entry_key, self._pack(response), ttl=self.ttl),
+            *(self.state.sadd(f"tag:{tag}", entry_key, ttl=self.ttl) for tag in tags)
+        )
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        tags = list(tags)
+        await self.state.incr(self.GENERATION)
+        members = await asyncio.gather(*(self.state.smembers(f"tag:{tag}") for tag in tags))
+        keys = set().union(*members)
+        await self.state.delete(*keys, *(f"tag:{tag}" for tag in tags))
+        return len(keys)
+
+    async def clear(self):
+        # Nothing to enumerate entries by: stop pending stores, let the TTL do the rest
+        await self.state.incr(self.GENERATION)
+
+
+LEADERBOARD_TAG = "leaderboard"
+
+
+def matches_tag(city: Optional[str] = None) -> str:
+    """Match lists of one city; ``None`` for lists spanning all cities"""
+    return f"matches:city:{city}" if city else "matches:all"
+
+
+def match_tag(match_id: int) -> str:
+    return f"match:{match_id}"
+
+
+def user_tag(user_id: int) -> str:
+    """Responses that embed this user's profile or rating"""
+    return f"user:{user_id}"
+
+
+CACHE_REQUESTS = REGISTRY.counter(
+    "response_cache_requests_total", "Cacheable requests by route and outcome", ("route", "result")
+)
+CACHE_INVALIDATIONS = REGISTRY.counter(
+    "response_cache_invalidations_total", "Cache entries dropped by write paths", ("tag",)
+)
+
+
+class ResponseCache:
+    """Serialized GET responses keyed by route + normalized query, with strong ETags
+
+    Entries are never expired by time: the write paths call ``invalidate``
+    with the tags they touched. The store's generation makes sure a
+    response built from data read before an invalidation is not stored
+    after it.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or LocalResponseStore(settings.RESPONSE_CACHE_SIZE)
+
+    def set_store(self, store):
+        self.store = store
+
+    @staticmethod
+    def key(request: Request, vary: Any = None) -> str:
+        query = urlencode(sorted(request.query_params.multi_items()))
+        return f"{request.url.path}?{query}|{vary if vary is not None else ''}"
+
+    @staticmethod
+    def _route(request: Request) -> str:
+        endpoint = request.scope.get("endpoint")
+        return getattr(endpoint, "__name__", request.url.path)
+
+    async def lookup(self, request: Request, vary: Any = None) -> Optional[Response]:
+        """Cached response (200 or 304) for this request, or None on a miss"""
+        route = self._route(request)
+        try:
+            cached, request.state.cache_generation = await self.store.get(self.key(request, vary))
+        except Exception:
+            logger.exception("Response cache lookup failed")
+            cached = None
+        if cached is None:
+            CACHE_REQUESTS.inc(route=route, result="miss")
+            return None
+        not_modified = _etag_matches(request, cached.etag)
+        CACHE_REQUESTS.inc(route=route, result="not_modified" if not_modified else "hit")
+        return _to_response(cached, not_modified)
+
+    async def store_response(
+            self,
+            request: Request,
+            content: Any,
+            tags: Iterable[str],
+            vary: Any = None,
+            headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        """Serialize ``content``, cache it under ``tags`` and answer the request"""
+        body = dumps(content)
+        cached = CachedResponse(
+            body=body,
+            etag='"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"',
+            headers=tuple((headers or {}).items())
+        )
+        generation = getattr(request.state, "cache_generation", None)
+        if generation is not None:
+            try:
+                await self.store.set(self.key(request, vary), cached, tags, generation)
+            except Exception:
+                logger.exception("Response cache store failed")
+        return _to_response(cached, _etag_matches(request, cached.etag))
+
+    async def invalidate(self, *tags: str):
+        try:
+            removed = await self.store.invalidate(tags)
+        except Exception:
+            logger.exception("Response cache invalidation failed")
+            try:
+                await self.store.clear()
+            except Exception:
+                # The write itself succeeded; shared entries expire on their own
+                logger.exception("Response cache clear failed")
+            return
+        if removed:
+            for tag in tags:
+                CACHE_INVALIDATIONS.inc(tag=tag.split(":", 1)[0])
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {value.strip() for value in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _to_response(cached: CachedResponse, not_modified: bool) -> Response:
+    headers = dict(cached.headers)
+    headers["ETag"] = cached.etag
+    # Responses depend on the Telegram user; let clients revalidate cheaply
+    headers["Cache-Control"] = "private, no-cache"
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache()
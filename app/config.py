@@ -9,14 +9,86 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = "sqlite:///./dribbling.db"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10.0  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 5000  # 0 disables the timeout
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    DB_POOL_WARM: int = 5  # connections opened at startup, capped at DB_POOL_SIZE
+
+    # Shared state between workers (app/state.py); unset keeps it in-process
+    REDIS_URL: Optional[str] = None
+    REDIS_MAX_CONNECTIONS: int = 50
+    STATE_PREFIX: str = "dribbling:"
+    STATE_TIMEOUT: float = 1.0  # seconds per shared-state operation
+    SHARED_CACHE_TTL: int = 300  # seconds a shared cached response lives, bounding staleness
 
     # Telegram
     BOT_TOKEN: str
     WEBAPP_URL: str
 
+    AUTH_MAX_AGE: int = 86400  # seconds an initData auth_date stays valid, 0 disables
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL: int = 300
+    RESPONSE_CACHE_SIZE: int = 2000
+
+    # Rate limits per Telegram user (app/limits.py): requests per minute,
+    # with RATE_LIMIT_BURST of them allowed back to back
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_JOIN: float = 20  # join and leave
+    RATE_LIMIT_WRITE: float = 10  # create a match, balance teams, report a result
+    RATE_LIMIT_HISTORY: float = 60  # pages of GET /users/{id}/matches
+    RATE_LIMIT_BURST: int = 5
+
+    # Load shedding: answer 503 instead of queueing once either is crossed; 0 disables
+    ADMISSION_MAX_IN_FLIGHT: int = 200  # requests in this worker that have not started answering
+    ADMISSION_MAX_POOL_WAIT_MS: float = 1000  # how long the oldest request has waited for a database connection
+    ADMISSION_RETRY_AFTER: int = 1  # seconds, sent as Retry-After
+
+    # Instrumentation
+    N_PLUS_ONE_THRESHOLD: int = 5  # one statement this often in a request is logged as N+1
+    SLOW_REQUEST_MS: float = 500
+    SLOW_REQUEST_SAMPLE_RATE: float = 0.1
+    SLOW_REQUEST_DIR: Optional[str] = None  # where sampled slow-request profiles go; None disables
+
     # Security
     SECRET_KEY: str = "your-secret-key-here"
 
+    # Rating (team Elo)
+    RATING_INITIAL: int = 1000
+    RATING_K_FACTOR: int = 32
+
+    # Teams
+    AUTO_BALANCE_TEAMS: bool = True  # split the roster into A/B once a match is full
+    TEAM_BALANCE_BUDGET_MS: float = 50
+
+    # Background jobs
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_TICK_SECONDS: float = 5.0
+    SCHEDULER_LEASE_SECONDS: int = 600  # a crashed worker's job is retried after this
+    MATCH_DURATION_MINUTES: int = 120  # date_time (UTC) + this = when a match is over
+    MATCH_CLOSE_BATCH: int = 500
+    RANKING_REFRESH_SECONDS: int = 900
+    RANKING_PRELOAD: bool = True  # load the leaderboard in the background at startup
+    ARCHIVE_AFTER_DAYS: int = 90  # finished/cancelled matches older than this go to *_archive
+    ARCHIVE_BATCH: int = 1000
+    ARCHIVE_INTERVAL_SECONDS: int = 3600
+
+    # Bot notifications
+    NOTIFICATIONS_ENABLED: bool = True
+    TELEGRAM_API_URL: str = "https://api.telegram.org"  # a fake Bot API server in tests
+    NOTIFY_GLOBAL_RATE: float = 25  # messages per second; Telegram allows about 30 per bot
+    NOTIFY_CHAT_INTERVAL: float = 1.0  # seconds between two messages to one chat
+    NOTIFY_QUEUE_SIZE: int = 50000
+    NOTIFY_BATCH_SIZE: int = 200
+    NOTIFY_CONCURRENCY: int = 50  # sendMessage calls in flight
+    NOTIFY_MAX_RETRIES: int = 5
+    NOTIFY_DEDUP_TTL: int = 3600
+    REMINDER_LEAD_MINUTES: int = 60
+    REMINDER_BATCH: int = 1000
+
     # Cities
     CITIES: List[str] = [
         "Пенджикент",
@@ -27,6 +99,12 @@ class Settings(BaseSettings):
     DEFAULT_CITY: str = "Пенджикент"
     DEFAULT_LAT: float = 39.4952
     DEFAULT_LON: float = 67.6093
+    TIMEZONE: str = "Asia/Dushanbe"  # match times are stored in UTC, shown to players in this zone
+
+    # Nearby search: bounds on the area a match-by-match search reads;
+    # wider viewports get 400 and must ask for clusters
+    NEARBY_MAX_SPAN_DEG: float = 2.0
+    NEARBY_MAX_RADIUS_KM: float = 100.0
 
     class Config:
         env_file = ".env"
@@ -1,24 +1,211 @@
-from sqlalchemy import create_engine
+import asyncio
+import itertools
+import time
+from typing import Dict
+from sqlalchemy import event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from app.config import settings
+from app.metrics import REGISTRY
+from app.instrumentation import instrument_engine
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    path = url.split("://", 1)[1]
+    return path in ("", "/", "/:memory:") or "mode=memory" in path
+
+
+def engine_options(url: str) -> dict:
+    """Pool and driver keyword arguments for create_engine / create_async_engine"""
+    if url.startswith("sqlite"):
+        if _is_memory_sqlite(url):
+            # A pool would hand out separate, empty in-memory databases
+            return {"poolclass": StaticPool}
+        options = {"connect_args": {"timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000}}
+        if "+aiosqlite" in url:
+            # aiosqlite defaults to NullPool, which reopens the file and
+            # re-runs the pragmas for every session
+            options["poolclass"] = MeteredQueuePool
+    else:
+        options = {"connect_args": _statement_timeout_args(url)}
+        if "+asyncpg" in url:
+            options["poolclass"] = MeteredQueuePool
+
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    return options
+
+
+def _statement_timeout_args(url: str) -> dict:
+    timeout = settings.DB_STATEMENT_TIMEOUT_MS
+    if not timeout or not url.startswith("postgres"):
+        return {}
+    if "+asyncpg" in url:
+        return {"server_settings": {"statement_timeout": str(timeout)}}
+    return {"options": f"-c statement_timeout={timeout}"}
+
+
+def tune_engine(sync_engine):
+    """Attach SQLite pragmas, pool metrics and per-request query accounting to an engine"""
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _sqlite_pragmas)
+    instrument_engine(sync_engine)
+
+    event.listen(sync_engine, "checkout", _on_checkout)
+    event.listen(sync_engine, "checkin", _on_checkin)
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers proceed while a join/leave transaction is writing
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-20000")
+    cursor.close()
+
+
+POOL_WAIT = REGISTRY.histogram(
+    "db_pool_wait_seconds", "Time spent waiting to check out a database connection"
+)
+POOL_CHECKOUT = REGISTRY.histogram(
+    "db_pool_checkout_seconds", "Time a database connection stayed checked out of the pool"
+)
+POOL_TIMEOUTS = REGISTRY.counter(
+    "db_pool_timeouts_total", "Connection checkouts that gave up after DB_POOL_TIMEOUT"
+)
+
+
+class PoolWait:
+    """Checkouts waiting for a pooled connection right now
+
+    ``longest()`` is how long the oldest of them has been waiting. It
+    grows while the pool falls behind and drops to 0 as soon as the
+    queue drains, so load shedding based on it stops the moment
+    connections are free again.
+    """
+
+    def __init__(self):
+        self._waiting: Dict[int, float] = {}  # in arrival order
+        self._tickets = itertools.count()
+
+    def start(self) -> int:
+        ticket = next(self._tickets)
+        self._waiting[ticket] = time.perf_counter()
+        return ticket
+
+    def finish(self, ticket: int) -> float:
+        """Seconds this ticket waited"""
+        return time.perf_counter() - self._waiting.pop(ticket)
+
+    def longest(self) -> float:
+        if not self._waiting:
+            return 0.0
+        return time.perf_counter() - next(iter(self._waiting.values()))
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+
+pool_wait = PoolWait()
+
+REGISTRY.gauge(
+    "db_pool_waiting", "Checkouts waiting for a database connection right now",
+    callback=lambda: pool_wait.waiting
+)
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited
+
+    Timed here rather than in ``get_db``, so sessions stay lazy: a
+    request answered from a cache never takes a connection at all.
+    """
+
+    def connect(self):
+        ticket = pool_wait.start()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_WAIT.observe(pool_wait.finish(ticket))
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["checked_out_at"] = time.perf_counter()
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    started = connection_record.info.pop("checked_out_at", None)
+    if started is not None:
+        POOL_CHECKOUT.observe(time.perf_counter() - started)
+
+
+_url = async_database_url(settings.DATABASE_URL)
 
 # Создаем engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+engine = create_async_engine(_url, **engine_options(_url))
+tune_engine(engine.sync_engine)
+
+REGISTRY.gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool",
+    callback=lambda: getattr(engine.pool, "checkedout", lambda: 0)()
 )
 
+async def warm_pool(engine, connections: int) -> int:
+    """Open up to ``connections`` pooled connections before traffic arrives
+
+    Otherwise the first requests of a fresh worker each pay for a
+    connect (TCP, TLS and auth on PostgreSQL, the pragmas on SQLite)
+    on top of their queries. Returns how many connections were opened.
+    """
+    size = getattr(engine.pool, "size", lambda: 1)()
+    connections = min(connections, size)
+    if connections <= 0:
+        return 0
+    # Held at the same time, so each one is a separate pooled connection
+    opened = await asyncio.gather(*(engine.connect().start() for _ in range(connections)),
+                                  return_exceptions=True)
+    conns = [conn for conn in opened if not isinstance(conn, BaseException)]
+    try:
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in conns))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in conns))
+    for error in opened:
+        if isinstance(error, BaseException):
+            raise error
+    return len(conns)
+
+
 # Создаем SessionLocal
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 # Создаем Base
 Base = declarative_base()
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    # Lazy: the connection is checked out on the first statement
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def match_topic(match_id: int) -> str:
+    return f"match:{match_id}"
+
+
+def city_topic(city: str) -> str:
+    return f"city:{city}"
+
+
+class LocalBackend:
+    """Fan-out inside one process: every subscriber owns a bounded queue
+
+    A subscriber that stops reading loses its oldest events instead of
+    growing memory or blocking publishers.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._queues: Dict[str, Set[asyncio.Queue]] = {}
+
+    async def publish(self, topic: str, message: str):
+        self.deliver(topic, message)
+
+    def deliver(self, topic: str, message: str):
+        for queue in self._queues.get(topic, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def open(self, *topics: str) -> asyncio.Queue:
+        queue = asyncio.Queue(self.queue_size)
+        for topic in topics:
+            self._queues.setdefault(topic, set()).add(queue)
+        return queue
+
+    def close(self, queue: asyncio.Queue, *topics: str):
+        for topic in topics:
+            subscribers = self._queues.get(topic)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._queues[topic]
+
+    def subscribers(self, topic: str) -> int:
+        return len(self._queues.get(topic, ()))
+
+
+class SharedBackend:
+    """Fan-out across workers through the shared state's pub/sub
+
+    A worker subscribes to a topic when its first local subscriber opens
+    it and unsubscribes when the last one leaves; messages are handed to
+    the local queues the same way LocalBackend does.
+    """
+
+    def __init__(self, state, queue_size: int = 100):
+        self.state = state
+        self.local = LocalBackend(queue_size)
+        self._callbacks: Dict[str, Callable[[str], None]] = {}
+
+    async def publish(self, topic: str, message: str):
+        # Queued, not awaited: the write path does not wait on the network
+        self.state.publish_nowait(f"events:{topic}", message)
+
+    def open(self, *topics: str) -> asyncio.Queue:
+        queue = self.local.open(*topics)
+        for topic in topics:
+            if topic not in self._callbacks:
+                callback = self._callbacks[topic] = partial(self.local.deliver, topic)
+                self.state.subscribe(f"events:{topic}", callback)
+        return queue
+
+    def close(self, queue: asyncio.Queue, *topics: str):
+        self.local.close(queue, *topics)
+        for topic in topics:
+            if not self.local.subscribers(topic) and topic in self._callbacks:
+                self.state.unsubscribe(f"events:{topic}", self._callbacks.pop(topic))
+
+    def subscribers(self, topic: str) -> int:
+        return self.local.subscribers(topic)
+
+
+class EventBus:
+    """Publishes compact JSON deltas to topic subscribers
+
+    The backend is swappable (``set_backend``): the local backend only
+    reaches this process, SharedBackend every worker.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or LocalBackend()
+        self._listeners: List[Callable[[dict], None]] = []
+
+    def set_backend(self, backend):
+        self.backend = backend
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Call ``listener(event)`` for every event published by this process
+
+        Listeners run inline in the publishing request and must not block.
+        Unlike topic subscribers they only see their own worker's events,
+        so with several workers each event reaches one listener.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[dict], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    async def publish(self, event: dict, *topics: str):
+        message = json.dumps(event, default=str, separators=(",", ":"))
+        for topic in topics:
+            try:
+                await self.backend.publish(topic, message)
+            except Exception:
+                # Live updates are best effort; never fail the write that caused them
+                logger.exception("Failed to publish event to %s", topic)
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("Event listener failed")
+
+    async def subscribe(self, *topics: str, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[str]]:
+        """Yield raw JSON messages; ``None`` every ``heartbeat`` seconds of silence"""
+        queue = self.backend.open(*topics)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self.backend.close(queue, *topics)
+
+
+event_bus = EventBus()
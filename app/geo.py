@@ -0,0 +1,114 @@
+import math
+from typing import List, NamedTuple, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9  # ~5 m cells; stored on every match
+EARTH_RADIUS_KM = 6371.0088
+
+
+class BBox(NamedTuple):
+    min_lat: float
+    min_lon: float
+    max_lat: float
+    max_lon: float
+
+    @property
+    def center(self) -> Tuple[float, float]:
+        return (self.min_lat + self.max_lat) / 2, (self.min_lon + self.max_lon) / 2
+
+
+def encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(lat, lon) degrees spanned by one geohash cell"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def _cells(bbox: BBox, precision: int) -> List[str]:
+    lat_step, lon_step = cell_size(precision)
+    lat_start = math.floor((bbox.min_lat + 90) / lat_step)
+    lat_stop = math.floor((min(bbox.max_lat, 90 - 1e-9) + 90) / lat_step)
+    lon_start = math.floor((bbox.min_lon + 180) / lon_step)
+    lon_stop = math.floor((min(bbox.max_lon, 180 - 1e-9) + 180) / lon_step)
+    return [
+        encode(-90 + (i + 0.5) * lat_step, -180 + (j + 0.5) * lon_step, precision)
+        for i in range(lat_start, lat_stop + 1)
+        for j in range(lon_start, lon_stop + 1)
+    ]
+
+
+def cover(bbox: BBox, max_cells: int = 16) -> List[str]:
+    """Finest set of geohash prefixes (at most ``max_cells``) covering ``bbox``"""
+    best = [""]
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        lat_step, lon_step = cell_size(precision)
+        estimate = (
+            (math.ceil((bbox.max_lat - bbox.min_lat) / lat_step) + 1)
+            * (math.ceil((bbox.max_lon - bbox.min_lon) / lon_step) + 1)
+        )
+        if estimate > max_cells:
+            break
+        cells = _cells(bbox, precision)
+        if len(cells) > max_cells:
+            break
+        best = cells
+    return sorted(best)
+
+
+def prefix_upper_bound(prefix: str) -> str:
+    """Smallest string greater than every geohash starting with ``prefix``"""
+    return prefix + "~"
+
+
+def radius_bbox(lat: float, lon: float, radius_km: float) -> BBox:
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlon = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    return BBox(max(lat - dlat, -90.0), max(lon - dlon, -180.0), min(lat + dlat, 90.0), min(lon + dlon, 180.0))
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_bbox(value: str) -> BBox:
+    """Parse Leaflet's ``toBBoxString()``: "west,south,east,north"."""
+    min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(","))
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+        raise ValueError("bbox out of range")
+    return BBox(min_lat, min_lon, max_lat, max_lon)
+
+
+def cluster_precision(bbox: BBox, target_cells: int = 64) -> int:
+    """Geohash length that splits ``bbox`` into roughly ``target_cells`` clusters"""
+    area = max((bbox.max_lat - bbox.min_lat) * (bbox.max_lon - bbox.min_lon), 1e-12)
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        lat_step, lon_step = cell_size(precision)
+        if area / (lat_step * lon_step) >= target_cells:
+            return precision
+    return GEOHASH_PRECISION
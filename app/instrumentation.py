@@ -0,0 +1,211 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "Finished HTTP requests", ("method", "route", "status")
+)
+HTTP_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to the end of the response body", ("method", "route")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "Requests being handled right now")
+HTTP_DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries", "SQL statements per request", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+HTTP_DB_SECONDS = REGISTRY.histogram(
+    "http_request_db_seconds", "Time per request spent waiting on SQL statements", ("route",)
+)
+N_PLUS_ONE = REGISTRY.counter(
+    "http_n_plus_one_total", "Requests that ran one statement N_PLUS_ONE_THRESHOLD times or more", ("route",)
+)
+
+UNMATCHED_ROUTE = "unmatched"  # 404s: keeps raw paths out of the labels
+
+
+class RequestStats:
+    """SQL activity of one request: statement -> [executions, seconds]"""
+
+    __slots__ = ("statements", "queries", "db_seconds")
+
+    def __init__(self):
+        self.statements: Dict[str, List[float]] = {}
+        self.queries = 0
+        self.db_seconds = 0.0
+
+    def record(self, statement: str, seconds: float):
+        entry = self.statements.get(statement)
+        if entry is None:
+            entry = self.statements[statement] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+        self.queries += 1
+        self.db_seconds += seconds
+
+    def repeated(self, threshold: int) -> List[str]:
+        return [statement for statement, (count, _) in self.statements.items() if count >= threshold]
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+# SQLAlchemy hooks -----------------------------------------------------------
+# AsyncSession runs the driver in a greenlet that shares the request
+# task's context, so the ContextVar finds the right request
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    started = conn.info.get("query_started")
+    if started:
+        stats.record(statement, time.perf_counter() - started.pop())
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(sync_engine):
+    """Count statements and their time against the request that runs them"""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# Middleware -----------------------------------------------------------------
+
+_route_templates: Dict[int, Dict[object, str]] = {}
+
+
+def _route(scope) -> str:
+    """Path template of the matched route (/matches/{match_id}), not the raw path"""
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    if endpoint is None or app is None:
+        return UNMATCHED_ROUTE
+    templates = _route_templates.get(id(app))
+    if templates is None:
+        templates = _route_templates[id(app)] = {
+            getattr(route, "endpoint", None): route.path for route in getattr(app, "routes", ())
+        }
+    return templates.get(endpoint, UNMATCHED_ROUTE)
+
+
+def _server_timing(stats: RequestStats, elapsed: float) -> bytes:
+    return (
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+        f"app;dur={elapsed * 1000:.1f}"
+    ).encode()
+
+
+class InstrumentationMiddleware:
+    """Per-route latency, status codes, in-flight requests and SQL cost
+
+    A plain ASGI middleware, so streaming responses (the SSE feed) pass
+    through untouched. ``Server-Timing`` reports the SQL time and the
+    handler time up to the response headers. A request that runs one
+    statement N_PLUS_ONE_THRESHOLD times or more is logged as a likely
+    N+1. Requests slower than SLOW_REQUEST_MS are sampled at
+    SLOW_REQUEST_SAMPLE_RATE and their per-statement profile written
+    to SLOW_REQUEST_DIR as JSON, when that is set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", ()))
+                headers.append((b"server-timing", _server_timing(stats, time.perf_counter() - started)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            _current.reset(token)
+            self._record(scope, stats, status, elapsed)
+
+    def _record(self, scope, stats: RequestStats, status: int, elapsed: float):
+        route = _route(scope)
+        method = scope["method"]
+        HTTP_REQUESTS.inc(method=method, route=route, status=str(status))
+        HTTP_DURATION.observe(elapsed, method=method, route=route)
+        HTTP_DB_QUERIES.observe(stats.queries, route=route)
+        HTTP_DB_SECONDS.observe(stats.db_seconds, route=route)
+
+        repeated = stats.repeated(settings.N_PLUS_ONE_THRESHOLD)
+        if repeated:
+            N_PLUS_ONE.inc(route=route)
+            logger.warning(
+                "Possible N+1 in %s %s: %s", method, route,
+                "; ".join(f"{stats.statements[s][0]}x {' '.join(s.split())[:120]}" for s in repeated)
+            )
+
+        if (settings.SLOW_REQUEST_DIR and elapsed * 1000 >= settings.SLOW_REQUEST_MS
+                and random.random() < settings.SLOW_REQUEST_SAMPLE_RATE):
+            profile = {
+                "at": datetime.utcnow().isoformat(),
+                "method": method,
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode(errors="replace"),
+                "route": route,
+                "status": status,
+                "duration_ms": round(elapsed * 1000, 2),
+                "db_ms": round(stats.db_seconds * 1000, 2),
+                "queries": stats.queries,
+                "statements": [
+                    {"sql": statement, "count": count, "total_ms": round(seconds * 1000, 3)}
+                    for statement, (count, seconds) in sorted(
+                        stats.statements.items(), key=lambda item: -item[1][1]
+                    )
+                ],
+            }
+            # Off the event loop: a slow disk must not slow the next request
+            asyncio.get_running_loop().run_in_executor(None, _dump_profile, profile)
+
+
+def _dump_profile(profile: dict):
+    try:
+        os.makedirs(settings.SLOW_REQUEST_DIR, exist_ok=True)
+        name = f"{profile['at'].replace(':', '')}-{profile['method']}-{os.getpid()}-{random.getrandbits(24):06x}.json"
+        with open(os.path.join(settings.SLOW_REQUEST_DIR, name), "w") as f:
+            json.dump(profile, f, ensure_ascii=False, indent=2)
+    except OSError:
+        logger.exception("Failed to write slow request profile")
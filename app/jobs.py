@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import LEADERBOARD_TAG, match_tag, matches_tag, response_cache
+from app.config import settings
+from app.events import city_topic, event_bus, match_topic
+from app.models import (
+    Match, MatchArchive, MatchPlayer, MatchPlayerArchive, MatchResult, MatchResultArchive, User
+)
+from app.notifications import Notification, notifier, reminder_text
+from app.ranking import ENTRY_COLUMNS, entry_from_row, ranking
+from app.scheduler import scheduler
+
+ACTIVE_STATUSES = ("open", "full")
+ARCHIVED_STATUSES = ("finished", "cancelled")
+MIN_PLAYERS_TO_FINISH = 2
+
+
+@scheduler.job("close_matches", every=60)
+async def close_matches(db: AsyncSession) -> Optional[datetime]:
+    """Move matches whose time slot is over out of open/full
+
+    A match with at least two players becomes finished (its result can
+    still be submitted), an emptier one cancelled. Works in batches of
+    MATCH_CLOSE_BATCH so no statement holds locks for long, and asks to
+    run again when the next match is over.
+    """
+    duration = timedelta(minutes=settings.MATCH_DURATION_MINUTES)
+    cutoff = datetime.utcnow() - duration
+    while True:
+        batch = (
+            select(Match.id)
+            .where(Match.status.in_(ACTIVE_STATUSES), Match.date_time < cutoff)
+            .order_by(Match.date_time)
+            .limit(settings.MATCH_CLOSE_BATCH)
+        )
+        closed = (await db.execute(
+            update(Match)
+            .where(Match.id.in_(batch.scalar_subquery()))
+            .values(status=case(
+                (Match.players_count >= MIN_PLAYERS_TO_FINISH, "finished"),
+                else_="cancelled"
+            ))
+            .returning(Match.id, Match.city, Match.status)
+            .execution_options(synchronize_session=False)
+        )).all()
+        await db.commit()
+
+        for match in closed:
+            await response_cache.invalidate(match_tag(match.id), matches_tag(match.city))
+            await event_bus.publish(
+                {"type": "match_status", "match_id": match.id, "status": match.status},
+                match_topic(match.id), city_topic(match.city)
+            )
+        if closed:
+            await response_cache.invalidate(matches_tag())
+        if len(closed) < settings.MATCH_CLOSE_BATCH:
+            break
+
+    next_start = (await db.execute(
+        select(func.min(Match.date_time)).where(Match.status.in_(ACTIVE_STATUSES))
+    )).scalar()
+    return next_start + duration if next_start is not None else None
+
+
+@scheduler.job("refresh_ranking", every=settings.RANKING_REFRESH_SECONDS)
+async def refresh_ranking(db: AsyncSession):
+    """Reload the in-process leaderboard, picking up writes from other processes"""
+    rows = (await db.execute(select(*ENTRY_COLUMNS))).all()
+    ranking.load(entry_from_row(row) for row in rows)
+    # The job runs in one worker; the others reload on their next request
+    ranking.publish_reload()
+    await response_cache.invalidate(LEADERBOARD_TAG)
+
+
+# Hot table, its archive twin and the column holding the match id;
+# columns are copied by name, ids included
+ARCHIVE_TABLES = (
+    (Match, MatchArchive, "id"),
+    (MatchPlayer, MatchPlayerArchive, "match_id"),
+    (MatchResult, MatchResultArchive, "match_id"),
+)
+
+
+@scheduler.job("archive_matches", every=settings.ARCHIVE_INTERVAL_SECONDS)
+async def archive_matches(db: AsyncSession):
+    """Move finished/cancelled matches older than ARCHIVE_AFTER_DAYS to *_archive
+
+    Each batch of ARCHIVE_BATCH matches is copied with INSERT ... SELECT
+    and deleted from the hot tables in one transaction, so a match is
+    always in exactly one place. Children are deleted before matches.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    cities = set()
+    while True:
+        batch = (await db.execute(
+            select(Match.id, Match.city)
+            .where(Match.status.in_(ARCHIVED_STATUSES), Match.date_time < cutoff)
+            .order_by(Match.id)
+            .limit(settings.ARCHIVE_BATCH)
+        )).all()
+        if not batch:
+            break
+        ids = [row.id for row in batch]
+        cities.update(row.city for row in batch)
+
+        for hot, cold, key in ARCHIVE_TABLES:
+            table = hot.__table__
+            await db.execute(
+                insert(cold).from_select(
+                    list(table.c.keys()), select(table).where(table.c[key].in_(ids))
+                )
+            )
+        for hot, _, key in reversed(ARCHIVE_TABLES):
+            table = hot.__table__
+            await db.execute(delete(table).where(table.c[key].in_(ids)))
+        await db.commit()
+
+        if len(batch) < settings.ARCHIVE_BATCH:
+            break
+
+    # Archived matches are past, so listings rarely change; match pages
+    # still render (from the archive) and keep their cache entries
+    if cities:
+        await response_cache.invalidate(matches_tag(), *(matches_tag(city) for city in cities))
+
+
+@scheduler.job("match_reminders", every=60)
+async def match_reminders(db: AsyncSession):
+    """Queue a kickoff reminder for every player of matches starting within REMINDER_LEAD_MINUTES
+
+    Matches are claimed by setting reminded_at in the same UPDATE that
+    selects them, so each is reminded once. Sending happens in the
+    notifier's background task; a worker that dies before it drains loses
+    those reminders rather than sending them twice.
+    """
+    if not notifier.running:
+        return
+    now = datetime.utcnow()
+    horizon = now + timedelta(minutes=settings.REMINDER_LEAD_MINUTES)
+    while True:
+        batch = (
+            select(Match.id)
+            .where(
+                Match.status.in_(ACTIVE_STATUSES),
+                Match.reminded_at.is_(None),
+                Match.date_time > now,
+                Match.date_time <= horizon
+            )
+            .order_by(Match.date_time)
+            .limit(settings.REMINDER_BATCH)
+        )
+        due = (await db.execute(
+            update(Match)
+            .where(Match.id.in_(batch.scalar_subquery()))
+            .values(reminded_at=now)
+            .returning(Match.id, Match.title, Match.stadium, Match.date_time)
+            .execution_options(synchronize_session=False)
+        )).all()
+        await db.commit()
+        if not due:
+            break
+
+        texts = {match.id: reminder_text(match.title, match.stadium, match.date_time) for match in due}
+        players = (await db.execute(
+            select(MatchPlayer.match_id, User.telegram_id)
+            .join(User, User.id == MatchPlayer.user_id)
+            .where(MatchPlayer.match_id.in_(list(texts)))
+        )).all()
+        for player in players:
+            if player.telegram_id:
+                notifier.submit(Notification(
+                    player.telegram_id, texts[player.match_id], f"reminder:{player.match_id}", player.match_id
+                ))
+        if len(due) < settings.REMINDER_BATCH:
+            break
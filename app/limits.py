@@ -0,0 +1,149 @@
+"""Per-user rate limits and load shedding
+
+Two guards for the database pool, which every worker shares between
+all of its users:
+
+* ``rate_limit(budget)`` is a route dependency: a token bucket per
+  Telegram user and budget, kept in ``app.state`` so every worker draws
+  from the same one. The user comes from the verified initData, not
+  from ``get_current_user``, so an over-budget request gets ``429``
+  with ``Retry-After`` without opening a session or taking a pooled
+  connection.
+* ``AdmissionMiddleware`` sheds load: once too many requests are
+  waiting on this worker, or requests have been waiting too long for a
+  pooled connection, new ones get ``503`` with ``Retry-After`` at once
+  rather than joining the queue. Admitted requests keep a bounded
+  latency; the rest retry shortly.
+"""
+import logging
+import math
+from typing import Dict, NamedTuple
+
+from fastapi import HTTPException, Request, status
+
+from app.auth import verified_telegram_id
+from app.config import settings
+from app.database import pool_wait
+from app.metrics import REGISTRY
+from app.state import state
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = REGISTRY.counter(
+    "http_rate_limited_total", "Requests refused with 429 by rate limit budget", ("budget",)
+)
+SHED = REGISTRY.counter(
+    "http_shed_total", "Requests refused with 503 by admission control", ("reason",)
+)  # in_flight, pool_wait
+
+
+class Budget(NamedTuple):
+    per_minute: float
+    burst: int
+
+
+def budgets() -> Dict[str, Budget]:
+    return {
+        "join": Budget(settings.RATE_LIMIT_JOIN, settings.RATE_LIMIT_BURST),
+        "write": Budget(settings.RATE_LIMIT_WRITE, settings.RATE_LIMIT_BURST),
+        "history": Budget(settings.RATE_LIMIT_HISTORY, settings.RATE_LIMIT_BURST),
+    }
+
+
+def rate_limit(name: str):
+    """Dependency charging the current user one request against budget ``name``
+
+    Use it in the route's ``dependencies``, which run before the
+    endpoint's own. Requests without valid initData are not charged:
+    ``get_current_user`` answers them. If the shared state fails the
+    request is let through: a limiter outage must not become an API one.
+    """
+    if name not in budgets():
+        raise ValueError(f"Unknown rate limit budget: {name}")
+
+    async def dependency(request: Request):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        telegram_id = await verified_telegram_id(request.headers.get("X-Telegram-Init-Data"))
+        if telegram_id is None:
+            return
+        budget = budgets()[name]
+        try:
+            wait = await state.take(f"rate:{name}:{telegram_id}", budget.per_minute / 60, budget.burst)
+        except Exception:
+            logger.exception("Rate limit check failed")
+            return
+        if wait:
+            RATE_LIMITED.inc(budget=name)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+    return dependency
+
+
+EXEMPT_PATHS = frozenset({"/api/health", "/metrics"})
+
+
+class AdmissionMiddleware:
+    """Answer 503 + Retry-After instead of queueing behind a saturated worker
+
+    A request counts as in flight until its response starts, so open
+    event streams, which answer at once, do not hold slots. Health
+    checks and metrics are always admitted; so is CORS preflight, which
+    never reaches the database.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = 0
+
+    def _overloaded(self):
+        if settings.ADMISSION_MAX_IN_FLIGHT and self.in_flight >= settings.ADMISSION_MAX_IN_FLIGHT:
+            return "in_flight"
+        if settings.ADMISSION_MAX_POOL_WAIT_MS and pool_wait.longest() * 1000 >= settings.ADMISSION_MAX_POOL_WAIT_MS:
+            return "pool_wait"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        reason = self._overloaded()
+        if reason is not None:
+            SHED.inc(reason=reason)
+            await _unavailable(send)
+            return
+
+        self.in_flight += 1
+        counted = True
+
+        async def send_wrapper(message):
+            nonlocal counted
+            if counted and message["type"] == "http.response.start":
+                counted = False
+                self.in_flight -= 1
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if counted:
+                self.in_flight -= 1
+
+
+async def _unavailable(send):
+    body = b'{"detail":"Server is busy, retry shortly"}'
+    await send({
+        "type": "http.response.start",
+        "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(settings.ADMISSION_RETRY_AFTER).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -1,29 +1,166 @@
-from fastapi import FastAPI
+"""ASGI entry point: ``uvicorn app.main:app`` (or ``--factory app.main:create_app``)
+
+Running several workers
+-----------------------
+In-process state (cached responses, the leaderboard, auth snapshots,
+live-update subscribers, the bot's send budget) goes through
+``app.state``. Point every worker at one Redis and start as many as
+there are cores::
+
+    REDIS_URL=redis://redis:6379/0 uvicorn app.main:app --workers 4
+    REDIS_URL=redis://redis:6379/0 gunicorn app.main:app -w 4 -k uvicorn.workers.UvicornWorker
+
+Without REDIS_URL each worker would keep its own copy and serve stale
+pages, ranks and profiles, so run a single worker in that case. Jobs
+need nothing extra: the scheduler's leases in the database already let
+one worker at a time run each job.
+
+Importing this module loads FastAPI only; the routers and the rest of
+the app load when ``app`` is first looked up or ``create_app`` runs,
+and the scheduler's jobs only in a worker that runs them.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware 
 from datetime import datetime 
- 
-app = FastAPI( 
-    title="Dribbling API", 
-    description="Backend for Dribbling football platform", 
-    version="1.0.0" 
-) 
- 
-app.add_middleware( 
-    CORSMiddleware, 
-    allow_origins=["*"], 
-    allow_credentials=True, 
-    allow_methods=["*"], 
-    allow_headers=["*"], 
-) 
- 
-@app.get("/") 
-async def root(): 
-    return { 
-        "message": "Welcome to Dribbling API", 
-        "version": "1.0.0", 
-        "docs": "/docs" 
-    } 
- 
-@app.get("/api/health") 
-async def health_check(): 
-    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()} 
+from app.metrics import REGISTRY, CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
+
+STARTUP_SECONDS = REGISTRY.gauge("app_startup_seconds", "Time the lifespan startup took in this worker")
+
+
+async def _preload_ranking():
+    from app.database import SessionLocal
+    from app.ranking import ranking
+
+    try:
+        async with SessionLocal() as db:
+            await ranking.ensure_loaded(db)
+    except Exception:
+        # Not fatal: the first leaderboard request loads it instead
+        logger.exception("Failed to preload the ranking")
+
+
+async def _share_state():
+    from app.auth import follow_invalidations
+    from app.cache import SharedResponseStore, response_cache
+    from app.config import settings
+    from app.events import SharedBackend, event_bus
+    from app.ranking import ranking
+    from app.state import state
+
+    await state.start()
+    if state.shared:
+        response_cache.set_store(SharedResponseStore(state, settings.SHARED_CACHE_TTL))
+        event_bus.set_backend(SharedBackend(state))
+    follow_invalidations()
+    ranking.follow()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from app import schemas
+    from app.config import settings
+    from app.database import engine, warm_pool
+    from app.notifications import notifier
+    from app.scheduler import scheduler
+    from app.serialization import prebuild_adapters
+    from app.state import state
+
+    started = time.perf_counter()
+    await _share_state()
+    try:
+        opened = await warm_pool(engine, settings.DB_POOL_WARM)
+    except Exception:
+        # The pool reconnects on demand; a worker that can't reach the
+        # database yet should still come up and answer /api/health
+        logger.exception("Failed to warm the connection pool")
+        opened = 0
+    adapters = prebuild_adapters(schemas)
+    # The leaderboard is the one cache worth filling up front, but it
+    # reads the whole users table, so it loads behind the first requests
+    # rather than ahead of them
+    preload = asyncio.create_task(_preload_ranking()) if settings.RANKING_PRELOAD else None
+
+    if settings.NOTIFICATIONS_ENABLED:
+        await notifier.start()
+    if settings.SCHEDULER_ENABLED:
+        from app import jobs  # noqa: F401 - registers the background jobs
+        await scheduler.start()
+    elapsed = time.perf_counter() - started
+    STARTUP_SECONDS.set(elapsed)
+    logger.info("Started in %.3fs: %d pooled connections, %d adapters", elapsed, opened, adapters)
+    yield
+    if preload is not None:
+        preload.cancel()
+        with suppress(asyncio.CancelledError):
+            await preload
+    await scheduler.stop()
+    # Give queued notifications a moment before dropping them
+    await notifier.drain(timeout=5)
+    await notifier.stop()
+    await state.close()
+    # aiosqlite runs each connection in a non-daemon thread; a worker
+    # process with pooled connections left open never exits
+    await engine.dispose()
+
+
+def create_app() -> FastAPI:
+    from app.instrumentation import InstrumentationMiddleware
+    from app.limits import AdmissionMiddleware
+    from app.routers import leaderboard, matches, users
+    from app.serialization import FastJSONResponse
+
+    app = FastAPI(
+        title="Dribbling API",
+        description="Backend for Dribbling football platform",
+        version="1.0.0",
+        default_response_class=FastJSONResponse,
+        lifespan=lifespan
+    )
+
+    # Innermost: shed requests still get CORS headers and are counted
+    app.add_middleware(AdmissionMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
+    )
+    # Added last so it wraps everything, CORS included
+    app.add_middleware(InstrumentationMiddleware)
+
+    for router in (matches.router, users.router, leaderboard.router):
+        app.include_router(router, prefix="/api")
+
+    @app.get("/")
+    async def root():
+        return {
+            "message": "Welcome to Dribbling API",
+            "version": "1.0.0",
+            "docs": "/docs"
+        }
+
+    @app.get("/api/health")
+    async def health_check():
+        return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+    return app
+
+
+def __getattr__(name):
+    # ``uvicorn app.main:app`` looks the attribute up: build it then, once
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,18 +1,23 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Boolean, Text, UniqueConstraint, Index, text
 from sqlalchemy.orm import relationship
 from app.database import Base
+from app.config import settings
 from datetime import datetime
 
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Leaderboard order: rating, wins, matches_played, id (scanned backwards)
+        Index("ix_users_leaderboard", "rating", "wins", "matches_played", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     telegram_id = Column(Integer, unique=True, index=True)
     username = Column(String, nullable=True)
     first_name = Column(String)
     photo_url = Column(String, nullable=True)
-    rating = Column(Integer, default=0)
+    rating = Column(Integer, default=settings.RATING_INITIAL)  # team Elo, see app.rating
     matches_played = Column(Integer, default=0)
     wins = Column(Integer, default=0)
     losses = Column(Integer, default=0)
@@ -25,6 +30,21 @@ class User(Base):
 
 class Match(Base):
     __tablename__ = "matches"
+    __table_args__ = (
+        # Keyset pagination order for match lists and user history
+        Index("ix_matches_date_time_id", "date_time", "id"),
+        # GET /matches?status=..&city=.. in (date_time, id) order
+        Index("ix_matches_status_city_date_time", "status", "city", "date_time", "id"),
+        # The default feed: open matches only, a fraction of the table
+        Index(
+            "ix_matches_open_date_time", "date_time", "id",
+            postgresql_where=text("status = 'open'"),
+            sqlite_where=text("status = 'open'")
+        ),
+        # Nearby search: range scans over geohash prefixes per status; the
+        # position is covered so the viewport filter skips the table
+        Index("ix_matches_status_geohash_position", "status", "geohash", "latitude", "longitude"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
@@ -33,10 +53,13 @@ class Match(Base):
     date_time = Column(DateTime)
     format = Column(String)  # 5x5, 7x7, 11x11
     max_players = Column(Integer)
+    players_count = Column(Integer, default=0, nullable=False)  # maintained by join/leave
     status = Column(String, default="open")  # open, full, finished, cancelled
     created_by = Column(Integer, ForeignKey("users.id"))
     latitude = Column(Float, default=39.4952)
     longitude = Column(Float, default=67.6093)
+    geohash = Column(String(12), nullable=True)  # app.geo.encode(latitude, longitude)
+    reminded_at = Column(DateTime, nullable=True)  # kickoff reminder sent (app.jobs.match_reminders)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -46,6 +69,11 @@ class Match(Base):
 
 class MatchPlayer(Base):
     __tablename__ = "match_players"
+    __table_args__ = (
+        UniqueConstraint("match_id", "user_id", name="uq_match_players_match_user"),
+        # User history: every match a user joined, without touching other rows
+        Index("ix_match_players_user_match", "user_id", "match_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     match_id = Column(Integer, ForeignKey("matches.id"))
@@ -55,4 +83,82 @@ class MatchPlayer(Base):
 
     # Relationships
     match = relationship("Match", back_populates="players")
-    user = relationship("User", back_populates="match_participations")
\ No newline at end of file
+    user = relationship("User", back_populates="match_participations")
+
+class MatchResult(Base):
+    __tablename__ = "match_results"
+
+    id = Column(Integer, primary_key=True, index=True)  # also the rating replay order
+    match_id = Column(Integer, ForeignKey("matches.id"), unique=True, nullable=False)
+    score_a = Column(Integer, nullable=False)
+    score_b = Column(Integer, nullable=False)
+    submitted_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ScheduledJob(Base):
+    __tablename__ = "scheduled_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    interval_seconds = Column(Integer, nullable=False)
+    next_run_at = Column(DateTime, nullable=False)
+    locked_until = Column(DateTime, nullable=True)  # lease of the worker running it
+    last_run_at = Column(DateTime, nullable=True)
+    last_status = Column(String, nullable=True)  # ok, error
+    last_error = Column(Text, nullable=True)
+    run_count = Column(Integer, default=0, nullable=False)
+
+
+# Cold storage: finished/cancelled matches older than ARCHIVE_AFTER_DAYS
+# are moved here by the archive_matches job (app/jobs.py) with their ids
+# kept, so the hot tables only hold recent and upcoming games. No foreign
+# keys: rows arrive in bulk and are never edited.
+
+class MatchArchive(Base):
+    __tablename__ = "matches_archive"
+    __table_args__ = (
+        Index("ix_matches_archive_date_time_id", "date_time", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String)
+    stadium = Column(String)
+    city = Column(String)
+    date_time = Column(DateTime)
+    format = Column(String)
+    max_players = Column(Integer)
+    players_count = Column(Integer, default=0, nullable=False)
+    status = Column(String)
+    created_by = Column(Integer)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    geohash = Column(String(12), nullable=True)
+    reminded_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class MatchPlayerArchive(Base):
+    __tablename__ = "match_players_archive"
+    __table_args__ = (
+        Index("ix_match_players_archive_match", "match_id"),
+        Index("ix_match_players_archive_user_match", "user_id", "match_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    match_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    team = Column(String, nullable=True)
+    joined_at = Column(DateTime)
+
+
+class MatchResultArchive(Base):
+    __tablename__ = "match_results_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    match_id = Column(Integer, unique=True, nullable=False)
+    score_a = Column(Integer, nullable=False)
+    score_b = Column(Integer, nullable=False)
+    submitted_by = Column(Integer)
+    created_at = Column(DateTime)
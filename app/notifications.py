@@ -0,0 +1,420 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select
+
+from app.cache import TTLCache
+from app.config import settings
+from app.database import SessionLocal
+from app.events import event_bus
+from app.metrics import REGISTRY
+from app.models import Match, MatchPlayer, User
+from app.state import state
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATIONS = REGISTRY.counter(
+    "notifications_total", "Bot notifications by outcome", ("result",)
+)  # queued, deduplicated, dropped, sent, retried, failed
+SEND_SECONDS = REGISTRY.histogram(
+    "notification_send_seconds", "Bot API sendMessage round trip",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+MESSAGE_LIMIT = 4096  # characters per Telegram message
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 60.0
+
+
+class Notification(NamedTuple):
+    chat_id: int  # users.telegram_id: a private chat with the bot
+    text: str
+    key: Optional[str] = None  # de-duplication key; None never deduplicates
+    match_id: Optional[int] = None  # adds an "open match" Mini App button
+
+
+class RateLimiter:
+    """Bot-wide token bucket plus a minimum interval between messages to one chat
+
+    Each call to ``acquire`` reserves the chat's next slot before waiting,
+    so messages to one chat are spaced out without holding up others.
+    ``pause`` stops all sends after Telegram answers 429. The default
+    burst of one spaces sends evenly: a bucket allows ``burst + rate``
+    messages in any second, and Telegram counts per second.
+
+    Telegram's limit is per bot, not per worker: with shared ``state``
+    every send also takes a slot from a per-second counter all workers
+    share, so together they stay at ``rate``.
+    """
+
+    def __init__(self, rate: float, chat_interval: float, burst: float = 1.0, state=None):
+        self.rate = rate
+        self.state = state
+        self.burst = burst
+        self.chat_interval = chat_interval
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._chat_next: Dict[int, float] = {}
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _prune(self, now: float):
+        if len(self._chat_next) > 10000:
+            self._chat_next = {chat: at for chat, at in self._chat_next.items() if at > now}
+
+    async def acquire(self, chat_id: int):
+        now = time.monotonic()
+        slot = max(now, self._chat_next.get(chat_id, 0.0))
+        self._chat_next[chat_id] = slot + self.chat_interval
+        self._prune(now)
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+        # Waiters take tokens in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+            if self.state is not None and self.state.shared:
+                await self._shared_slot()
+
+    async def _shared_slot(self):
+        while True:
+            now = time.time()  # wall clock: the window has to line up across hosts
+            window = int(now)
+            try:
+                taken = await self.state.incr(f"notify:rate:{window}", ttl=2)
+            except Exception as e:
+                logger.warning("Shared send budget unavailable, using this worker's: %s", e)
+                return
+            if taken <= self.rate:
+                return
+            await asyncio.sleep(window + 1 - now)
+
+
+def merge(batch: List[Notification]) -> List[Notification]:
+    """One message per chat for a batch, split at Telegram's length limit"""
+    by_chat: Dict[int, List[Notification]] = {}
+    for notification in batch:
+        by_chat.setdefault(notification.chat_id, []).append(notification)
+
+    merged = []
+    for chat_id, items in by_chat.items():
+        match_ids = {n.match_id for n in items}
+        match_id = match_ids.pop() if len(match_ids) == 1 else None
+        text = ""
+        for item in items:
+            if text and len(text) + 2 + len(item.text) > MESSAGE_LIMIT:
+                merged.append(Notification(chat_id, text, None, match_id))
+                text = ""
+            text = f"{text}\n\n{item.text}" if text else item.text[:MESSAGE_LIMIT]
+        merged.append(Notification(chat_id, text, None, match_id))
+    return merged
+
+
+Sender = Callable[[Notification], Awaitable[None]]
+
+
+class Notifier:
+    """Queue between API workers and the Telegram Bot API
+
+    ``submit`` never blocks: it drops duplicates (same chat and key within
+    NOTIFY_DEDUP_TTL) and, when the queue is full, the notification
+    itself. A background task takes up to NOTIFY_BATCH_SIZE queued
+    notifications at a time, merges them into one message per chat and
+    sends each through the rate limiter with up to NOTIFY_CONCURRENCY in
+    flight. Failed sends are retried with exponential backoff, 429s after
+    the delay Telegram asks for; a blocked bot or unknown chat is not
+    retried.
+
+    Match events arrive through an event bus listener and are turned
+    into notifications off the request path.
+    """
+
+    def __init__(self, send: Optional[Sender] = None, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._send = send
+        self._bot = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._events: Optional[asyncio.Queue] = None
+        self._seen = TTLCache(maxsize=settings.NOTIFY_QUEUE_SIZE * 2, ttl=settings.NOTIFY_DEDUP_TTL)
+        self._tasks: List[asyncio.Task] = []
+        self._inflight: Set[asyncio.Task] = set()
+        self._retrying = 0
+        self.limiter = RateLimiter(settings.NOTIFY_GLOBAL_RATE, settings.NOTIFY_CHAT_INTERVAL, state=state)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def pending(self) -> int:
+        return (self._queue.qsize() if self._queue else 0) + len(self._inflight) + self._retrying
+
+    # Producing -------------------------------------------------------------
+
+    def submit(self, notification: Notification) -> bool:
+        """Queue a notification; False when it was a duplicate or the queue is full"""
+        if self._queue is None:
+            return False
+        if notification.key is not None:
+            dedup_key = (notification.chat_id, notification.key)
+            if self._seen.get(dedup_key):
+                NOTIFICATIONS.inc(result="deduplicated")
+                return False
+            self._seen.set(dedup_key, True)
+        try:
+            self._queue.put_nowait((notification, 0))
+        except asyncio.QueueFull:
+            NOTIFICATIONS.inc(result="dropped")
+            return False
+        NOTIFICATIONS.inc(result="queued")
+        return True
+
+    def on_event(self, event: dict):
+        """Event bus listener: hand the event to the background task"""
+        if self._events is None:
+            return
+        try:
+            self._events.put_nowait(event)
+        except asyncio.QueueFull:
+            NOTIFICATIONS.inc(result="dropped")
+
+    # Sending ---------------------------------------------------------------
+
+    async def _send_with_bot(self, notification: Notification):
+        from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
+
+        url = settings.WEBAPP_URL
+        if notification.match_id is not None:
+            url = f"{url}{'&' if '?' in url else '?'}match={notification.match_id}"
+        markup = InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(text="Открыть матч" if notification.match_id else "Открыть", web_app=WebAppInfo(url=url))
+        ]])
+        await self._bot.send_message(
+            notification.chat_id, notification.text, reply_markup=markup, disable_web_page_preview=True
+        )
+
+    def _retry(self, notification: Notification, attempt: int, delay: float):
+        if attempt >= settings.NOTIFY_MAX_RETRIES:
+            NOTIFICATIONS.inc(result="failed")
+            logger.warning("Giving up on notification to %s after %d attempts", notification.chat_id, attempt + 1)
+            return
+        NOTIFICATIONS.inc(result="retried")
+        self._retrying += 1
+        asyncio.get_running_loop().call_later(delay, self._requeue, notification, attempt + 1)
+
+    def _requeue(self, notification: Notification, attempt: int):
+        self._retrying -= 1
+        try:
+            self._queue.put_nowait((notification, attempt))
+        except asyncio.QueueFull:
+            NOTIFICATIONS.inc(result="dropped")
+
+    async def _deliver(self, notification: Notification, attempt: int):
+        from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+        await self.limiter.acquire(notification.chat_id)
+        started = time.perf_counter()
+        try:
+            await self._send(notification)
+        except TelegramRetryAfter as e:
+            # Flood control is per bot: hold every send, not just this one
+            self.limiter.pause(e.retry_after)
+            self._retry(notification, attempt, e.retry_after)
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # The user blocked the bot or never started it; retrying won't help
+            NOTIFICATIONS.inc(result="failed")
+            logger.info("Notification to %s rejected: %s", notification.chat_id, e)
+        except Exception as e:
+            logger.warning("Notification to %s failed: %s", notification.chat_id, e)
+            delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt)
+            self._retry(notification, attempt, delay * random.uniform(0.5, 1.5))
+        else:
+            NOTIFICATIONS.inc(result="sent")
+        finally:
+            SEND_SECONDS.observe(time.perf_counter() - started)
+
+    async def _next_batch(self) -> List[Tuple[Notification, int]]:
+        batch = [await self._queue.get()]
+        while len(batch) < settings.NOTIFY_BATCH_SIZE and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _send_loop(self):
+        if self._send is None:
+            # aiogram takes seconds to import: load it here, in a thread,
+            # rather than in start(), so it holds up neither the worker's
+            # startup nor its event loop. Queued messages wait for it.
+            self._bot = await asyncio.to_thread(_create_bot)
+            self._send = self._send_with_bot
+        slots = asyncio.Semaphore(settings.NOTIFY_CONCURRENCY)
+        while True:
+            batch = await self._next_batch()
+            # Retries are sent on their own so their attempt count is kept
+            fresh = merge([notification for notification, attempt in batch if attempt == 0])
+            work = [(n, 0) for n in fresh] + [(n, attempt) for n, attempt in batch if attempt > 0]
+            for notification, attempt in work:
+                await slots.acquire()
+                task = asyncio.create_task(self._deliver(notification, attempt))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+                task.add_done_callback(lambda _: slots.release())
+
+    # Events ----------------------------------------------------------------
+
+    async def _event_loop(self):
+        while True:
+            event = await self._events.get()
+            try:
+                async with self.session_factory() as db:
+                    for notification in await notifications_for(db, event):
+                        self.submit(notification)
+            except Exception:
+                logger.exception("Failed to build notifications for %s", event.get("type"))
+
+    # Lifecycle -------------------------------------------------------------
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(settings.NOTIFY_QUEUE_SIZE)
+        self._events = asyncio.Queue(settings.NOTIFY_QUEUE_SIZE)
+        self._tasks = [
+            asyncio.create_task(self._send_loop(), name="notifications"),
+            asyncio.create_task(self._event_loop(), name="notification-events"),
+        ]
+        event_bus.add_listener(self.on_event)
+
+    async def drain(self, timeout: float):
+        """Wait until queued notifications are sent, at most ``timeout`` seconds"""
+        deadline = time.monotonic() + timeout
+        while self.pending() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    async def stop(self):
+        event_bus.remove_listener(self.on_event)
+        for task in [*self._tasks, *self._inflight]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._inflight, return_exceptions=True)
+        self._tasks = []
+        if self._bot is not None:
+            await self._bot.session.close()
+            self._bot = None
+            self._send = None
+
+
+def _create_bot():
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL))
+    return Bot(settings.BOT_TOKEN, session=session)
+
+
+notifier = Notifier()
+
+
+# Messages -----------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def _zone(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
+
+
+def _when(value) -> str:
+    """A stored (naive UTC) match time as players read it"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    local = value.replace(tzinfo=timezone.utc).astimezone(_zone(settings.TIMEZONE))
+    return local.strftime("%d.%m %H:%M")
+
+
+def _progress(count, max_players) -> str:
+    return f"{count}/{max_players}"
+
+
+def reminder_text(title: str, stadium: str, date_time: datetime) -> str:
+    return f"⏰ Скоро матч «{title}»: {_when(date_time)}, {stadium}. Не опаздывайте!"
+
+
+async def notifications_for(db, event: dict) -> List[Notification]:
+    """Recipients and texts for one event from app.events"""
+    kind = event.get("type")
+
+    if kind == "match_created":
+        match = event["match"]
+        creator = (await db.execute(
+            select(User.telegram_id).where(User.id == match["created_by"])
+        )).scalar()
+        if creator is None:
+            return []
+        text = (f"✅ Матч «{match['title']}» создан: {_when(match['date_time'])}, {match['stadium']}. "
+                f"Напомним за {settings.REMINDER_LEAD_MINUTES} мин до начала.")
+        return [Notification(creator, text, f"created:{match['id']}", match["id"])]
+
+    if kind in ("player_joined", "player_left"):
+        match_id = event["match_id"]
+        # Keys carry the roster row's joined_at: a rejoin or a refill is a
+        # new key, only a repeat of the same event is deduplicated
+        joined_at = event.get("joined_at")
+        match = (await db.execute(
+            select(Match.title, Match.max_players, Match.date_time, Match.created_by,
+                   User.telegram_id.label("creator_chat"))
+            .join(User, User.id == Match.created_by)
+            .where(Match.id == match_id)
+        )).first()
+        if match is None:
+            return []
+
+        if kind == "player_joined" and event.get("status") == "full":
+            # Everyone in the roster hears that the game is on
+            chats = (await db.execute(
+                select(User.telegram_id)
+                .join(MatchPlayer, MatchPlayer.user_id == User.id)
+                .where(MatchPlayer.match_id == match_id)
+            )).scalars().all()
+            text = f"⚽ Матч «{match.title}» собран ({_progress(event['players_count'], match.max_players)}), " \
+                   f"начало {_when(match.date_time)}."
+            return [Notification(chat, text, f"full:{match_id}:{joined_at}", match_id) for chat in chats if chat]
+
+        if kind == "player_joined":
+            player = event["player"]
+            if player["user_id"] == match.created_by:
+                return []
+            name = player.get("first_name") or player.get("username") or "Игрок"
+            text = f"➕ {name} в матче «{match.title}» ({_progress(event['players_count'], match.max_players)})"
+            return [Notification(match.creator_chat, text, f"joined:{match_id}:{player['user_id']}:{joined_at}", match_id)]
+
+        user = (await db.execute(
+            select(User.first_name, User.username).where(User.id == event["user_id"])
+        )).first()
+        name = (user and (user.first_name or user.username)) or "Игрок"
+        text = f"➖ {name} покинул матч «{match.title}» ({_progress(event['players_count'], match.max_players)})"
+        return [Notification(match.creator_chat, text, f"left:{match_id}:{event['user_id']}:{joined_at}", match_id)]
+
+    if kind == "match_deleted" and event.get("player_ids"):
+        chats = (await db.execute(
+            select(User.telegram_id).where(User.id.in_(event["player_ids"]))
+        )).scalars().all()
+        text = f"❌ Матч «{event.get('title', '')}» отменён организатором."
+        return [Notification(chat, text, f"deleted:{event['match_id']}") for chat in chats if chat]
+
+    return []
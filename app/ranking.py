@@ -0,0 +1,268 @@
+import asyncio
+import json
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import User
+from app.state import state
+
+RELOAD = "reload"  # on the ranking channel: drop the copy, reload on next use
+
+
+class LeaderboardEntry(NamedTuple):
+    id: int
+    first_name: str
+    username: Optional[str]
+    rating: int
+    matches_played: int
+    wins: int
+    losses: int
+
+    @property
+    def sort_key(self) -> Tuple[int, int, int, int]:
+        # Negated so ascending order is the leaderboard order:
+        # rating, wins, matches_played, id - all descending
+        return (-self.rating, -self.wins, -self.matches_played, -self.id)
+
+
+ENTRY_COLUMNS = (
+    User.id, User.first_name, User.username, User.rating,
+    User.matches_played, User.wins, User.losses,
+)
+
+
+def entry_from_row(row) -> LeaderboardEntry:
+    return LeaderboardEntry(
+        row.id, row.first_name, row.username, row.rating or 0,
+        row.matches_played or 0, row.wins or 0, row.losses or 0,
+    )
+
+
+class SortedKeys:
+    """Order-statistics list: sorted buckets plus a Fenwick tree over bucket sizes
+
+    Insert, delete, position-of-key and key-at-position all run in
+    O(log n) plus a memmove of one bucket of at most 2 * LOAD keys.
+    """
+
+    LOAD = 512
+
+    def __init__(self, keys: Iterable = ()):
+        self._reset(sorted(keys))
+
+    def _reset(self, keys: List):
+        self._buckets = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(keys)
+        self._rebuild_tree()
+
+    def _rebuild_tree(self):
+        tree = [0] + [len(bucket) for bucket in self._buckets]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, bucket: int, delta: int):
+        i = bucket + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _tree_prefix(self, bucket: int) -> int:
+        """Number of keys in buckets [0, bucket)"""
+        total, i = 0, bucket
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _tree_locate(self, position: int) -> Tuple[int, int]:
+        """Bucket holding the key at ``position`` and the offset inside it"""
+        bucket, remaining = 0, position
+        step = 1 << (len(self._tree).bit_length() - 1)
+        while step:
+            nxt = bucket + step
+            if nxt < len(self._tree) and self._tree[nxt] <= remaining:
+                bucket = nxt
+                remaining -= self._tree[nxt]
+            step >>= 1
+        return bucket, remaining
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, key):
+        if not self._buckets:
+            self._reset([key])
+            return
+        b = bisect_left(self._maxes, key)
+        if b == len(self._maxes):
+            b -= 1
+            self._buckets[b].append(key)
+            self._maxes[b] = key
+        else:
+            insort(self._buckets[b], key)
+        self._len += 1
+        self._tree_add(b, 1)
+        if len(self._buckets[b]) > 2 * self.LOAD:
+            bucket = self._buckets[b]
+            self._buckets[b:b + 1] = [bucket[:self.LOAD], bucket[self.LOAD:]]
+            self._maxes[b:b + 1] = [bucket[self.LOAD - 1], bucket[-1]]
+            self._rebuild_tree()
+
+    def remove(self, key):
+        b = bisect_left(self._maxes, key)
+        if b == len(self._maxes):
+            raise ValueError(f"{key!r} not in list")
+        bucket = self._buckets[b]
+        i = bisect_left(bucket, key)
+        if i == len(bucket) or bucket[i] != key:
+            raise ValueError(f"{key!r} not in list")
+        del bucket[i]
+        self._len -= 1
+        if bucket:
+            self._maxes[b] = bucket[-1]
+            self._tree_add(b, -1)
+        else:
+            del self._buckets[b]
+            del self._maxes[b]
+            self._rebuild_tree()
+
+    def bisect_left(self, key) -> int:
+        b = bisect_left(self._maxes, key)
+        if b == len(self._maxes):
+            return self._len
+        return self._tree_prefix(b) + bisect_left(self._buckets[b], key)
+
+    def bisect_right(self, key) -> int:
+        b = bisect_right(self._maxes, key)
+        if b == len(self._maxes):
+            return self._len
+        return self._tree_prefix(b) + bisect_right(self._buckets[b], key)
+
+    def __getitem__(self, position: int):
+        if not 0 <= position < self._len:
+            raise IndexError("position out of range")
+        b, offset = self._tree_locate(position)
+        return self._buckets[b][offset]
+
+    def islice(self, start: int, stop: int) -> Iterator:
+        stop = min(stop, self._len)
+        if start >= stop:
+            return
+        b, offset = self._tree_locate(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = self._buckets[b][offset:offset + remaining]
+            yield from chunk
+            remaining -= len(chunk)
+            b, offset = b + 1, 0
+
+
+class Ranking:
+    """In-process leaderboard kept in rank order and updated incrementally
+
+    Loaded from ``users`` once, then kept current by ``update`` calls from
+    the write paths that change ratings or create users. With a
+    ``channel`` and shared state, updates are also published there and
+    ``follow`` applies other workers' updates to this copy.
+    """
+
+    def __init__(self, channel: Optional[str] = None):
+        self.channel = channel
+        self._keys = SortedKeys()
+        self._entries: Dict[int, LeaderboardEntry] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def ensure_loaded(self, db: AsyncSession) -> "Ranking":
+        if not self._loaded:
+            async with self._lock:
+                if not self._loaded:
+                    rows = (await db.execute(select(*ENTRY_COLUMNS))).all()
+                    self.load(entry_from_row(row) for row in rows)
+        return self
+
+    def load(self, entries: Iterable[LeaderboardEntry]):
+        self._entries = {entry.id: entry for entry in entries}
+        self._keys = SortedKeys(entry.sort_key for entry in self._entries.values())
+        self._loaded = True
+
+    def reset(self):
+        """Drop everything; the next request reloads from the database"""
+        self._keys = SortedKeys()
+        self._entries = {}
+        self._loaded = False
+
+    def update(self, entry: LeaderboardEntry):
+        self.apply(entry)
+        if self.channel is not None and state.shared:
+            state.publish_nowait(self.channel, json.dumps(entry, separators=(",", ":")))
+
+    def publish_reload(self):
+        """Have other workers reload from the database, after this one did"""
+        if self.channel is not None and state.shared:
+            state.publish_nowait(self.channel, RELOAD)
+
+    def follow(self):
+        if self.channel is None:
+            return
+        state.subscribe(self.channel, self._on_message, include_own=False)
+        # Updates may have been missed: start over from the database
+        state.on_reconnect(self.reset)
+
+    def _on_message(self, message: str):
+        if message == RELOAD:
+            self.reset()
+        else:
+            self.apply(LeaderboardEntry(*json.loads(message)))
+
+    def apply(self, entry: LeaderboardEntry):
+        """Move ``entry`` into place in this process only"""
+        if not self._loaded:
+            return
+        previous = self._entries.get(entry.id)
+        if previous is not None:
+            if previous.sort_key != entry.sort_key:
+                self._keys.remove(previous.sort_key)
+                self._keys.add(entry.sort_key)
+        else:
+            self._keys.add(entry.sort_key)
+        self._entries[entry.id] = entry
+
+    def remove(self, user_id: int):
+        previous = self._entries.pop(user_id, None)
+        if previous is not None:
+            self._keys.remove(previous.sort_key)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def page(self, offset: int, limit: int) -> List[LeaderboardEntry]:
+        return [self._entries[-key[3]] for key in self._keys.islice(offset, offset + limit)]
+
+    def rating_rank(self, rating: int) -> int:
+        """1 + number of users with a strictly higher rating"""
+        return self._keys.bisect_left((-rating,)) + 1
+
+    def position_after(self, key: Tuple[int, int, int, int]) -> int:
+        """Position just past (rating, wins, matches_played, id) in leaderboard order"""
+        rating, wins, matches_played, user_id = key
+        return self._keys.bisect_right((-rating, -wins, -matches_played, -user_id))
+
+    def position(self, user_id: int) -> Optional[int]:
+        """0-based position of the user in leaderboard order"""
+        entry = self._entries.get(user_id)
+        return None if entry is None else self._keys.bisect_left(entry.sort_key)
+
+
+ranking = Ranking(channel="ranking")
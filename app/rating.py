@@ -0,0 +1,253 @@
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+from sqlalchemy import select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import (
+    Match, MatchPlayer, MatchPlayerArchive, MatchResult, MatchResultArchive, User
+)
+from app.auth import invalidate_user
+from app.cache import LEADERBOARD_TAG, response_cache, user_tag
+from app.ranking import ENTRY_COLUMNS, LeaderboardEntry, ranking
+
+
+def _numpy():
+    """numpy, imported on first use
+
+    Only the batch replay needs it, and importing it up front costs
+    every worker about 0.1 s of startup.
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Batch replay requires numpy") from None
+    return numpy
+
+
+# Team Elo: a side is rated by the mean rating of its players and every
+# player of a side moves by the same, rounded, number of points
+
+TEAMS = ("A", "B")
+
+
+class RatingError(ValueError):
+    pass
+
+
+class PlayerChange(NamedTuple):
+    entry: LeaderboardEntry  # the player after the update
+    team: str
+    rating_before: int
+
+
+def outcome(score_a: int, score_b: int) -> float:
+    """Actual score of team A: 1 win, 0.5 draw, 0 loss"""
+    return 1.0 if score_a > score_b else 0.5 if score_a == score_b else 0.0
+
+
+def expected_score(rating_a: float, rating_b: float) -> float:
+    return 1 / (1 + 10 ** ((rating_b - rating_a) / 400))
+
+
+def team_delta(ratings_a: Sequence[int], ratings_b: Sequence[int], result: float,
+               k: float = None) -> int:
+    """Points each team A player gains (and each team B player loses)"""
+    k = settings.RATING_K_FACTOR if k is None else k
+    mean_a = sum(ratings_a) / len(ratings_a)
+    mean_b = sum(ratings_b) / len(ratings_b)
+    # round() and numpy.rint both round half to even, so replay matches
+    return round(k * (result - expected_score(mean_a, mean_b)))
+
+
+async def record_result(
+        db: AsyncSession,
+        match_id: int,
+        score_a: int,
+        score_b: int,
+        submitted_by: int
+) -> List[PlayerChange]:
+    """Store the result and apply the rating update in the caller's transaction
+
+    The players' rows are locked (FOR UPDATE, in id order to avoid
+    deadlocks) so concurrent results sharing a player apply one after
+    the other. The unique match_results.match_id rejects a second result
+    on commit. The caller commits.
+    """
+    players = (await db.execute(
+        select(*ENTRY_COLUMNS, MatchPlayer.team)
+        .join(MatchPlayer, MatchPlayer.user_id == User.id)
+        .where(MatchPlayer.match_id == match_id, MatchPlayer.team.in_(TEAMS))
+        .order_by(User.id)
+        .with_for_update(of=User)
+    )).all()
+    ratings = {team: [p.rating or 0 for p in players if p.team == team] for team in TEAMS}
+    if not ratings["A"] or not ratings["B"]:
+        raise RatingError("Both teams need at least one player")
+
+    result = outcome(score_a, score_b)
+    delta = team_delta(ratings["A"], ratings["B"], result)
+
+    db.add(MatchResult(match_id=match_id, score_a=score_a, score_b=score_b, submitted_by=submitted_by))
+    await db.execute(update(Match).where(Match.id == match_id).values(status="finished"))
+
+    changes = []
+    for player in players:
+        sign = 1 if player.team == "A" else -1
+        won = sign * (result - 0.5) > 0
+        lost = sign * (result - 0.5) < 0
+        entry = LeaderboardEntry(
+            player.id, player.first_name, player.username,
+            (player.rating or 0) + sign * delta,
+            (player.matches_played or 0) + 1,
+            (player.wins or 0) + won,
+            (player.losses or 0) + lost,
+        )
+        changes.append(PlayerChange(entry, player.team, player.rating or 0))
+
+    await db.execute(update(User), [
+        {
+            "id": change.entry.id,
+            "rating": change.entry.rating,
+            "matches_played": change.entry.matches_played,
+            "wins": change.entry.wins,
+            "losses": change.entry.losses
+        }
+        for change in changes
+    ])
+    await db.flush()
+    return changes
+
+
+async def publish_changes(changes: List[PlayerChange]):
+    """After commit: drop auth snapshots, move players in the ranking, drop cached pages"""
+    for change in changes:
+        invalidate_user(change.entry.id)
+        ranking.update(change.entry)
+    await response_cache.invalidate(LEADERBOARD_TAG, *(user_tag(change.entry.id) for change in changes))
+
+
+# Batch replay -------------------------------------------------------------
+
+def _layers(entry_result, entry_player, n_players: int):
+    """Layer of each result: 1 + the latest layer of any of its players
+
+    Results in one layer share no player, so a layer can be applied in
+    one vectorised step and layer order preserves every player's history.
+    This is the one pass that has to walk the history in order.
+    """
+    np = _numpy()
+    bounds = (np.flatnonzero(np.diff(entry_result)) + 1).tolist()
+    players = entry_player.tolist()
+    last = [0] * n_players
+    latest = last.__getitem__
+    layer = []
+    for start, stop in zip([0] + bounds, bounds + [len(players)]):
+        group = players[start:stop]
+        value = max(map(latest, group)) + 1
+        for p in group:
+            last[p] = value
+        layer.append(value)
+    return np.asarray(layer, dtype=np.int64)
+
+
+def replay(entry_result, entry_player, entry_side, outcomes, initial, k: float = None):
+    """Recompute ratings for a whole history with NumPy
+
+    ``entry_*`` describe one row per (result, player), sorted by result
+    index: the player's index and side (+1 team A, -1 team B).
+    ``outcomes`` is team A's actual score per result and ``initial`` the
+    starting rating per player. Returns (ratings, played, wins, losses);
+    ratings match applying ``team_delta`` result by result.
+    """
+    np = _numpy()
+    k = settings.RATING_K_FACTOR if k is None else k
+    entry_result = np.asarray(entry_result, dtype=np.int64)
+    entry_player = np.asarray(entry_player, dtype=np.int64)
+    entry_side = np.asarray(entry_side, dtype=np.int64)
+    outcomes = np.asarray(outcomes, dtype=np.float64)
+    ratings = np.array(initial, dtype=np.float64)
+    n_players = len(ratings)
+
+    if len(entry_result):
+        layer_of_result = _layers(entry_result, entry_player, n_players)
+        order = np.argsort(layer_of_result[entry_result], kind="stable")
+        entry_result, entry_player, entry_side = entry_result[order], entry_player[order], entry_side[order]
+        entry_layer = layer_of_result[entry_result]
+        bounds = np.flatnonzero(np.diff(entry_layer)) + 1
+        starts = np.concatenate(([0], bounds))
+        stops = np.concatenate((bounds, [len(entry_layer)]))
+
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            res = entry_result[start:stop]
+            players = entry_player[start:stop]
+            side_a = entry_side[start:stop] > 0
+            local, inverse = np.unique(res, return_inverse=True)
+            current = ratings[players]
+            sum_a = np.bincount(inverse, weights=np.where(side_a, current, 0.0), minlength=len(local))
+            sum_b = np.bincount(inverse, weights=np.where(side_a, 0.0, current), minlength=len(local))
+            count_a = np.bincount(inverse, weights=side_a.astype(np.float64), minlength=len(local))
+            count_b = np.bincount(inverse, weights=(~side_a).astype(np.float64), minlength=len(local))
+            expected = 1 / (1 + np.power(10.0, (sum_b / count_b - sum_a / count_a) / 400))
+            delta = np.rint(k * (outcomes[local] - expected))
+            ratings[players] += np.where(side_a, delta[inverse], -delta[inverse])
+
+    signed = entry_side * (outcomes[entry_result] - 0.5) if len(entry_result) else np.zeros(0)
+    played = np.bincount(entry_player, minlength=n_players)
+    wins = np.bincount(entry_player[signed > 0], minlength=n_players)
+    losses = np.bincount(entry_player[signed < 0], minlength=n_players)
+    return ratings.astype(np.int64), played, wins, losses
+
+
+async def load_history(db: AsyncSession) -> Tuple[List[int], Dict[str, list]]:
+    """User ids and the replay arrays for every stored result, in result order
+
+    Archived results keep their ids, so hot and archive rows merge back
+    into submission order.
+    """
+    user_ids = (await db.execute(select(User.id).order_by(User.id))).scalars().all()
+    index = {user_id: i for i, user_id in enumerate(user_ids)}
+
+    history = {"entry_result": [], "entry_player": [], "entry_side": [], "outcomes": []}
+    last_result = None
+    entries = union_all(*(
+        select(
+            result.id, result.score_a, result.score_b,
+            player.id.label("player_row"), player.user_id, player.team
+        )
+        .join(player, player.match_id == result.match_id)
+        .where(player.team.in_(TEAMS))
+        for result, player in ((MatchResult, MatchPlayer), (MatchResultArchive, MatchPlayerArchive))
+    )).subquery()
+    rows = await db.stream(
+        select(entries)
+        .order_by(entries.c.id, entries.c.player_row)
+        .execution_options(yield_per=10000)
+    )
+    async for row in rows:
+        if row.id != last_result:
+            last_result = row.id
+            history["outcomes"].append(outcome(row.score_a, row.score_b))
+        history["entry_result"].append(len(history["outcomes"]) - 1)
+        history["entry_player"].append(index[row.user_id])
+        history["entry_side"].append(1 if row.team == "A" else -1)
+    return user_ids, history
+
+
+async def recompute_all(db: AsyncSession, batch_size: int = 5000) -> int:
+    """Replay every result from the initial rating and rewrite users; returns users updated"""
+    user_ids, history = await load_history(db)
+    ratings, played, wins, losses = replay(
+        initial=[settings.RATING_INITIAL] * len(user_ids), **history
+    )
+    rows = [
+        {"id": user_id, "rating": rating, "matches_played": p, "wins": w, "losses": l}
+        for user_id, rating, p, w, l in zip(
+            user_ids, ratings.tolist(), played.tolist(), wins.tolist(), losses.tolist()
+        )
+    ]
+    # ORM bulk UPDATE by primary key: one executemany per batch
+    for start in range(0, len(rows), batch_size):
+        await db.execute(update(User), rows[start:start + batch_size])
+    await db.commit()
+    return len(rows)
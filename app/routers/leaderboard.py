@@ -1,29 +1,41 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from fastapi import APIRouter, Depends, Query, Request
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app.models import User
-from app.auth import get_current_user
+from app.auth import CurrentUser, get_current_user
+from app.ranking import ranking
+from app.cache import LEADERBOARD_TAG, response_cache
+from app.pagination import decode_cursor, encode_cursor
 
 router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
 
 
 @router.get("/")
 async def get_leaderboard(
+        request: Request,
         limit: int = Query(100, ge=1, le=500),
         offset: int = Query(0, ge=0),
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+        db: AsyncSession = Depends(get_db),
+        current_user: CurrentUser = Depends(get_current_user)
 ):
     """Get leaderboard sorted by rating"""
-    users = db.query(User).order_by(
-        User.rating.desc(),
-        User.wins.desc(),
-        User.matches_played.desc()
-    ).offset(offset).limit(limit).all()
+    # The current user's rank is part of the body, so entries vary per user
+    cached = await response_cache.lookup(request, vary=current_user.id)
+    if cached is not None:
+        return cached
 
+    # Served from the in-process ranking: the table is read once, after
+    # that pages, total and rank are O(log n) lookups
+    await ranking.ensure_loaded(db)
+
+    if cursor:
+        # (rating, wins, matches_played, id) of the last row already shown
+        offset = ranking.position_after(decode_cursor(cursor, int, int, int, int))
+
+    page = ranking.page(offset, limit)
     result = []
-    for i, user in enumerate(users, offset + 1):
+    for i, user in enumerate(page, offset + 1):
         result.append({
             "rank": i,
             "id": user.id,
@@ -37,13 +49,14 @@ async def get_leaderboard(
         })
 
     # Get current user rank
-    current_user_rank = db.query(func.count(User.id)).filter(
-        User.rating > current_user.rating
-    ).scalar() + 1 if current_user else 0
+    current_user_rank = ranking.rating_rank(current_user.rating) if current_user else 0
 
-    return {
+    return await response_cache.store_response(request, {
         "leaderboard": result,
-        "total": db.query(func.count(User.id)).scalar(),
+        "total": len(ranking),
+        "next_cursor": encode_cursor((
+            page[-1].rating, page[-1].wins, page[-1].matches_played, page[-1].id
+        )) if len(page) == limit else None,
         "current_user_rank": current_user_rank,
         "current_user": {
             "id": current_user.id,
@@ -51,4 +64,4 @@ async def get_leaderboard(
             "rating": current_user.rating,
             "matches": current_user.matches_played
         } if current_user else None
-    }
\ No newline at end of file
+    }, tags=[LEADERBOARD_TAG], vary=current_user.id)
@@ -1,29 +1,148 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from sqlalchemy import and_, case, delete, func, literal, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+import math
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.database import get_db
-from app.models import Match, MatchPlayer, User
-from app.schemas import Match as MatchSchema, MatchCreate
-from app.auth import get_current_user
+from app.models import Match, MatchArchive, MatchPlayer, MatchPlayerArchive, User
+from app.schemas import (
+    Match as MatchSchema, MatchCreate, MatchDetail, MatchPlayerDetail, MatchResult as MatchResultSchema,
+    MatchResultCreate, PlayerUser, RatingChange, TeamBalanceRequest, TeamSplit, UserBrief
+)
+from app.auth import CurrentUser, get_current_user, get_stream_user
+from app.events import city_topic, event_bus, match_topic
+from app.cache import match_tag, matches_tag, response_cache, user_tag
 from app.config import settings
+from app.limits import rate_limit
+from app import geo, rating, teams
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
 
 router = APIRouter(prefix="/matches", tags=["matches"])
 
 
+def _match_list_query():
+    """Select the match columns needed for list responses"""
+    return select(
+        Match.id,
+        Match.title,
+        Match.stadium,
+        Match.city,
+        Match.date_time,
+        Match.format,
+        Match.max_players,
+        Match.status,
+        Match.created_by,
+        Match.latitude,
+        Match.longitude,
+        Match.created_at,
+        Match.players_count,
+    )
+
+
+async def _is_joined(db: AsyncSession, match_id: int, user_id: int) -> bool:
+    return (await db.execute(
+        select(MatchPlayer.id).where(
+            MatchPlayer.match_id == match_id,
+            MatchPlayer.user_id == user_id
+        )
+    )).first() is not None
+
+
+async def _invalidate_match(match_id: int, city: Optional[str]):
+    """Drop cached responses that show this match"""
+    await response_cache.invalidate(match_tag(match_id), matches_tag(city), matches_tag())
+
+
+async def _balance_teams(db: AsyncSession, match_id: int, together=()) -> TeamSplit:
+    """Assign A/B by rating, commit and tell the match's subscribers"""
+    split = await teams.assign_teams(db, match_id, together)
+    await db.commit()
+    result = TeamSplit(
+        team_a=split.team_a,
+        team_b=split.team_b,
+        rating_a=split.rating_a,
+        rating_b=split.rating_b,
+        difference=split.difference
+    )
+    await response_cache.invalidate(match_tag(match_id))
+    await event_bus.publish({"type": "teams_balanced", "match_id": match_id, **result.model_dump()}, match_topic(match_id))
+    return result
+
+
+def _match_detail_query(match, match_player, match_id: int):
+    """The match, its creator and every player with their user, in one query
+
+    ``match``/``match_player`` are the hot models or their archive twins.
+    Match and creator columns repeat on each roster row (at most 22).
+    """
+    creator = aliased(User)
+    player = aliased(User)
+    return (
+        select(
+            match.id, match.title, match.stadium, match.city, match.date_time,
+            match.format, match.max_players, match.status, match.latitude,
+            match.longitude, match.created_at, match.players_count,
+            creator.id.label("creator_id"),
+            creator.first_name.label("creator_first_name"),
+            creator.username.label("creator_username"),
+            creator.photo_url.label("creator_photo_url"),
+            match_player.id.label("mp_id"),
+            match_player.team.label("mp_team"),
+            match_player.joined_at.label("mp_joined_at"),
+            player.id.label("player_id"),
+            player.first_name.label("player_first_name"),
+            player.username.label("player_username"),
+            player.photo_url.label("player_photo_url"),
+            player.rating.label("player_rating")
+        )
+        .outerjoin(creator, creator.id == match.created_by)
+        .outerjoin(match_player, match_player.match_id == match.id)
+        .outerjoin(player, player.id == match_player.user_id)
+        .where(match.id == match_id)
+        .order_by(match_player.joined_at, match_player.id)
+    )
+
+
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def _event_stream(*topics: str) -> StreamingResponse:
+    async def stream():
+        # Tell EventSource how long to wait before reconnecting
+        yield "retry: 3000\n\n"
+        async for message in event_bus.subscribe(*topics, heartbeat=SSE_HEARTBEAT_SECONDS):
+            # Comments keep proxies from closing an idle connection
+            yield f"data: {message}\n\n" if message is not None else ": ping\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/", response_model=List[MatchSchema])
 async def get_matches(
+        request: Request,
         city: Optional[str] = Query(None, description="Filter by city"),
         format: Optional[str] = Query(None, description="Filter by format"),
         date: Optional[str] = Query(None, description="Filter by date"),
         status: Optional[str] = Query("open", description="Filter by status"),
         limit: int = Query(50, ge=1, le=100),
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+        db: AsyncSession = Depends(get_db),
+        current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Get all matches with filters"""
-    query = db.query(Match)
+    """Get all matches with filters, paged by (date_time, id)"""
+    cached = await response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    query = _match_list_query()
 
     if city:
         query = query.filter(Match.city == city)
@@ -40,48 +159,149 @@ async def get_matches(
         except:
             pass
     if status:
-        query = query.filter(Match.status == status)
+        # Rendered inline so the planner can pick the partial index on open matches
+        query = query.filter(Match.status == literal(status, literal_execute=True))
+    if cursor:
+        after = decode_cursor(cursor, datetime.fromisoformat, int)
+        query = query.filter(tuple_(Match.date_time, Match.id) > after)
+
+    rows = (await db.execute(
+        query.order_by(Match.date_time, Match.id).limit(limit)
+    )).all()
+
+    headers = {}
+    if len(rows) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor((rows[-1].date_time, rows[-1].id))
+
+    # Build the response straight from result rows
+    return await response_cache.store_response(
+        request, [row._asdict() for row in rows], tags=[matches_tag(city)], headers=headers
+    )
 
-    matches = query.order_by(Match.date_time).limit(limit).all()
 
-    # Add players count
-    result = []
-    for match in matches:
-        match_dict = {
-            "id": match.id,
-            "title": match.title,
-            "stadium": match.stadium,
-            "city": match.city,
-            "date_time": match.date_time,
-            "format": match.format,
-            "max_players": match.max_players,
-            "status": match.status,
-            "created_by": match.created_by,
-            "latitude": match.latitude,
-            "longitude": match.longitude,
-            "created_at": match.created_at,
-            "players_count": len(match.players)
-        }
-        result.append(MatchSchema.model_validate(match_dict))
+@router.get("/nearby")
+async def get_nearby_matches(
+        request: Request,
+        lat: Optional[float] = Query(None, ge=-90, le=90, description="Search center latitude"),
+        lon: Optional[float] = Query(None, ge=-180, le=180, description="Search center longitude"),
+        radius: float = Query(5.0, gt=0, le=settings.NEARBY_MAX_RADIUS_KM, description="Search radius in km"),
+        bbox: Optional[str] = Query(None, description="Viewport as west,south,east,north"),
+        status: Optional[str] = Query("open", description="Filter by status"),
+        cluster: bool = Query(False, description="Group matches into geohash clusters"),
+        limit: int = Query(100, ge=1, le=500),
+        db: AsyncSession = Depends(get_db),
+        current_user: CurrentUser = Depends(get_current_user)
+):
+    """Matches inside a viewport or radius, nearest first
+
+    A viewport listed match by match may span at most
+    NEARBY_MAX_SPAN_DEG each way; a wider one is refused, and a
+    zoomed-out map asks for clusters instead, which cover any viewport.
+    Clusters come back largest first, at most ``limit`` of them.
+    """
+    if bbox:
+        try:
+            area = geo.parse_bbox(bbox)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid bbox")
+        center = (lat, lon) if lat is not None and lon is not None else area.center
+        span = max(area.max_lat - area.min_lat, area.max_lon - area.min_lon)
+        if not cluster and span > settings.NEARBY_MAX_SPAN_DEG:
+            raise HTTPException(status_code=400, detail="Viewport too large, request clusters instead")
+    elif lat is not None and lon is not None:
+        area = geo.radius_bbox(lat, lon, radius)
+        center = (lat, lon)
+    else:
+        raise HTTPException(status_code=400, detail="Either bbox or lat and lon are required")
+
+    cached = await response_cache.lookup(request)
+    if cached is not None:
+        return cached
+    # Viewports cross city borders, so any match write invalidates them
+    tags = [matches_tag()]
+
+    # Each covering cell is its own range scan on the (status, geohash)
+    # index; status sits inside every OR term so the planner can use it
+    status_filter = [Match.status == status] if status else []
+    filters = [
+        or_(*(
+            and_(*status_filter, Match.geohash >= cell, Match.geohash < geo.prefix_upper_bound(cell))
+            for cell in geo.cover(area)
+        )),
+        Match.latitude.between(area.min_lat, area.max_lat),
+        Match.longitude.between(area.min_lon, area.max_lon)
+    ]
+
+    if cluster:
+        precision = geo.cluster_precision(area)
+        cell = func.substr(Match.geohash, 1, precision).label("cell")
+        rows = (await db.execute(
+            select(
+                cell,
+                func.count(Match.id).label("count"),
+                func.avg(Match.latitude).label("latitude"),
+                func.avg(Match.longitude).label("longitude"),
+                func.min(Match.id).label("match_id")
+            ).where(*filters).group_by(cell).order_by(func.count(Match.id).desc()).limit(limit)
+        )).all()
+        return await response_cache.store_response(request, {"clusters": [
+            {
+                "geohash": row.cell,
+                "count": row.count,
+                "latitude": row.latitude,
+                "longitude": row.longitude,
+                "match_id": row.match_id if row.count == 1 else None
+            }
+            for row in rows
+        ]}, tags=tags)
+
+    # Nearest ``limit`` by flat-earth distance: over an area this small
+    # it ranks matches as haversine does, bar near-ties
+    lat_scale = math.cos(math.radians(center[0]))
+    flat_distance = (
+        (Match.latitude - center[0]) * (Match.latitude - center[0])
+        + (Match.longitude - center[1]) * lat_scale * (Match.longitude - center[1]) * lat_scale
+    )
+    rows = (await db.execute(_match_list_query().where(*filters).order_by(flat_distance).limit(limit))).all()
 
-    return result
+    # A radius search scanned its bounding box: trim to the circle, then sort
+    result = []
+    for row in rows:
+        distance = geo.haversine_km(center[0], center[1], row.latitude, row.longitude)
+        if bbox or distance <= radius:
+            match = row._asdict()
+            match["distance_km"] = round(distance, 3)
+            result.append(match)
+    result.sort(key=lambda match: match["distance_km"])
+    return await response_cache.store_response(request, {"matches": result}, tags=tags)
+
+
+@router.get("/feed")
+async def match_feed(
+        city: str = Query(settings.DEFAULT_CITY, description="City to follow"),
+        current_user: CurrentUser = Depends(get_stream_user)
+):
+    """Server-Sent Events: new matches and roster changes in a city"""
+    return _event_stream(city_topic(city))
 
 
-@router.post("/", response_model=MatchSchema)
+@router.post("/", response_model=MatchSchema, dependencies=[Depends(rate_limit("write"))])
 async def create_match(
         match: MatchCreate,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        db: AsyncSession = Depends(get_db),
+        current_user: CurrentUser = Depends(get_current_user)
 ):
     """Create a new match"""
     db_match = Match(
         **match.model_dump(),
+        geohash=geo.encode(match.latitude, match.longitude)
+        if match.latitude is not None and match.longitude is not None else None,
         created_by=current_user.id,
-        status="open"
+        status="open",
+        players_count=1
     )
     db.add(db_match)
-    db.commit()
-    db.refresh(db_match)
+    await db.flush()
 
     # Auto-join creator
     match_player = MatchPlayer(
@@ -89,156 +309,341 @@ async def create_match(
         user_id=current_user.id
     )
     db.add(match_player)
-    db.commit()
-
-    # Add players count
-    match_dict = db_match.__dict__
-    match_dict['players_count'] = 1
-
-    return MatchSchema.model_validate(match_dict)
+    await db.commit()
+    await db.refresh(db_match)
+
+    created = MatchSchema.model_validate(db_match)
+    await _invalidate_match(created.id, created.city)
+    await event_bus.publish(
+        {"type": "match_created", "match": created.model_dump(mode="json")},
+        city_topic(created.city)
+    )
+    return created
 
 
-@router.get("/{match_id}")
+@router.get("/{match_id}", response_model=MatchDetail)
 async def get_match(
         match_id: int,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        request: Request,
+        db: AsyncSession = Depends(get_db),
+        current_user: CurrentUser = Depends(get_current_user)
 ):
     """Get match details"""
-    match = db.query(Match).filter(Match.id == match_id).first()
-    if not match:
+    cached = await response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    rows = (await db.execute(_match_detail_query(Match, MatchPlayer, match_id))).all()
+    if not rows:
+        # Old finished games live in the archive; only misses pay for this
+        rows = (await db.execute(_match_detail_query(MatchArchive, MatchPlayerArchive, match_id))).all()
+    if not rows:
         raise HTTPException(status_code=404, detail="Match not found")
 
-    # Get players with user info
-    players = []
-    for mp in match.players:
-        user = db.query(User).filter(User.id == mp.user_id).first()
-        if user:
-            players.append({
-                "id": mp.id,
-                "user": {
-                    "id": user.id,
-                    "first_name": user.first_name,
-                    "username": user.username,
-                    "photo_url": user.photo_url,
-                    "rating": user.rating
-                },
-                "team": mp.team,
-                "joined_at": mp.joined_at
-            })
-
-    # Get creator info
-    creator = db.query(User).filter(User.id == match.created_by).first()
-
-    return {
-        "id": match.id,
-        "title": match.title,
-        "stadium": match.stadium,
-        "city": match.city,
-        "date_time": match.date_time,
-        "format": match.format,
-        "max_players": match.max_players,
-        "status": match.status,
-        "latitude": match.latitude,
-        "longitude": match.longitude,
-        "created_at": match.created_at,
-        "creator": {
-            "id": creator.id,
-            "first_name": creator.first_name,
-            "username": creator.username,
-            "photo_url": creator.photo_url
-        } if creator else None,
-        "players": players,
-        "players_count": len(players)
-    }
-
-
-@router.post("/{match_id}/join")
+    match = rows[0]
+    detail = MatchDetail(
+        id=match.id,
+        title=match.title,
+        stadium=match.stadium,
+        city=match.city,
+        date_time=match.date_time,
+        format=match.format,
+        max_players=match.max_players,
+        status=match.status,
+        latitude=match.latitude,
+        longitude=match.longitude,
+        created_at=match.created_at,
+        creator=UserBrief(
+            id=match.creator_id,
+            first_name=match.creator_first_name,
+            username=match.creator_username,
+            photo_url=match.creator_photo_url
+        ) if match.creator_id is not None else None,
+        players=[
+            MatchPlayerDetail(
+                id=row.mp_id,
+                user=PlayerUser(
+                    id=row.player_id,
+                    first_name=row.player_first_name,
+                    username=row.player_username,
+                    photo_url=row.player_photo_url,
+                    rating=row.player_rating
+                ),
+                team=row.mp_team,
+                joined_at=row.mp_joined_at
+            )
+            for row in rows
+            if row.player_id is not None
+        ],
+        players_count=match.players_count
+    )
+    # Player names and ratings are part of the page, so profile and
+    # rating writes of any player invalidate it as well
+    tags = [match_tag(match_id)]
+    tags.extend(user_tag(player.user.id) for player in detail.players)
+    if detail.creator is not None:
+        tags.append(user_tag(detail.creator.id))
+    return await response_cache.store_response(request, detail, tags=tags)
+
+
+@router.get("/{match_id}/events")
+async def match_events(
+        match_id: int,
+        current_user: CurrentUser = Depends(get_stream_user)
+):
+    """Server-Sent Events: players joining/leaving and status flips of one match"""
+    return _event_stream(match_topic(match_id))
+
+
+@router.post("/{match_id}/join", dependencies=[Depends(rate_limit("join"))])
 async def join_match(
         match_id: int,
         team: Optional[str] = None,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        db: AsyncSession = Depends(get_db),
+        current_user: CurrentUser = Depends(get_current_user)
 ):
     """Join a match"""
-    match = db.query(Match).filter(Match.id == match_id).first()
-    if not match:
-        raise HTTPException(status_code=404, detail="Match not found")
-
-    if match.status not in ["open", "full"]:
-        raise HTTPException(status_code=400, detail="Match is not available for joining")
-
-    # Check if already joined
-    existing = db.query(MatchPlayer).filter(
-        and_(
-            MatchPlayer.match_id == match_id,
-            MatchPlayer.user_id == current_user.id
+    # Reserve a slot in a single conditional UPDATE so concurrent joins
+    # can never push players_count past max_players
+    reserved = (await db.execute(
+        update(Match)
+        .where(
+            Match.id == match_id,
+            Match.status == "open",
+            Match.players_count < Match.max_players
         )
-    ).first()
-
-    if existing:
-        raise HTTPException(status_code=400, detail="Already joined this match")
-
-    # Check max players
-    if len(match.players) >= match.max_players:
-        match.status = "full"
-        db.commit()
+        .values(
+            players_count=Match.players_count + 1,
+            status=case(
+                (Match.players_count + 1 >= Match.max_players, "full"),
+                else_=Match.status
+            )
+        )
+        .returning(Match.players_count, Match.status, Match.city)
+        .execution_options(synchronize_session=False)
+    )).first()
+
+    if not reserved:
+        await db.rollback()
+        match = (await db.execute(
+            select(Match.status).where(Match.id == match_id)
+        )).first()
+        if not match:
+            raise HTTPException(status_code=404, detail="Match not found")
+        if match.status not in ["open", "full"]:
+            raise HTTPException(status_code=400, detail="Match is not available for joining")
+        if await _is_joined(db, match_id, current_user.id):
+            raise HTTPException(status_code=400, detail="Already joined this match")
         raise HTTPException(status_code=400, detail="Match is full")
 
-    # Join match
-    match_player = MatchPlayer(
+    # The unique (match_id, user_id) constraint rejects double joins;
+    # rolling back also releases the reserved slot
+    entry = MatchPlayer(
         match_id=match_id,
         user_id=current_user.id,
         team=team
     )
-    db.add(match_player)
+    db.add(entry)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Already joined this match")
 
-    # Update match status if full
-    if len(match.players) + 1 >= match.max_players:
-        match.status = "full"
+    await _invalidate_match(match_id, reserved.city)
+    await event_bus.publish(
+        {
+            "type": "player_joined",
+            "match_id": match_id,
+            "joined_at": entry.joined_at.isoformat(),
+            "players_count": reserved.players_count,
+            "status": reserved.status,
+            "player": {
+                "user_id": current_user.id,
+                "first_name": current_user.first_name,
+                "username": current_user.username,
+                "photo_url": current_user.photo_url,
+                "rating": current_user.rating,
+                "team": team
+            }
+        },
+        match_topic(match_id), city_topic(reserved.city)
+    )
 
-    db.commit()
+    # The last slot was just taken: split the final roster into even teams
+    if reserved.status == "full" and settings.AUTO_BALANCE_TEAMS:
+        try:
+            await _balance_teams(db, match_id)
+        except teams.BalanceError:
+            await db.rollback()
 
     return {"message": "Successfully joined the match", "success": True}
 
 
-@router.post("/{match_id}/leave")
+@router.post("/{match_id}/leave", dependencies=[Depends(rate_limit("join"))])
 async def leave_match(
         match_id: int,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        db: AsyncSession = Depends(get_db),
+        current_user: CurrentUser = Depends(get_current_user)
 ):
     """Leave a match"""
-    match_player = db.query(MatchPlayer).filter(
-        and_(
+    # Rosters of finished matches are rating history; they stay as they are
+    removed = (await db.execute(
+        delete(MatchPlayer).where(
             MatchPlayer.match_id == match_id,
-            MatchPlayer.user_id == current_user.id
+            MatchPlayer.user_id == current_user.id,
+            MatchPlayer.match_id.in_(
+                select(Match.id).where(Match.id == match_id, Match.status.in_(["open", "full"]))
+            )
         )
-    ).first()
-
-    if not match_player:
+        .returning(MatchPlayer.joined_at)
+        .execution_options(synchronize_session=False)
+    )).first()
+
+    if not removed:
+        await db.rollback()
+        match = (await db.execute(
+            select(Match.status).where(Match.id == match_id)
+        )).first()
+        if match and match.status not in ["open", "full"] and await _is_joined(db, match_id, current_user.id):
+            raise HTTPException(status_code=400, detail="Match is already over")
         raise HTTPException(status_code=404, detail="Not joined this match")
 
     # Check if user is creator
-    match = db.query(Match).filter(Match.id == match_id).first()
+    match = (await db.execute(
+        select(Match.created_by, Match.city, Match.title).where(Match.id == match_id)
+    )).first()
     if match and match.created_by == current_user.id:
-        # If creator leaves, delete the match
-        db.delete(match)
-        db.commit()
+        # If creator leaves, delete the match; the rest of the roster is notified
+        player_ids = (await db.execute(
+            delete(MatchPlayer)
+            .where(MatchPlayer.match_id == match_id)
+            .returning(MatchPlayer.user_id)
+            .execution_options(synchronize_session=False)
+        )).scalars().all()
+        await db.execute(delete(Match).where(Match.id == match_id))
+        await db.commit()
+        await _invalidate_match(match_id, match.city)
+        await event_bus.publish(
+            {"type": "match_deleted", "match_id": match_id, "title": match.title, "player_ids": player_ids},
+            match_topic(match_id), city_topic(match.city)
+        )
         return {"message": "Match deleted", "success": True}
 
-    db.delete(match_player)
+    # Release the slot and reopen the match if it was full
+    released = (await db.execute(
+        update(Match)
+        .where(Match.id == match_id)
+        .values(
+            players_count=Match.players_count - 1,
+            status=case((Match.status == "full", "open"), else_=Match.status)
+        )
+        .returning(Match.players_count, Match.status, Match.city)
+        .execution_options(synchronize_session=False)
+    )).first()
+    await db.commit()
+
+    if released:
+        await _invalidate_match(match_id, released.city)
+        await event_bus.publish(
+            {
+                "type": "player_left",
+                "match_id": match_id,
+                "joined_at": removed.joined_at and removed.joined_at.isoformat(),
+                "players_count": released.players_count,
+                "status": released.status,
+                "user_id": current_user.id
+            },
+            match_topic(match_id), city_topic(released.city)
+        )
 
-    # Update match status
-    if match and match.status == "full":
-        match.status = "open"
+    return {"message": "Successfully left the match", "success": True}
 
-    db.commit()
 
-    return {"message": "Successfully left the match", "success": True}
+@router.post("/{match_id}/balance", response_model=TeamSplit, dependencies=[Depends(rate_limit("write"))])
+async def balance_teams(
+        match_id: int,
+        request: Optional[TeamBalanceRequest] = None,
+        db: AsyncSession = Depends(get_db),
+        current_user: CurrentUser = Depends(get_current_user)
+):
+    """Split the roster into teams A and B with the closest total rating (creator only)"""
+    match = (await db.execute(
+        select(Match.created_by, Match.status).where(Match.id == match_id)
+    )).first()
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+    if match.created_by != current_user.id:
+        raise HTTPException(status_code=403, detail="Only the creator can balance teams")
+    if match.status not in ["open", "full"]:
+        raise HTTPException(status_code=400, detail="Match is already over")
+
+    try:
+        return await _balance_teams(db, match_id, request.together if request else ())
+    except teams.BalanceError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post(
+    "/{match_id}/result", response_model=MatchResultSchema, dependencies=[Depends(rate_limit("write"))]
+)
+async def submit_result(
+        match_id: int,
+        result: MatchResultCreate,
+        db: AsyncSession = Depends(get_db),
+        current_user: CurrentUser = Depends(get_current_user)
+):
+    """Record the final score (creator only) and update player ratings"""
+    match = (await db.execute(
+        select(Match.created_by, Match.status, Match.city).where(Match.id == match_id)
+    )).first()
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+    if match.created_by != current_user.id:
+        raise HTTPException(status_code=403, detail="Only the creator can submit the result")
+    # "finished" may also come from the scheduler closing the time slot;
+    # the unique match_id on match_results rejects a second result
+    if match.status not in ["open", "full", "finished"]:
+        raise HTTPException(status_code=400, detail="Match was cancelled")
+
+    try:
+        changes = await rating.record_result(db, match_id, result.score_a, result.score_b, current_user.id)
+        await db.commit()
+    except rating.RatingError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Result already submitted")
+
+    await rating.publish_changes(changes)
+    await _invalidate_match(match_id, match.city)
+    response = MatchResultSchema(
+        match_id=match_id,
+        score_a=result.score_a,
+        score_b=result.score_b,
+        changes=[
+            RatingChange(
+                user_id=change.entry.id,
+                team=change.team,
+                rating_before=change.rating_before,
+                rating_after=change.entry.rating
+            )
+            for change in changes
+        ]
+    )
+    await event_bus.publish(
+        {"type": "match_finished", "status": "finished", **response.model_dump()},
+        match_topic(match_id), city_topic(match.city)
+    )
+    return response
 
 
 @router.get("/cities/list")
-async def get_cities():
+async def get_cities(request: Request):
     """Get list of available cities"""
-    return {"cities": settings.CITIES}
\ No newline at end of file
+    cached = await response_cache.lookup(request)
+    if cached is not None:
+        return cached
+    return await response_cache.store_response(request, {"cities": settings.CITIES}, tags=())
\ No newline at end of file
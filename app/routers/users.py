@@ -1,18 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
 from app.database import get_db
-from app.models import User, Match, MatchPlayer
+from app.models import User, Match, MatchArchive, MatchPlayer, MatchPlayerArchive
 from app.schemas import User as UserSchema
-from app.auth import get_current_user
+from app.auth import CurrentUser, get_current_user
+from app.limits import rate_limit
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.serialization import FastJSONResponse
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+# Archived matches are finished or cancelled, never in these states
+HOT_ONLY_STATUSES = ("open", "full")
+
 
 @router.get("/me", response_model=UserSchema)
 async def get_current_user_info(
-        current_user: User = Depends(get_current_user)
+        current_user: CurrentUser = Depends(get_current_user)
 ):
     """Get current user info"""
     return current_user
@@ -21,55 +28,74 @@ async def get_current_user_info(
 @router.get("/{user_id}", response_model=UserSchema)
 async def get_user(
         user_id: int,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        db: AsyncSession = Depends(get_db),
+        current_user: CurrentUser = Depends(get_current_user)
 ):
     """Get user by ID"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
-@router.get("/{user_id}/matches")
+@router.get("/{user_id}/matches", dependencies=[Depends(rate_limit("history"))])
 async def get_user_matches(
         user_id: int,
         status: str = "all",
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        date_from: Optional[date] = Query(None, description="First day to include"),
+        date_to: Optional[date] = Query(None, description="Last day to include"),
+        limit: int = Query(50, ge=1, le=100),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+        db: AsyncSession = Depends(get_db),
+        current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Get user's matches"""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    """Get user's matches, newest first, paged by (date_time, id)"""
+    before = decode_cursor(cursor, datetime.fromisoformat, int) if cursor else None
 
-    # Get matches where user participated
-    participations = db.query(MatchPlayer).filter(
-        MatchPlayer.user_id == user_id
-    ).all()
+    # One join over match_players(user_id, match_id); players_count is a
+    # column, so the cost does not grow with the user's history
+    def branch(match, match_player):
+        query = select(
+            match.id,
+            match.title,
+            match.stadium,
+            match.city,
+            match.date_time,
+            match.format,
+            match.max_players,
+            match.status,
+            match.created_by,
+            match.players_count
+        ).join(match_player, match_player.match_id == match.id).where(match_player.user_id == user_id)
 
-    match_ids = [p.match_id for p in participations]
-    query = db.query(Match).filter(Match.id.in_(match_ids)) if match_ids else db.query(Match).filter(False)
+        if status != "all":
+            query = query.where(match.status == status)
+        if date_from:
+            query = query.where(match.date_time >= datetime.combine(date_from, time.min))
+        if date_to:
+            query = query.where(match.date_time < datetime.combine(date_to + timedelta(days=1), time.min))
+        if before:
+            query = query.where(tuple_(match.date_time, match.id) < before)
+        return query.order_by(match.date_time.desc(), match.id.desc()).limit(limit)
 
-    if status != "all":
-        query = query.filter(Match.status == status)
+    if status in HOT_ONLY_STATUSES:
+        query = branch(Match, MatchPlayer)
+    else:
+        # Each side stops after ``limit`` rows on its own index; the merge
+        # sorts at most 2 * limit rows
+        hot = branch(Match, MatchPlayer).subquery()
+        cold = branch(MatchArchive, MatchPlayerArchive).subquery()
+        merged = union_all(select(hot), select(cold)).subquery()
+        query = select(merged).order_by(merged.c.date_time.desc(), merged.c.id.desc()).limit(limit)
+    rows = (await db.execute(query)).all()
 
-    matches = query.order_by(Match.date_time.desc()).all()
+    # Only an empty page needs to tell "no matches" from "no such user"
+    if not rows and not await db.get(User, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
 
-    result = []
-    for match in matches:
-        match_dict = {
-            "id": match.id,
-            "title": match.title,
-            "stadium": match.stadium,
-            "city": match.city,
-            "date_time": match.date_time,
-            "format": match.format,
-            "max_players": match.max_players,
-            "status": match.status,
-            "created_by": match.created_by,
-            "players_count": len(match.players)
-        }
-        result.append(match_dict)
+    headers = {}
+    if len(rows) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor((rows[-1].date_time, rows[-1].id))
 
-    return result
\ No newline at end of file
+    # Rows are already in response shape: encode them once, no re-validation
+    return FastJSONResponse([row._asdict() for row in rows], headers=headers)
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import REGISTRY
+from app.models import ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+JOB_RUNS = REGISTRY.counter("scheduler_job_runs_total", "Background job runs by outcome", ("job", "status"))
+JOB_DURATION = REGISTRY.histogram(
+    "scheduler_job_duration_seconds", "Background job run time", ("job",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+)
+
+# A handler gets its own session and may return the time it next needs
+# to run, when that is earlier than its regular interval
+Handler = Callable[[AsyncSession], Awaitable[Optional[datetime]]]
+
+
+class _Job(NamedTuple):
+    name: str
+    interval: int
+    handler: Handler
+
+
+class Scheduler:
+    """Periodic async jobs whose schedule lives in ``scheduled_jobs``
+
+    Every worker runs the loop; a job is claimed with a conditional UPDATE
+    that takes a lease (locked_until), so one worker runs it per due time
+    and a job left running by a crashed worker is retried once the lease
+    expires. Next run times are persisted, so restarts keep the schedule.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._jobs: Dict[str, _Job] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def job(self, name: str, every: int):
+        """Register ``handler`` to run every ``every`` seconds"""
+        def decorator(handler: Handler) -> Handler:
+            self._jobs[name] = _Job(name, every, handler)
+            return handler
+        return decorator
+
+    async def sync_jobs(self):
+        """Create rows for newly registered jobs and store changed intervals"""
+        async with self.session_factory() as db:
+            rows = {
+                job.name: job
+                for job in (await db.execute(
+                    select(ScheduledJob).where(ScheduledJob.name.in_(list(self._jobs)))
+                )).scalars()
+            }
+            now = datetime.utcnow()
+            for job in self._jobs.values():
+                row = rows.get(job.name)
+                if row is None:
+                    db.add(ScheduledJob(name=job.name, interval_seconds=job.interval, next_run_at=now))
+                elif row.interval_seconds != job.interval:
+                    row.interval_seconds = job.interval
+                    row.next_run_at = min(row.next_run_at, now + timedelta(seconds=job.interval))
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Another worker registered them first
+                await db.rollback()
+
+    async def _claim(self, db: AsyncSession, name: str, now: datetime, due_only: bool = True) -> bool:
+        conditions = [
+            ScheduledJob.name == name,
+            or_(ScheduledJob.locked_until.is_(None), ScheduledJob.locked_until < now)
+        ]
+        if due_only:
+            conditions.append(ScheduledJob.next_run_at <= now)
+        claimed = (await db.execute(
+            update(ScheduledJob)
+            .where(*conditions)
+            .values(locked_until=now + timedelta(seconds=settings.SCHEDULER_LEASE_SECONDS))
+            .execution_options(synchronize_session=False)
+        )).rowcount
+        await db.commit()
+        return claimed == 1
+
+    async def _execute(self, job: _Job):
+        started = time.perf_counter()
+        requested, error = None, None
+        try:
+            async with self.session_factory() as db:
+                requested = await job.handler(db)
+        except Exception as e:
+            logger.exception("Job %s failed", job.name)
+            error = f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - started
+        JOB_RUNS.inc(job=job.name, status="error" if error else "ok")
+        JOB_DURATION.observe(elapsed, job=job.name)
+
+        now = datetime.utcnow()
+        next_run = now + timedelta(seconds=job.interval)
+        if requested is not None:
+            next_run = max(min(next_run, requested), now)
+        async with self.session_factory() as db:
+            await db.execute(
+                update(ScheduledJob)
+                .where(ScheduledJob.name == job.name)
+                .values(
+                    next_run_at=next_run,
+                    locked_until=None,
+                    last_run_at=now,
+                    last_status="error" if error else "ok",
+                    last_error=error,
+                    run_count=ScheduledJob.run_count + 1
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def run_due(self) -> List[str]:
+        """Run every job that is due and not leased elsewhere; returns their names"""
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            due = (await db.execute(
+                select(ScheduledJob.name).where(
+                    ScheduledJob.name.in_(list(self._jobs)),
+                    ScheduledJob.next_run_at <= now
+                ).order_by(ScheduledJob.next_run_at)
+            )).scalars().all()
+            claimed = [name for name in due if await self._claim(db, name, now)]
+        for name in claimed:
+            await self._execute(self._jobs[name])
+        return claimed
+
+    async def run_now(self, name: str) -> bool:
+        """Run one job immediately unless another worker holds it"""
+        async with self.session_factory() as db:
+            if not await self._claim(db, name, datetime.utcnow(), due_only=False):
+                return False
+        await self._execute(self._jobs[name])
+        return True
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_due()
+            except Exception:
+                logger.exception("Scheduler tick failed")
+            await asyncio.sleep(settings.SCHEDULER_TICK_SECONDS)
+
+    async def start(self):
+        if self._task is None:
+            await self.sync_jobs()
+            self._task = asyncio.create_task(self._loop(), name="scheduler")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+scheduler = Scheduler()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, List
 
@@ -52,6 +52,62 @@ class Match(MatchBase):
         from_attributes = True
 
 
+class UserBrief(BaseModel):
+    id: int
+    first_name: Optional[str] = None
+    username: Optional[str] = None
+    photo_url: Optional[str] = None
+
+
+class PlayerUser(UserBrief):
+    rating: Optional[int] = 0
+
+
+class MatchPlayerDetail(BaseModel):
+    id: int
+    user: PlayerUser
+    team: Optional[str] = None
+    joined_at: Optional[datetime] = None
+
+
+class MatchDetail(MatchBase):
+    id: int
+    status: str
+    created_at: datetime
+    creator: Optional[UserBrief] = None
+    players: List[MatchPlayerDetail] = []
+    players_count: int = 0
+
+
+class MatchResultCreate(BaseModel):
+    score_a: int = Field(ge=0)
+    score_b: int = Field(ge=0)
+
+
+class RatingChange(BaseModel):
+    user_id: int
+    team: str
+    rating_before: int
+    rating_after: int
+
+
+class MatchResult(MatchResultCreate):
+    match_id: int
+    changes: List[RatingChange] = []
+
+
+class TeamBalanceRequest(BaseModel):
+    together: List[List[int]] = []  # groups of user ids kept on one team
+
+
+class TeamSplit(BaseModel):
+    team_a: List[int]
+    team_b: List[int]
+    rating_a: int
+    rating_b: int
+    difference: int
+
+
 class MatchPlayerBase(BaseModel):
     match_id: int
     user_id: int
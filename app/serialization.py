@@ -0,0 +1,96 @@
+import json
+import logging
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, List
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+if orjson is None:
+    logger.warning("orjson is not installed; responses are encoded with the slower stdlib json")
+
+
+@lru_cache(maxsize=None)
+def type_adapter(tp: Any) -> TypeAdapter:
+    """TypeAdapter per type; building one compiles a validator and serializer"""
+    return TypeAdapter(tp)
+
+
+def prebuild_adapters(module) -> int:
+    """Build the list adapters for every model in ``module`` ahead of time
+
+    ``dumps`` would otherwise compile each one on the first response
+    that returns a list of that model. Returns how many were built.
+    """
+    models = [
+        value for value in vars(module).values()
+        if isinstance(value, type) and issubclass(value, BaseModel) and value is not BaseModel
+    ]
+    for model in models:
+        type_adapter(List[model])
+    return len(models)
+
+
+def _orjson_default(value: Any) -> Any:
+    # orjson handles dict/list/datetime/UUID natively; this covers the rest
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, tuple):
+        return list(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode a response body in one pass, without re-validating it
+
+    Pydantic models (and homogeneous lists of them) go through their
+    compiled serializer; plain rows as dicts go straight to orjson.
+    """
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+    if isinstance(content, list) and content and isinstance(content[0], BaseModel):
+        return type_adapter(List[type(content[0])]).dump_json(content)
+    if orjson is not None:
+        return orjson.dumps(content, default=_orjson_default)
+    return json.dumps(
+        content, default=_json_default, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with ``dumps``
+
+    Returning one from a route skips FastAPI's response_model validation
+    and ``jsonable_encoder``; use it where the payload is already shaped.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,481 @@
+"""State shared between API workers
+
+Whatever a worker keeps in memory (cached responses, the leaderboard,
+auth snapshots, rate limit counters, live-update subscribers) is only
+right while there is a single worker. ``state`` is where such data is
+shared: a MemoryState by default, a RedisState when REDIS_URL is set.
+Both offer the same small set of operations, named after the Redis
+commands behind them: keys with a TTL, counters, sets, locks and
+pub/sub.
+
+Pub/sub is best effort, as in Redis: a worker that is disconnected
+misses messages, and ``on_reconnect`` callbacks let it drop whatever
+those messages would have corrected.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PUBSUB_MESSAGES = REGISTRY.counter(
+    "state_pubsub_messages_total", "Pub/sub messages by direction", ("direction",)
+)  # published, received, dropped
+
+Callback = Callable[[str], None]
+
+OUTBOX_SIZE = 10000  # queued publishes and subscription changes per worker
+
+
+class LockTimeout(Exception):
+    pass
+
+
+class Lock:
+    """Mutual exclusion across workers: a key set only if absent, with a TTL
+
+    The TTL frees the lock when its holder dies; keep the critical
+    section well under it. Release only deletes the key while it still
+    holds this holder's token.
+    """
+
+    def __init__(self, state, name: str, ttl: float, timeout: Optional[float], poll: float = 0.05):
+        self.state = state
+        self.key = f"lock:{name}"
+        self.ttl = ttl
+        self.timeout = timeout
+        self.poll = poll
+        self.token = uuid.uuid4().hex.encode()
+
+    async def acquire(self) -> bool:
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not await self.state.set(self.key, self.token, ttl=self.ttl, only_new=True):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(self.poll)
+        return True
+
+    async def release(self) -> bool:
+        return await self.state.delete_if(self.key, self.token)
+
+    async def __aenter__(self):
+        if not await self.acquire():
+            raise LockTimeout(self.key)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.release()
+
+
+def _next_arrival(stored, now: float, rate: float, burst: int) -> Tuple[float, float]:
+    """GCRA step: (new theoretical arrival time, 0) or (unchanged, seconds to wait)"""
+    arrival = max(float(stored), now) if stored is not None else now
+    interval = 1 / rate
+    wait = arrival + interval - burst * interval - now
+    if wait > 0:
+        return arrival, wait
+    return arrival + interval, 0.0
+
+
+class _Subscriptions:
+    """channel -> callbacks, shared by both backends"""
+
+    def __init__(self, origin: str):
+        self.origin = origin
+        self.channels: Dict[str, List[Tuple[Callback, bool]]] = {}
+        self.reconnect_callbacks: List[Callable[[], None]] = []
+
+    def add(self, channel: str, callback: Callback, include_own: bool) -> bool:
+        """True when this is the channel's first callback"""
+        callbacks = self.channels.setdefault(channel, [])
+        callbacks.append((callback, include_own))
+        return len(callbacks) == 1
+
+    def remove(self, channel: str, callback: Callback) -> bool:
+        """True when the channel has no callbacks left"""
+        callbacks = [entry for entry in self.channels.get(channel, ()) if entry[0] is not callback]
+        if callbacks:
+            self.channels[channel] = callbacks
+            return False
+        self.channels.pop(channel, None)
+        return True
+
+    def dispatch(self, channel: str, origin: str, message: str):
+        own = origin == self.origin
+        for callback, include_own in self.channels.get(channel, ()):
+            if own and not include_own:
+                continue
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("Subscriber of %s failed", channel)
+
+
+class _State:
+    """Subscription bookkeeping and locks, common to both backends"""
+
+    shared = False
+
+    def __init__(self, origin: str):
+        self.origin = origin
+        self._subscriptions = _Subscriptions(origin)
+
+    def lock(self, name: str, ttl: float = 10, timeout: Optional[float] = 10) -> Lock:
+        return Lock(self, name, ttl, timeout)
+
+    def on_reconnect(self, callback: Callable[[], None]):
+        """Call ``callback()`` after pub/sub messages may have been lost"""
+        self._subscriptions.reconnect_callbacks.append(callback)
+
+
+class MemoryState(_State):
+    """Everything in this process: the default, and correct for one worker"""
+
+    def __init__(self):
+        super().__init__(f"{socket.gethostname()}:{os.getpid()}")
+        # key -> (value, expires_at); sets are stored as Python sets
+        self._values: Dict[str, Tuple[Any, float]] = {}
+        self._writes = 0
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def _get(self, key: str) -> Any:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._values[key]
+            return None
+        return entry[0]
+
+    def _put(self, key: str, value: Any, ttl: Optional[float]):
+        self._values[key] = (value, time.monotonic() + ttl if ttl else float("inf"))
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            now = time.monotonic()
+            self._values = {k: entry for k, entry in self._values.items() if entry[1] > now}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._get(key)
+
+    async def mget(self, *keys: str) -> List[Optional[bytes]]:
+        return [self._get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None, only_new: bool = False) -> bool:
+        if only_new and self._get(key) is not None:
+            return False
+        self._put(key, value, ttl)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        deleted = 0
+        for key in keys:
+            if self._get(key) is not None:
+                del self._values[key]
+                deleted += 1
+        return deleted
+
+    async def delete_if(self, key: str, value: bytes) -> bool:
+        """Delete ``key`` only while it still holds ``value``"""
+        if self._get(key) != value:
+            return False
+        del self._values[key]
+        return True
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Add to a counter; ``ttl`` applies when the counter is created"""
+        current = self._get(key)
+        if current is None:
+            self._put(key, amount, ttl)
+            return amount
+        value = int(current) + amount
+        self._values[key] = (value, self._values[key][1])
+        return value
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """One token from a bucket refilled at ``rate`` per second, holding ``burst``
+
+        Returns 0 when the token was taken, otherwise the seconds until
+        one is available. The bucket is kept as GCRA's theoretical
+        arrival time, a single number per key.
+        """
+        now = time.time()
+        arrival, wait = _next_arrival(self._get(key), now, rate, burst)
+        if not wait:
+            self._put(key, arrival, arrival - now)
+        return wait
+
+    async def sadd(self, key: str, *members: str, ttl: Optional[float] = None):
+        members_set = self._get(key)
+        if members_set is None:
+            members_set = set()
+        members_set.update(members)
+        self._put(key, members_set, ttl)
+
+    async def smembers(self, key: str) -> Set[str]:
+        return set(self._get(key) or ())
+
+    async def publish(self, channel: str, message: str):
+        self.publish_nowait(channel, message)
+
+    def publish_nowait(self, channel: str, message: str):
+        PUBSUB_MESSAGES.inc(direction="published")
+        self._subscriptions.dispatch(channel, self.origin, message)
+
+    def subscribe(self, channel: str, callback: Callback, include_own: bool = True):
+        """Call ``callback(message)`` for messages on ``channel``
+
+        With ``include_own=False`` messages this worker published are
+        skipped: for replicating changes the worker already applied.
+        """
+        self._subscriptions.add(channel, callback, include_own)
+
+    def unsubscribe(self, channel: str, callback: Callback):
+        self._subscriptions.remove(channel, callback)
+
+
+class RedisState(_State):
+    """The same operations on a Redis server (or anything speaking its protocol)
+
+    Keys and channels are prefixed with STATE_PREFIX. Every operation
+    is bounded by STATE_TIMEOUT, so a stuck server slows requests down
+    instead of hanging them; callers decide what a failure means.
+    ``publish_nowait`` and subscription changes go through one
+    background task, so this worker's messages arrive in the order it
+    sent them.
+    """
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "", timeout: float = 1.0):
+        from redis import asyncio as redis
+        from redis.asyncio.retry import Retry
+        from redis.backoff import NoBackoff
+        from redis.exceptions import ConnectionError as RedisConnectionError
+
+        # Unique per process start: pids repeat across containers and restarts
+        super().__init__(f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}")
+        self.prefix = prefix
+        # A burst of requests waits for a free connection (up to ``timeout``)
+        # instead of failing with "Too many connections"
+        pool = redis.BlockingConnectionPool.from_url(
+            url, max_connections=settings.REDIS_MAX_CONNECTIONS, timeout=timeout,
+            socket_timeout=timeout, socket_connect_timeout=timeout,
+            # A pooled connection the server has closed fails once; retry
+            # that on a fresh one. Timeouts are not retried.
+            retry=Retry(NoBackoff(), 1), retry_on_error=[RedisConnectionError],
+        )
+        self._redis = redis.Redis(connection_pool=pool)
+        self._pubsub = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    # Lifecycle -------------------------------------------------------------
+
+    async def start(self):
+        if self._tasks:
+            return
+        try:
+            await self._redis.ping()
+        except Exception as e:
+            # Not fatal: operations fail until it is back, pub/sub reconnects
+            logger.error("Shared state at %s is unreachable: %s", self._redis, e)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._outbox = asyncio.Queue(OUTBOX_SIZE)
+        self._tasks = [
+            asyncio.create_task(self._read_loop(), name="state-pubsub"),
+            asyncio.create_task(self._write_loop(), name="state-outbox"),
+        ]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        await self._redis.aclose()
+        await self._redis.connection_pool.disconnect()
+
+    # Keys ------------------------------------------------------------------
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(self._key(key))
+
+    async def mget(self, *keys: str) -> List[Optional[bytes]]:
+        return await self._redis.mget([self._key(key) for key in keys])
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None, only_new: bool = False) -> bool:
+        px = int(ttl * 1000) if ttl else None
+        return bool(await self._redis.set(self._key(key), value, px=px, nx=only_new))
+
+    async def delete(self, *keys: str) -> int:
+        if not keys:
+            return 0
+        return await self._redis.delete(*(self._key(key) for key in keys))
+
+    async def delete_if(self, key: str, value: bytes) -> bool:
+        from redis.exceptions import WatchError
+
+        key = self._key(key)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.get(key) != value:
+                    return False
+                pipe.multi()
+                pipe.delete(key)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        key = self._key(key)
+        if not ttl:
+            return await self._redis.incrby(key, amount)
+        # SET NX creates the counter with its TTL; INCRBY keeps it
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(key, 0, px=int(ttl * 1000), nx=True)
+            pipe.incrby(key, amount)
+            return (await pipe.execute())[1]
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        from redis.exceptions import WatchError
+
+        key = self._key(key)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            for _ in range(3):
+                try:
+                    await pipe.watch(key)
+                    now = time.time()
+                    arrival, wait = _next_arrival(await pipe.get(key), now, rate, burst)
+                    if wait:
+                        await pipe.unwatch()
+                        return wait
+                    pipe.multi()
+                    pipe.set(key, repr(arrival), px=max(1, int((arrival - now) * 1000)))
+                    await pipe.execute()
+                    return 0.0
+                except WatchError:
+                    # Another worker took from the same bucket in between
+                    continue
+        return 1 / rate
+
+    async def sadd(self, key: str, *members: str, ttl: Optional[float] = None):
+        key = self._key(key)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.sadd(key, *members)
+            if ttl:
+                pipe.pexpire(key, int(ttl * 1000))
+            await pipe.execute()
+
+    async def smembers(self, key: str) -> Set[str]:
+        return {member.decode() for member in await self._redis.smembers(self._key(key))}
+
+    # Pub/sub ---------------------------------------------------------------
+
+    async def publish(self, channel: str, message: str):
+        await self._redis.publish(self._key(channel), f"{self.origin}|{message}")
+        PUBSUB_MESSAGES.inc(direction="published")
+
+    def publish_nowait(self, channel: str, message: str):
+        self._enqueue(("publish", channel, message))
+
+    def subscribe(self, channel: str, callback: Callback, include_own: bool = True):
+        if self._subscriptions.add(channel, callback, include_own):
+            self._enqueue(("subscribe", channel, None))
+
+    def unsubscribe(self, channel: str, callback: Callback):
+        if self._subscriptions.remove(channel, callback):
+            self._enqueue(("unsubscribe", channel, None))
+
+    def _enqueue(self, item: Tuple[str, str, Optional[str]]):
+        if self._outbox is None:
+            # Not started: subscriptions are made by start(), messages have no one to reach
+            if item[0] == "publish":
+                PUBSUB_MESSAGES.inc(direction="dropped")
+            return
+        try:
+            self._outbox.put_nowait(item)
+        except asyncio.QueueFull:
+            PUBSUB_MESSAGES.inc(direction="dropped")
+
+    async def _write_loop(self):
+        for channel in list(self._subscriptions.channels):
+            await self._outbox.put(("subscribe", channel, None))
+        while True:
+            action, channel, message = await self._outbox.get()
+            try:
+                if action == "publish":
+                    await self.publish(channel, message)
+                elif action == "subscribe":
+                    await self._pubsub.subscribe(self._key(channel))
+                elif channel not in self._subscriptions.channels:
+                    await self._pubsub.unsubscribe(self._key(channel))
+            except Exception as e:
+                if action == "publish":
+                    PUBSUB_MESSAGES.inc(direction="dropped")
+                # Subscriptions are restored on reconnect, so only log
+                logger.warning("Shared state %s %s failed: %s", action, channel, e)
+
+    async def _read_loop(self):
+        prefix = len(self.prefix)
+        delay = 0.1
+        while True:
+            if not self._pubsub.subscribed:
+                await asyncio.sleep(0.1)
+                continue
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Shared state pub/sub disconnected: %s", e)
+                await self._reconnect(delay)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            PUBSUB_MESSAGES.inc(direction="received")
+            origin, _, body = message["data"].decode().partition("|")
+            self._subscriptions.dispatch(message["channel"].decode()[prefix:], origin, body)
+
+    async def _reconnect(self, delay: float):
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                # Re-subscribes every channel on the new connection
+                await self._pubsub.connect()
+                break
+            except Exception:
+                delay = min(delay * 2, 5.0)
+        logger.info("Shared state pub/sub reconnected")
+        for callback in self._subscriptions.reconnect_callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Reconnect callback failed")
+
+
+def create_state(url: Optional[str]) -> _State:
+    if not url:
+        return MemoryState()
+    return RedisState(url, prefix=settings.STATE_PREFIX, timeout=settings.STATE_TIMEOUT)
+
+
+state = create_state(settings.REDIS_URL)
@@ -0,0 +1,196 @@
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import MatchPlayer, User
+
+# Bits of DP state (units x players per team x rating sums) above which
+# the exact split is skipped for the heuristic
+DP_STATE_LIMIT = 50_000_000
+
+
+class BalanceError(ValueError):
+    pass
+
+
+class Split(NamedTuple):
+    team_a: List[int]
+    team_b: List[int]
+    rating_a: int
+    rating_b: int
+    exact: bool  # False when the heuristic produced it
+
+    @property
+    def difference(self) -> int:
+        return abs(self.rating_a - self.rating_b)
+
+
+class _Unit(NamedTuple):
+    members: Tuple[int, ...]
+    rating: int
+
+
+def _units(ratings: Dict[int, int], together: Sequence[Sequence[int]]) -> List[_Unit]:
+    """Players merged into groups that must end up on the same team"""
+    parent = {user_id: user_id for user_id in ratings}
+
+    def find(user_id):
+        while parent[user_id] != user_id:
+            parent[user_id] = parent[parent[user_id]]
+            user_id = parent[user_id]
+        return user_id
+
+    for group in together:
+        members = [user_id for user_id in group if user_id in ratings]
+        for user_id in members[1:]:
+            parent[find(user_id)] = find(members[0])
+
+    groups: Dict[int, List[int]] = {}
+    for user_id in ratings:
+        groups.setdefault(find(user_id), []).append(user_id)
+    return [_Unit(tuple(members), sum(ratings[m] for m in members)) for members in groups.values()]
+
+
+def _exact(units: List[_Unit], sizes: Tuple[int, ...], offset: int, deadline: float) -> Optional[List[bool]]:
+    """Subset-sum DP over (players on team A, rating sum) with int bitsets
+
+    reach[i][c] has bit s set when some subset of the first i units puts
+    c players with shifted rating sum s on team A. Returns which units go
+    to team A, or None when the deadline passes first.
+    """
+    target_sum = sum(u.rating - offset * len(u.members) for u in units)
+    half = max(sizes)
+    reach = [[1] + [0] * half]
+    for unit in units:
+        if time.perf_counter() > deadline:
+            return None
+        size, weight = len(unit.members), unit.rating - offset * len(unit.members)
+        prev = reach[-1]
+        row = list(prev)
+        for c in range(half, size - 1, -1):
+            if prev[c - size]:
+                row[c] |= prev[c - size] << weight
+        reach.append(row)
+
+    # Achievable team A sum closest to half the total, over allowed sizes
+    half_sum = target_sum // 2
+    best = None
+    for size in sizes:
+        bits = reach[-1][size]
+        below = (bits & ((1 << (half_sum + 1)) - 1)).bit_length() - 1
+        above = bits >> half_sum
+        candidates = [below] if below >= 0 else []
+        if above:
+            candidates.append(half_sum + (above & -above).bit_length() - 1)
+        for total in candidates:
+            score = abs(target_sum - 2 * total)
+            if best is None or score < best[0]:
+                best = (score, size, total)
+    if best is None:
+        raise BalanceError("Groups cannot be split into teams of equal size")
+
+    _, count, total = best
+    chosen = [False] * len(units)
+    for i in range(len(units), 0, -1):
+        unit = units[i - 1]
+        size, weight = len(unit.members), unit.rating - offset * len(unit.members)
+        if reach[i - 1][count] >> total & 1:
+            continue
+        chosen[i - 1] = True
+        count, total = count - size, total - weight
+    return chosen
+
+
+def _heuristic(units: List[_Unit], sizes: Tuple[int, ...], deadline: float) -> List[bool]:
+    """Greedy fill by rating, then unit swaps while they narrow the gap"""
+    order = sorted(range(len(units)), key=lambda i: -units[i].rating)
+    capacity_a, capacity_b = max(sizes), sum(len(u.members) for u in units) - min(sizes)
+    chosen = [False] * len(units)
+    count_a = count_b = sum_a = sum_b = 0
+    for i in order:
+        size = len(units[i].members)
+        fits_a, fits_b = count_a + size <= capacity_a, count_b + size <= capacity_b
+        if fits_a and (sum_a <= sum_b or not fits_b):
+            chosen[i] = True
+            count_a, sum_a = count_a + size, sum_a + units[i].rating
+        elif fits_b:
+            count_b, sum_b = count_b + size, sum_b + units[i].rating
+        else:
+            raise BalanceError("Groups cannot be split into teams of equal size")
+    if count_a not in sizes:
+        raise BalanceError("Groups cannot be split into teams of equal size")
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(len(units)):
+            for j in range(len(units)):
+                if not chosen[i] or chosen[j] or len(units[i].members) != len(units[j].members):
+                    continue
+                moved = units[i].rating - units[j].rating
+                if abs((sum_a - moved) - (sum_b + moved)) < abs(sum_a - sum_b):
+                    chosen[i], chosen[j] = False, True
+                    sum_a, sum_b = sum_a - moved, sum_b + moved
+                    improved = True
+    return chosen
+
+
+def balance(ratings: Dict[int, int], together: Sequence[Sequence[int]] = (),
+            budget_ms: Optional[float] = None) -> Split:
+    """Split players into A/B of equal size with the closest total rating
+
+    ``together`` lists groups of user ids (friends) that must share a
+    team. The exact DP runs while it fits ``budget_ms`` and the state
+    limit; otherwise a greedy + swap heuristic is used.
+    """
+    if len(ratings) < 2:
+        raise BalanceError("Need at least two players")
+    budget_ms = settings.TEAM_BALANCE_BUDGET_MS if budget_ms is None else budget_ms
+    deadline = time.perf_counter() + budget_ms / 1000
+    units = _units(ratings, together)
+    players = len(ratings)
+    sizes = tuple({players // 2, players - players // 2})
+    if any(len(u.members) > max(sizes) for u in units):
+        raise BalanceError("A group is larger than a team")
+
+    offset = min(ratings.values())
+    spread = sum(u.rating - offset * len(u.members) for u in units)
+    chosen = None
+    if len(units) * max(sizes) * (spread + 1) <= DP_STATE_LIMIT:
+        chosen = _exact(units, sizes, offset, deadline)
+    exact = chosen is not None
+    if chosen is None:
+        chosen = _heuristic(units, sizes, deadline)
+
+    team_a = sorted(m for unit, a in zip(units, chosen) if a for m in unit.members)
+    team_b = sorted(m for unit, a in zip(units, chosen) if not a for m in unit.members)
+    return Split(
+        team_a, team_b,
+        sum(ratings[m] for m in team_a), sum(ratings[m] for m in team_b),
+        exact
+    )
+
+
+async def assign_teams(db: AsyncSession, match_id: int, together: Sequence[Sequence[int]] = ()) -> Split:
+    """Balance the current roster and write MatchPlayer.team; the caller commits"""
+    roster = (await db.execute(
+        select(MatchPlayer.id, MatchPlayer.user_id, User.rating)
+        .join(User, User.id == MatchPlayer.user_id)
+        .where(MatchPlayer.match_id == match_id)
+    )).all()
+    split = balance({row.user_id: row.rating or 0 for row in roster}, together)
+
+    team_of = {user_id: "A" for user_id in split.team_a}
+    team_of.update({user_id: "B" for user_id in split.team_b})
+    # Core executemany rather than the ORM bulk update: a player who leaves
+    # between the read and the write just matches no row instead of failing
+    await db.execute(
+        update(MatchPlayer.__table__)
+        .where(MatchPlayer.__table__.c.id == bindparam("row_id"))
+        .values(team=bindparam("team")),
+        [{"row_id": row.id, "team": team_of[row.user_id]} for row in roster]
+    )
+    return split
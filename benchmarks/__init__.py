@@ -0,0 +1,5 @@
+import os
+
+# Settings() requires these; benchmarks never talk to Telegram
+os.environ.setdefault("BOT_TOKEN", "benchmark:token")
+os.environ.setdefault("WEBAPP_URL", "http://localhost")
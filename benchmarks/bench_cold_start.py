@@ -0,0 +1,145 @@
+"""Cold start of an API worker, from process spawn to its first responses
+
+Run with ``python -m benchmarks.bench_cold_start [--runs 5] [--size 10000] [--budget 2.5]``.
+Each run is a fresh interpreter, as a new worker is when we scale up on
+match night, against a seeded SQLite file (kept in --data-dir like
+benchmarks.run). Per run it reports:
+
+    import   ``from app.main import app``: modules, settings, engine, routes
+    startup  the lifespan startup: pool warm-up, adapters, background tasks
+    first    the first authenticated /api/matches/ and /api/users/me
+    ready    spawn to the end of those responses, interpreter boot included
+
+and lists heavy optional modules (numpy, aiogram) that building the app
+pulled in, since those are meant to load on first use. Exits with
+status 1 when the median ``ready`` is over --budget seconds.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_MODULES = ("numpy", "aiogram")
+BOT_TOKEN = "123456:cold-start"
+
+
+def init_data(telegram_id: int, first_name: str = "Cold") -> str:
+    """Telegram WebApp initData for ``telegram_id``, signed with BOT_TOKEN"""
+    fields = {
+        "auth_date": str(int(time.time())),
+        "user": json.dumps({"id": telegram_id, "first_name": first_name, "username": "cold"}),
+    }
+    check = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+async def child():
+    """One worker's start; prints its timings as JSON"""
+    import httpx  # the client's own import is not the worker's cost
+
+    started = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+    lazy_loaded = [name for name in LAZY_MODULES if name in sys.modules]
+
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        headers = {"X-Telegram-Init-Data": init_data(100_000_001)}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            for path in ("/api/matches/?limit=20", "/api/users/me"):
+                response = await client.get(path)
+                response.raise_for_status()
+        answered = time.perf_counter()
+        finished_at = time.time()
+    print(json.dumps({
+        "import": imported - started,
+        "startup": ready - imported,
+        "first": answered - ready,
+        "finished_at": finished_at,
+        "lazy_loaded": lazy_loaded,
+    }))
+    sys.stdout.flush()
+    os._exit(0)  # the notifier's bot import may still be running in its thread
+
+
+def run_once(database_url: str) -> dict:
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "DATABASE_URL": database_url,
+        "BOT_TOKEN": BOT_TOKEN,
+        "WEBAPP_URL": "https://example.invalid/app",
+        "TELEGRAM_API_URL": "http://127.0.0.1:9",
+        # Jobs would rewrite the seeded data between runs
+        "SCHEDULER_ENABLED": "false",
+    }
+    spawned = time.time()
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_cold_start", "--child"],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["ready"] = result.pop("finished_at") - spawned
+    return result
+
+
+async def seed(path: str, size: int):
+    from benchmarks.run import prepare
+    from benchmarks.common import make_engine
+
+    engine = make_engine("sqlite:///" + path)
+    try:
+        await prepare(engine, size)
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--size", type=int, default=10000, help="matches in the seeded database")
+    parser.add_argument("--budget", type=float, default=2.5, help="seconds allowed for the median ready time")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "dribbling-bench"))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child())
+        return
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    path = os.path.join(args.data_dir, f"bench-{args.size}.db")
+    os.environ.setdefault("BOT_TOKEN", BOT_TOKEN)
+    os.environ.setdefault("WEBAPP_URL", "https://example.invalid/app")
+    asyncio.run(seed(path, args.size))
+
+    runs = [run_once("sqlite:///" + path) for _ in range(args.runs)]
+    print(f"{'':<8} {'median':>8} {'min':>8} {'max':>8}")
+    for key in ("import", "startup", "first", "ready"):
+        values = [run[key] for run in runs]
+        print(f"{key:<8} {statistics.median(values):>7.3f}s {min(values):>7.3f}s {max(values):>7.3f}s")
+
+    lazy_loaded = sorted({name for run in runs for name in run["lazy_loaded"]})
+    if lazy_loaded:
+        print(f"imported eagerly by app.main: {', '.join(lazy_loaded)}")
+    ready = statistics.median(run["ready"] for run in runs)
+    if ready > args.budget:
+        print(f"over budget: median ready {ready:.3f}s > {args.budget:.3f}s")
+        sys.exit(1)
+    print(f"within budget ({args.budget:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Queries per GET /matches/{id} as the roster grows
+
+Fails if the query count depends on the number of players.
+Run with ``python -m benchmarks.bench_match_detail``.
+"""
+import asyncio
+import time
+
+from sqlalchemy import select
+
+from benchmarks.common import build_app, client_for, count_queries, make_engine, seed
+from app.models import Match
+
+
+async def main():
+    engine = make_engine()
+    try:
+        await seed(engine, users=100, matches=300)
+
+        # One match per distinct roster size
+        async with engine.connect() as conn:
+            by_size = {}
+            for match_id, size in (await conn.execute(select(Match.id, Match.players_count))).all():
+                by_size.setdefault(size, match_id)
+
+        counts = set()
+        print(f"{'players':>8} {'queries':>8} {'ms/request':>11}")
+        async with build_app(engine) as app, client_for(app) as client:
+            for size in sorted(by_size):
+                runs = 20
+                with count_queries(engine) as statements:
+                    started = time.perf_counter()
+                    for _ in range(runs):
+                        response = await client.get(f"/matches/{by_size[size]}")
+                        assert response.status_code == 200, response.text
+                        assert len(response.json()["players"]) == size
+                    elapsed = time.perf_counter() - started
+                counts.add(len(statements) / runs)
+                print(f"{size:>8} {len(statements) / runs:>8.1f} {elapsed / runs * 1000:>11.2f}")
+    finally:
+        await engine.dispose()
+
+    assert len(counts) == 1, f"query count depends on roster size: {sorted(counts)}"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+"""Queries per GET /matches request as the page size grows
+
+Run with ``python -m benchmarks.bench_matches_list``.
+"""
+import asyncio
+import time
+
+from benchmarks.common import build_app, client_for, count_queries, make_engine, seed
+
+
+async def main():
+    engine = make_engine()
+    try:
+        await seed(engine, users=300, matches=1000)
+
+        print(f"{'limit':>6} {'queries':>8} {'ms/request':>11}")
+        async with build_app(engine) as app, client_for(app) as client:
+            for limit in (1, 10, 50, 100):
+                runs = 20
+                with count_queries(engine) as statements:
+                    started = time.perf_counter()
+                    for _ in range(runs):
+                        response = await client.get("/matches/", params={"limit": limit, "status": ""})
+                        assert response.status_code == 200, response.text
+                        assert len(response.json()) == limit
+                    elapsed = time.perf_counter() - started
+                print(f"{limit:>6} {len(statements) / runs:>8.1f} {elapsed / runs * 1000:>11.2f}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""GET /matches/nearby latency as the total number of matches grows
+
+Matches are spread over a ~400 km square, so a 5 km search should read a
+roughly constant number of rows however many matches exist. The world
+cluster view reads every open match, at the coarsest precision.
+Run with ``python -m benchmarks.bench_nearby``.
+"""
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import build_app, client_for, make_engine, seed
+
+
+async def main():
+    print(f"{'matches':>8} {'found':>6} {'radius ms':>10} {'bbox ms':>8} {'cluster ms':>11} {'world ms':>9}")
+    for total in (1_000, 10_000, 100_000):
+        engine = make_engine()
+        try:
+            await seed(engine, users=50, matches=total, spread=2.0)
+            timings = {"radius": [], "bbox": [], "cluster": [], "world": []}
+            queries = {
+                "radius": {"lat": 39.4952, "lon": 67.6093, "radius": 5, "status": "open"},
+                "bbox": {"bbox": "67.55,39.45,67.67,39.54", "status": "open"},
+                "cluster": {"bbox": "66.6,38.5,68.6,40.5", "status": "open", "cluster": "true"},
+                "world": {"bbox": "-180,-85,180,85", "status": "open", "cluster": "true"},
+            }
+            async with build_app(engine) as app, client_for(app) as client:
+                for name, params in queries.items():
+                    for _ in range(20):
+                        started = time.perf_counter()
+                        response = await client.get("/matches/nearby", params=params)
+                        timings[name].append((time.perf_counter() - started) * 1000)
+                        assert response.status_code == 200, response.text
+                    if name == "radius":
+                        found = len(response.json()["matches"])
+            print(
+                f"{total:>8} {found:>6} {statistics.median(timings['radius']):>10.2f}"
+                f" {statistics.median(timings['bbox']):>8.2f} {statistics.median(timings['cluster']):>11.2f}"
+                f" {statistics.median(timings['world']):>9.2f}"
+            )
+        finally:
+            await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""Kickoff reminders through the notifier against a rate-limited fake Bot API
+
+Run with ``python -m benchmarks.bench_notifications [reminders] [rate]``
+(default 2,000 reminders at 100 messages/s; Telegram itself allows about
+30/s per bot). Reports the cost of ``submit`` for the API worker, the
+sustained send rate and how often the fake server had to answer 429.
+"""
+import asyncio
+import sys
+import time
+
+from app.config import settings
+from app.notifications import NOTIFICATIONS, Notification, Notifier
+from benchmarks.common import serve
+from benchmarks.fake_bot_api import FakeBotAPI
+
+
+async def main():
+    reminders = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 100.0
+    blocked = {10_000 + i for i in range(0, reminders, 100)}  # 1% blocked the bot
+    fake = FakeBotAPI(global_rate=rate, blocked=blocked, error_rate=0.02, latency=0.02)
+
+    async with serve(fake.app) as base_url:
+        settings.TELEGRAM_API_URL = base_url
+        settings.BOT_TOKEN = "123456:fake-token"
+        settings.NOTIFY_GLOBAL_RATE = rate
+        notifier = Notifier()
+        await notifier.start()
+
+        started = time.perf_counter()
+        for i in range(reminders):
+            notifier.submit(Notification(10_000 + i, f"Reminder {i}", f"reminder:{i}", i))
+        # The same reminders again (dropped as duplicates) and a burst of
+        # roster changes to one organiser (merged into few messages)
+        for i in range(reminders):
+            notifier.submit(Notification(10_000 + i, f"Reminder {i}", f"reminder:{i}", i))
+        for i in range(50):
+            notifier.submit(Notification(1, f"Player {i} joined", f"joined:{i}", 7))
+        submit_us = (time.perf_counter() - started) / (2 * reminders + 50) * 1e6
+
+        await notifier.drain(timeout=reminders / rate * 3 + 30)
+        elapsed = time.perf_counter() - started
+        await notifier.stop()
+
+    delivered = {sent.chat_id for sent in fake.sent}
+    per_chat = {}
+    for sent in fake.sent:
+        per_chat.setdefault(sent.chat_id, []).append(sent.at)
+    fastest = min(
+        (b - a for times in per_chat.values() for a, b in zip(times, times[1:])), default=None
+    )
+    print(f"submit: {submit_us:.1f} us per call")
+    print(f"sent {len(fake.sent)} messages to {len(delivered)} chats in {elapsed:.1f}s "
+          f"({len(fake.sent) / elapsed * 60:,.0f}/min, limit {rate * 60:,.0f}/min)")
+    print(f"missing: {reminders - len(delivered - {1}) - len(blocked)} reminders, "
+          f"organiser got {len(per_chat.get(1, []))} messages for 50 events")
+    print(f"rejected by the fake API: {fake.rejected}")
+    print(f"closest two messages to one chat: {fastest if fastest is not None else '-'}s")
+    print("outcomes:", {result: NOTIFICATIONS.value(result=result) for result in
+                        ("queued", "deduplicated", "dropped", "sent", "retried", "failed")})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
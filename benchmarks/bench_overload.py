@@ -0,0 +1,178 @@
+"""Latency under overload with and without admission control, and the per-user limit
+
+Run with ``python -m benchmarks.bench_overload [--rate 150] [--duration 10]``.
+A single uvicorn worker with a deliberately small pool (--pool
+connections, no overflow) serves a seeded SQLite file (kept in
+--data-dir like benchmarks.run). An open-loop client sends uncached
+``GET /api/users/{id}/matches`` pages at --rate requests per second,
+more than the pool can serve, whether or not earlier ones have
+answered, as real users on match night do. It runs twice:
+
+    off  ADMISSION_MAX_IN_FLIGHT=0, ADMISSION_MAX_POOL_WAIT_MS=0: every
+         request queues for a connection
+    on   --max-in-flight and --max-pool-wait-ms: the worker answers 503
+         + Retry-After once saturated
+
+and reports answered requests, the share shed, timeouts (over --timeout
+seconds), other failures (errors, dropped connections) and the p50/p99
+latency of the 200s, both as the client saw it and inside the worker
+(the ``app`` entry of Server-Timing). Rate limits are off for these
+two runs; a last run has one user call the same route at --abuse-rate
+with the default budget and counts their 429s.
+
+Admission control bounds the time spent inside the worker. When the
+client shares the worker's only CPU, as on a one-core box, requests
+also queue in the kernel and in the client, before the worker can see
+them, and the client-side numbers keep growing regardless.
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import httpx
+
+from benchmarks.bench_cold_start import BOT_TOKEN, init_data, seed
+from benchmarks.bench_workers import free_port, percentile, start_workers, stop
+
+SESSIONS = 200
+APP_TIMING = re.compile(r"app;dur=([\d.]+)")
+
+
+async def open_loop(base_url: str, rate: float, duration: float, timeout: float,
+                    paths: List[str], sessions: List[str]) -> List[Tuple[int, float, float]]:
+    """(status, seconds, seconds in the worker) per request sent at ``rate`` per second
+
+    Status 0 is a timeout, -1 a connection the server dropped or refused.
+    """
+    results: List[Tuple[int, float, float]] = []
+    rng = random.Random(7)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+
+    async def one(client, path, headers):
+        started = time.perf_counter()
+        in_app = 0.0
+        try:
+            response = await client.get(path, headers=headers)
+            code = response.status_code
+            timing = APP_TIMING.search(response.headers.get("server-timing", ""))
+            if timing:
+                in_app = float(timing.group(1)) / 1000
+        except httpx.TimeoutException:
+            code = 0
+        except httpx.TransportError:
+            code = -1
+        results.append((code, time.perf_counter() - started, in_app))
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        tasks = []
+        started = time.perf_counter()
+        for sent in range(int(rate * duration)):
+            # Sleep to each request's scheduled time, not after the previous answer
+            delay = started + sent / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            headers = {"X-Telegram-Init-Data": rng.choice(sessions)}
+            tasks.append(asyncio.create_task(one(client, rng.choice(paths), headers)))
+        await asyncio.gather(*tasks)
+    return results
+
+
+def summarize(results: List[Tuple[int, float, float]]) -> Dict[str, float]:
+    statuses = Counter(code for code, _, _ in results)
+    ok = [seconds for code, seconds, _ in results if code == 200]
+    in_app = [seconds for code, _, seconds in results if code == 200]
+    return {
+        "sent": len(results),
+        "ok": statuses[200],
+        "shed": statuses[503],
+        "limited": statuses[429],
+        "timeouts": statuses[0],
+        "failed": len(results) - statuses[200] - statuses[503] - statuses[429] - statuses[0],
+        "p50_ms": percentile(ok, 50) * 1000,
+        "p99_ms": percentile(ok, 99) * 1000,
+        "app_p50_ms": percentile(in_app, 50) * 1000,
+        "app_p99_ms": percentile(in_app, 99) * 1000,
+    }
+
+
+async def run(args, path: str):
+    paths = [f"/api/users/{user_id}/matches?limit=50" for user_id in range(1, SESSIONS + 1)]
+    sessions = [init_data(100_000_000 + user_id) for user_id in range(1, SESSIONS + 1)]
+    base_env = {
+        **os.environ,
+        "DATABASE_URL": "sqlite:///" + path,
+        "BOT_TOKEN": BOT_TOKEN,
+        "WEBAPP_URL": "https://example.invalid/app",
+        "SCHEDULER_ENABLED": "false",
+        "NOTIFICATIONS_ENABLED": "false",
+        "DB_POOL_SIZE": str(args.pool),
+        "DB_MAX_OVERFLOW": "0",
+        "DB_POOL_WARM": str(args.pool),
+        "DB_POOL_TIMEOUT": str(args.timeout),
+    }
+    base_env.pop("REDIS_URL", None)
+    modes = {
+        "off": {"ADMISSION_MAX_IN_FLIGHT": "0", "ADMISSION_MAX_POOL_WAIT_MS": "0", "RATE_LIMIT_ENABLED": "false"},
+        "on": {
+            "ADMISSION_MAX_IN_FLIGHT": str(args.max_in_flight),
+            "ADMISSION_MAX_POOL_WAIT_MS": str(args.max_pool_wait_ms),
+            "RATE_LIMIT_ENABLED": "false",
+        },
+    }
+
+    print(f"{args.rate:.0f} requests/s for {args.duration:.0f}s, pool of {args.pool}, {os.cpu_count()} CPUs")
+    print(f"{'admission':<10} {'sent':>6} {'200':>6} {'503':>6} {'timeout':>8} {'failed':>6} "
+          f"{'p50':>9} {'p99':>9} {'app p50':>9} {'app p99':>9}")
+    for mode, overrides in modes.items():
+        port = free_port()
+        process = await start_workers(1, port, {**base_env, **overrides})
+        try:
+            results = await open_loop(f"http://127.0.0.1:{port}", args.rate, args.duration, args.timeout,
+                                      paths, sessions)
+        finally:
+            await stop(process)
+        s = summarize(results)
+        print(f"{mode:<10} {s['sent']:>6} {s['ok']:>6} {s['shed']:>6} {s['timeouts']:>8} {s['failed']:>6} "
+              f"{s['p50_ms']:>7.1f}ms {s['p99_ms']:>7.1f}ms {s['app_p50_ms']:>7.1f}ms {s['app_p99_ms']:>7.1f}ms")
+
+    # One user in a reload loop, against the default budget
+    port = free_port()
+    process = await start_workers(1, port, base_env)
+    try:
+        results = await open_loop(f"http://127.0.0.1:{port}", args.abuse_rate, args.duration, args.timeout,
+                                  paths[:1], sessions[:1])
+    finally:
+        await stop(process)
+    s = summarize(results)
+    print(f"one user at {args.abuse_rate:.0f}/s: {s['ok']} answered, {s['limited']} refused with 429")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=150, help="requests per second, above what the pool serves")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float, default=10.0, help="client timeout and DB_POOL_TIMEOUT, seconds")
+    parser.add_argument("--pool", type=int, default=2, help="database connections of the worker")
+    parser.add_argument("--max-in-flight", type=int, default=32)
+    parser.add_argument("--max-pool-wait-ms", type=float, default=200)
+    parser.add_argument("--abuse-rate", type=float, default=20, help="requests per second of the one user")
+    parser.add_argument("--size", type=int, default=10000, help="matches in the seeded database")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "dribbling-bench"))
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    path = os.path.join(args.data_dir, f"bench-{args.size}.db")
+    os.environ.setdefault("BOT_TOKEN", BOT_TOKEN)
+    os.environ.setdefault("WEBAPP_URL", "https://example.invalid/app")
+    asyncio.run(seed(path, args.size))
+    asyncio.run(run(args, path))
+
+
+if __name__ == "__main__":
+    main()
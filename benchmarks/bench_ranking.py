@@ -0,0 +1,46 @@
+"""Leaderboard lookups against the in-process ranking as the user count grows
+
+Run with ``python -m benchmarks.bench_ranking``.
+"""
+import random
+import time
+
+from app.ranking import LeaderboardEntry, Ranking
+
+
+def timed(fn, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - started) / runs * 1e6
+
+
+def main():
+    rnd = random.Random(7)
+    print(f"{'users':>9} {'load s':>7} {'page us':>8} {'deep page us':>13} {'rank us':>8} {'update us':>10}")
+    for users in (10_000, 100_000, 1_000_000):
+        entries = [
+            LeaderboardEntry(i, f"Player {i}", None, rnd.randint(0, 3000), rnd.randint(0, 200), rnd.randint(0, 100), 0)
+            for i in range(1, users + 1)
+        ]
+        ranking = Ranking()
+        started = time.perf_counter()
+        ranking.load(entries)
+        load = time.perf_counter() - started
+
+        page = timed(lambda: ranking.page(0, 100), 200)
+        deep = timed(lambda: ranking.page(users // 2, 100), 200)
+        rank = timed(lambda: ranking.rating_rank(rnd.randint(0, 3000)), 2000)
+
+        def bump():
+            entry = entries[rnd.randrange(users)]
+            entry = entry._replace(rating=entry.rating + 1)
+            entries[entry.id - 1] = entry
+            ranking.update(entry)
+
+        update = timed(bump, 2000)
+        print(f"{users:>9} {load:>7.2f} {page:>8.1f} {deep:>13.1f} {rank:>8.1f} {update:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Batch rating replay: NumPy layers vs result-by-result, same final ratings
+
+Run with ``python -m benchmarks.bench_rating [results]`` (default 1,000,000).
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+from app import rating
+from benchmarks.common import FORMATS
+
+
+def history(results: int, players: int, seed_value=7):
+    rnd = random.Random(seed_value)
+    entry_result, entry_player, entry_side, outcomes = [], [], [], []
+    sizes = list(FORMATS.values())
+    for r in range(results):
+        size = rnd.choice(sizes)
+        roster = rnd.sample(range(players), size)
+        entry_result.extend([r] * size)
+        entry_player.extend(roster)
+        entry_side.extend([1] * (size // 2) + [-1] * (size - size // 2))
+        outcomes.append(rnd.choice((0.0, 0.5, 1.0)))
+    return (np.array(entry_result), np.array(entry_player), np.array(entry_side), np.array(outcomes))
+
+
+def sequential(entry_result, entry_player, entry_side, outcomes, initial):
+    """Reference: one result at a time with the same formula as record_result"""
+    ratings = list(initial)
+    bounds = (np.flatnonzero(np.diff(entry_result)) + 1).tolist()
+    players, sides = entry_player.tolist(), entry_side.tolist()
+    for r, (start, stop) in enumerate(zip([0] + bounds, bounds + [len(players)])):
+        team_a = [p for p, s in zip(players[start:stop], sides[start:stop]) if s > 0]
+        team_b = [p for p, s in zip(players[start:stop], sides[start:stop]) if s < 0]
+        delta = rating.team_delta([ratings[p] for p in team_a], [ratings[p] for p in team_b], outcomes[r])
+        for p in team_a:
+            ratings[p] += delta
+        for p in team_b:
+            ratings[p] -= delta
+    return ratings
+
+
+def main():
+    results = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    players = max(results // 10, 100)
+    arrays = history(results, players)
+    initial = [1000] * players
+    print(f"{results} results, {players} players, {len(arrays[0])} player rows")
+
+    started = time.perf_counter()
+    ratings, played, wins, losses = rating.replay(*arrays, initial=initial)
+    print(f"numpy replay      {time.perf_counter() - started:8.2f} s")
+
+    started = time.perf_counter()
+    reference = sequential(*arrays, initial=initial)
+    print(f"result by result  {time.perf_counter() - started:8.2f} s  (in memory, no ORM)")
+
+    assert ratings.tolist() == reference
+    assert played.sum() == len(arrays[0])
+
+
+if __name__ == "__main__":
+    main()
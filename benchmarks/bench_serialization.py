@@ -0,0 +1,83 @@
+"""CPU time per 100-item page: response_model + jsonable_encoder vs FastJSONResponse
+
+Run with ``python -m benchmarks.bench_serialization``.
+
+The first table isolates the encoding step on the rows GET /matches
+returns; the second measures whole requests (response cache disabled).
+"""
+import asyncio
+import json
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import build_app, client_for, make_engine, seed
+from app.routers.matches import _match_list_query
+from app.schemas import Match as MatchSchema
+from app.serialization import FastJSONResponse, orjson, type_adapter
+
+PAGE = 100
+
+
+def cpu_per_call(fn, runs=300) -> float:
+    started = time.process_time()
+    for _ in range(runs):
+        fn()
+    return (time.process_time() - started) / runs * 1_000_000
+
+
+async def encoding(engine):
+    Session = async_sessionmaker(engine)
+    async with Session() as db:
+        rows = [row._asdict() for row in (await db.execute(_match_list_query().limit(PAGE))).all()]
+
+    adapter = type_adapter(List[MatchSchema])
+
+    def before():
+        # What FastAPI does for response_model=List[MatchSchema] + JSONResponse
+        validated = adapter.validate_python(rows)
+        return JSONResponse(jsonable_encoder(validated)).body
+
+    def after():
+        return FastJSONResponse(rows).body
+
+    assert json.loads(before()) == json.loads(after())
+    print(f"encoder: {'orjson' if orjson else 'json (orjson not installed)'}")
+    print(f"{'path':<34} {'us/page':>9}")
+    print(f"{'response_model + jsonable_encoder':<34} {cpu_per_call(before):>9.0f}")
+    print(f"{'FastJSONResponse':<34} {cpu_per_call(after):>9.0f}")
+
+
+async def requests(engine):
+    paths = {
+        "GET /matches": ("/matches/", {"limit": PAGE, "status": ""}),
+        "GET /users/1/matches": ("/users/1/matches", {"limit": PAGE}),
+        "GET /leaderboard": ("/leaderboard/", {"limit": PAGE}),
+    }
+    print(f"\n{'request':<22} {'cpu ms/request':>15}")
+    async with build_app(engine) as app, client_for(app) as client:
+        for name, (path, params) in paths.items():
+            await client.get(path, params=params)
+            runs = 100
+            started = time.process_time()
+            for _ in range(runs):
+                response = await client.get(path, params=params)
+                assert response.status_code == 200, response.text
+            print(f"{name:<22} {(time.process_time() - started) / runs * 1000:>15.2f}")
+
+
+async def main():
+    engine = make_engine()
+    try:
+        await seed(engine, users=PAGE * 2, matches=2000)
+        await encoding(engine)
+        await requests(engine)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+"""Team balancing time and rating gap for 5x5, 7x7 and 11x11 rosters
+
+Run with ``python -m benchmarks.bench_teams``.
+"""
+import random
+import time
+
+from app.teams import balance
+from benchmarks.common import FORMATS
+
+RUNS = 200
+
+
+def main():
+    rnd = random.Random(11)
+    print(f"{'players':>7} {'groups':>6} {'ms/split':>9} {'max ms':>7} {'mean gap':>9} {'exact':>6}")
+    for players in sorted(FORMATS.values()):
+        for with_groups in (False, True):
+            timings, gaps, exact = [], [], 0
+            for _ in range(RUNS):
+                ratings = {user_id: rnd.randint(600, 1600) for user_id in range(players)}
+                together = [rnd.sample(range(players), 2) for _ in range(players // 5)] if with_groups else ()
+                started = time.perf_counter()
+                split = balance(ratings, together)
+                timings.append((time.perf_counter() - started) * 1000)
+                gaps.append(split.difference)
+                exact += split.exact
+            print(
+                f"{players:>7} {'yes' if with_groups else 'no':>6} {sum(timings) / RUNS:>9.3f} "
+                f"{max(timings):>7.3f} {sum(gaps) / RUNS:>9.1f} {exact / RUNS:>6.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
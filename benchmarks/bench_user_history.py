@@ -0,0 +1,43 @@
+"""GET /users/{id}/matches cost as the user's history grows
+
+Run with ``python -m benchmarks.bench_user_history``.
+"""
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import func, select
+
+from benchmarks.common import build_app, client_for, count_queries, make_engine, seed
+from app.models import MatchPlayer
+
+
+async def main():
+    print(f"{'history':>8} {'queries':>8} {'p50 ms':>7} {'p95 ms':>7}")
+    for matches in (100, 1000, 5000):
+        engine = make_engine()
+        try:
+            # 20 users spread over every match gives user 1 a history of ~matches/2
+            await seed(engine, users=20, matches=matches)
+            async with engine.connect() as conn:
+                history = (await conn.execute(
+                    select(func.count()).select_from(MatchPlayer).where(MatchPlayer.user_id == 1)
+                )).scalar()
+
+            timings = []
+            async with build_app(engine) as app, client_for(app) as client:
+                with count_queries(engine) as statements:
+                    for _ in range(50):
+                        started = time.perf_counter()
+                        response = await client.get("/users/1/matches", params={"limit": 50})
+                        timings.append((time.perf_counter() - started) * 1000)
+                        assert response.status_code == 200, response.text
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{history:>8} {len(statements) / 50:>8.1f} {statistics.median(timings):>7.2f} {p95:>7.2f}")
+        finally:
+            await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,370 @@
+"""Throughput of 1..N uvicorn workers sharing state, and whether they agree
+
+Run with ``python -m benchmarks.bench_workers [--workers 1 2 4] [--state redis|memory]``.
+For each worker count it starts ``uvicorn app.main:app --workers N``
+against a seeded SQLite file (kept in --data-dir like benchmarks.run)
+and, with ``--state redis``, a local Redis stand-in
+(benchmarks.fake_redis; --redis-url points it at a real server instead).
+Then:
+
+    load         --clients processes drive a read-heavy mix (match list,
+                 match pages, leaderboard, profiles, user history) for
+                 --duration seconds; reports rps, p50/p95 and the scaling
+                 efficiency against the first worker count
+    consistency  a write on one connection followed by reads on fresh
+                 connections (so they spread over the workers): a join
+                 and a leave on a match page, a profile rename seen by an
+                 older session, a new user counted on the leaderboard,
+                 and one new user signing in on every worker at once
+
+A read that still shows the old data after --settle seconds counts as
+stale. ``--state memory`` runs the same checks without a shared state
+to show what they catch; expect stale reads there from 2 workers on.
+Exits with status 1 on stale reads or failed requests in redis mode.
+
+SQLite serializes writes and every process here shares the machine's
+cores, clients included: the scaling column only means something with
+at least workers + clients cores and PostgreSQL behind the workers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.bench_cold_start import BOT_TOKEN, init_data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SESSIONS = 200  # distinct users behind the load, like a busy evening
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] if values else 0.0
+
+
+# Load (runs in each client process) ----------------------------------------
+
+def load_paths(max_match: int, max_user: int, rng: random.Random) -> Callable[[], str]:
+    def pick() -> str:
+        roll = rng.random()
+        if roll < 0.35:
+            return "/api/matches/?limit=20"
+        if roll < 0.65:
+            return f"/api/matches/{rng.randint(1, max_match)}"
+        if roll < 0.8:
+            return "/api/leaderboard/?limit=50"
+        if roll < 0.9:
+            return "/api/users/me"
+        return f"/api/users/{rng.randint(1, max_user)}/matches?limit=20"
+    return pick
+
+
+async def drive(base_url: str, duration: float, concurrency: int, max_match: int, max_user: int, seed: int):
+    """One client process's share of the load; prints its latencies as JSON"""
+    rng = random.Random(seed)
+    sessions = [init_data(100_000_000 + user_id) for user_id in range(1, min(SESSIONS, max_user) + 1)]
+    pick = load_paths(max_match, max_user, rng)
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker(client):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            headers = {"X-Telegram-Init-Data": rng.choice(sessions)}
+            started = time.perf_counter()
+            try:
+                response = await client.get(pick(), headers=headers)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    print(json.dumps({"latencies": latencies, "errors": errors}))
+
+
+def run_load(base_url: str, args, max_match: int, max_user: int) -> Dict[str, float]:
+    clients = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_workers", "--drive", base_url,
+             "--duration", str(args.duration), "--concurrency", str(args.concurrency),
+             "--max-match", str(max_match), "--max-user", str(max_user), "--seed", str(seed)],
+            cwd=ROOT, env={**os.environ, "PYTHONPATH": ROOT}, stdout=subprocess.PIPE, text=True
+        )
+        for seed in range(args.clients)
+    ]
+    latencies: List[float] = []
+    errors = 0
+    for client in clients:
+        output, _ = client.communicate()
+        result = json.loads(output.strip().splitlines()[-1])
+        latencies.extend(result["latencies"])
+        errors += result["errors"]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / args.duration,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+# Consistency ---------------------------------------------------------------
+
+class Consistency:
+    """Writes through one connection, reads through fresh ones"""
+
+    def __init__(self, base_url: str, reads: int, settle: float):
+        self.base_url = base_url
+        self.reads = reads
+        self.settle = settle
+        self.results: Dict[str, Dict[str, int]] = {}
+
+    def headers(self, telegram_id: int, first_name: str = "Cold") -> Dict[str, str]:
+        return {"X-Telegram-Init-Data": init_data(telegram_id, first_name)}
+
+    async def get(self, path: str, headers: Dict[str, str]):
+        # A new connection per read, so the kernel hands them to different workers
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=30) as client:
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+            return response.json()
+
+    async def write(self, method: str, path: str, headers: Dict[str, str]):
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=30) as client:
+            response = await client.request(method, path, headers=headers)
+            response.raise_for_status()
+
+    async def warm(self, path: str, headers: Dict[str, str]):
+        """Fill every worker's caches with the value about to change"""
+        await asyncio.gather(*(self.get(path, headers) for _ in range(self.reads)))
+
+    async def check(self, name: str, path: str, headers: Dict[str, str], expected: Callable[[dict], bool]):
+        await asyncio.sleep(self.settle)
+        bodies = await asyncio.gather(*(self.get(path, headers) for _ in range(self.reads)))
+        stale = sum(not expected(body) for body in bodies)
+        self.results[name] = {"reads": len(bodies), "stale": stale}
+
+    async def join_leave(self, match_id: int, telegram_id: int, user_id: int):
+        headers = self.headers(telegram_id)
+        path = f"/api/matches/{match_id}"
+
+        def roster(body) -> List[int]:
+            return [player["user"]["id"] for player in body["players"]]
+
+        await self.warm(path, headers)
+        await self.write("POST", f"{path}/join", headers)
+        await self.check("join shown on match page", path, headers, lambda body: user_id in roster(body))
+        await self.write("POST", f"{path}/leave", headers)
+        await self.check("leave shown on match page", path, headers, lambda body: user_id not in roster(body))
+
+    async def rename(self, telegram_id: int):
+        old_session = self.headers(telegram_id, "Cold")
+        await self.warm("/api/users/me", old_session)
+        name = f"Renamed {random.randrange(10 ** 6)}"
+        # Telegram reports the new name in the next session's initData
+        await self.get("/api/users/me", self.headers(telegram_id, name))
+        await self.check(
+            "rename seen by an older session", "/api/users/me", old_session,
+            lambda body: body["first_name"] == name
+        )
+
+    async def new_user(self, reader_id: int):
+        headers = self.headers(reader_id)
+        path = "/api/leaderboard/?limit=1"
+        total = (await self.get(path, headers))["total"]
+        await self.warm(path, headers)
+        newcomer = 900_000_000 + random.randrange(10 ** 8)
+        await self.get("/api/users/me", self.headers(newcomer))
+        await self.check("new user on leaderboard", path, headers, lambda body: body["total"] == total + 1)
+
+    async def simultaneous_sign_in(self):
+        """The same new user on every worker at once: one row, no errors"""
+        newcomer = 900_000_000 + random.randrange(10 ** 8)
+        headers = self.headers(newcomer)
+        bodies = await asyncio.gather(
+            *(self.get("/api/users/me", headers) for _ in range(self.reads)), return_exceptions=True
+        )
+        ids = {body["id"] for body in bodies if isinstance(body, dict)}
+        failed = sum(not isinstance(body, dict) for body in bodies)
+        # Two user ids means two rows; a failed request is a lost insert race
+        self.results["one row per new user"] = {"reads": len(bodies), "stale": failed + len(ids) - 1}
+
+
+def consistency_targets(path: str):
+    """An open match with room, and a user who is neither on it nor its creator"""
+    with sqlite3.connect(path) as conn:
+        match_id, creator_id = conn.execute(
+            "SELECT id, created_by FROM matches WHERE status = 'open' AND players_count < max_players - 1 "
+            "ORDER BY id LIMIT 1"
+        ).fetchone()
+        user_id, telegram_id = conn.execute(
+            "SELECT id, telegram_id FROM users WHERE id != ? AND id NOT IN "
+            "(SELECT user_id FROM match_players WHERE match_id = ?) ORDER BY id LIMIT 1",
+            (creator_id, match_id)
+        ).fetchone()
+        max_match = conn.execute("SELECT max(id) FROM matches").fetchone()[0]
+        max_user = conn.execute("SELECT max(id) FROM users WHERE telegram_id < 900000000").fetchone()[0]
+    return match_id, user_id, telegram_id, max_match, max_user
+
+
+async def run_consistency(base_url: str, workers: int, args, targets) -> Dict[str, Dict[str, int]]:
+    match_id, user_id, telegram_id, _, _ = targets
+    checks = Consistency(base_url, reads=args.reads * workers, settle=args.settle)
+    await checks.join_leave(match_id, telegram_id, user_id)
+    await checks.rename(telegram_id + 1)
+    await checks.new_user(telegram_id + 2)
+    await checks.simultaneous_sign_in()
+    return checks.results
+
+
+# Servers -------------------------------------------------------------------
+
+async def start_workers(workers: int, port: int, env: Dict[str, str]) -> asyncio.subprocess.Process:
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--no-access-log",
+        cwd=ROOT, env=env, stderr=asyncio.subprocess.PIPE
+    )
+    started = 0
+    while started < workers:
+        line = await asyncio.wait_for(process.stderr.readline(), timeout=60)
+        if not line:
+            raise RuntimeError("uvicorn exited before its workers started")
+        started += b"Application startup complete" in line
+    # Keep reading so a chatty worker never blocks on a full pipe
+    asyncio.get_running_loop().create_task(_drain(process.stderr))
+    return process
+
+
+async def _drain(stream):
+    while await stream.readline():
+        pass
+
+
+async def stop(process):
+    process.terminate()
+    try:
+        await asyncio.wait_for(process.wait(), timeout=15)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+
+
+async def bench(args, path: str) -> bool:
+    targets = consistency_targets(path)
+    _, _, _, max_match, max_user = targets
+    redis_process: Optional[asyncio.subprocess.Process] = None
+    redis_url = args.redis_url
+    if args.state == "redis" and redis_url is None:
+        redis_port = free_port()
+        redis_process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.fake_redis", "--port", str(redis_port),
+            cwd=ROOT, env={**os.environ, "PYTHONPATH": ROOT}
+        )
+        redis_url = f"redis://127.0.0.1:{redis_port}/0"
+        await asyncio.sleep(0.5)
+
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "DATABASE_URL": "sqlite:///" + path,
+        "BOT_TOKEN": BOT_TOKEN,
+        "WEBAPP_URL": "https://example.invalid/app",
+        # Jobs would rewrite the seeded data, and no messages go out
+        "SCHEDULER_ENABLED": "false",
+        "NOTIFICATIONS_ENABLED": "false",
+    }
+    if redis_url:
+        env["REDIS_URL"] = redis_url
+    else:
+        env.pop("REDIS_URL", None)
+
+    print(f"state: {args.state}{' at ' + redis_url if redis_url else ''}, "
+          f"{args.clients} clients x {args.concurrency} connections, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'rps':>9} {'scaling':>8} {'p50':>8} {'p95':>8} {'errors':>7} {'stale':>9}")
+    consistent = True
+    baseline = None
+    try:
+        for workers in args.workers:
+            port = free_port()
+            process = await start_workers(workers, port, env)
+            base_url = f"http://127.0.0.1:{port}"
+            try:
+                load = await asyncio.to_thread(run_load, base_url, args, max_match, max_user)
+                results = await run_consistency(base_url, workers, args, targets)
+            finally:
+                await stop(process)
+
+            baseline = baseline or load["rps"] / workers
+            stale = sum(result["stale"] for result in results.values())
+            reads = sum(result["reads"] for result in results.values())
+            print(f"{workers:>7} {load['rps']:>9.0f} {load['rps'] / (baseline * workers):>7.0%} "
+                  f"{load['p50_ms']:>6.1f}ms {load['p95_ms']:>6.1f}ms {load['errors']:>7} {stale:>4}/{reads:<4}")
+            for name, result in results.items():
+                if result["stale"]:
+                    print(f"{'':>7}   {name}: {result['stale']} of {result['reads']} stale")
+            consistent = consistent and not stale and not load["errors"]
+    finally:
+        if redis_process is not None:
+            await stop(redis_process)
+    return consistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--state", choices=("redis", "memory"), default="redis")
+    parser.add_argument("--redis-url", help="a running Redis instead of the local stand-in")
+    parser.add_argument("--size", type=int, default=10000, help="matches in the seeded database")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per worker count")
+    parser.add_argument("--clients", type=int, default=2, help="client processes driving the load")
+    parser.add_argument("--concurrency", type=int, default=16, help="connections per client process")
+    parser.add_argument("--reads", type=int, default=8, help="reads per worker after each write")
+    parser.add_argument("--settle", type=float, default=0.2, help="seconds between a write and its reads")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "dribbling-bench"))
+    parser.add_argument("--drive", help=argparse.SUPPRESS)
+    parser.add_argument("--max-match", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--max-user", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--seed", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.drive:
+        asyncio.run(drive(args.drive, args.duration, args.concurrency, args.max_match, args.max_user, args.seed))
+        return
+
+    from benchmarks.bench_cold_start import seed
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    path = os.path.join(args.data_dir, f"bench-{args.size}.db")
+    os.environ.setdefault("BOT_TOKEN", BOT_TOKEN)
+    os.environ.setdefault("WEBAPP_URL", "https://example.invalid/app")
+    asyncio.run(seed(path, args.size))
+
+    consistent = asyncio.run(bench(args, path))
+    if args.state == "redis" and not consistent:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Shared helpers for the benchmark scripts: seeded database and query counting"""
+import asyncio
+import random
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import Base, async_database_url, engine_options, get_db, tune_engine
+from app.models import User, Match, MatchPlayer
+from app import geo
+from app.auth import CurrentUser, get_current_user
+from app.cache import LocalResponseStore, response_cache
+from app.config import settings
+
+FORMATS = {"5x5": 10, "7x7": 14, "11x11": 22}
+
+
+def make_engine(url="sqlite://"):
+    url = async_database_url(url)
+    engine = create_async_engine(url, **engine_options(url))
+    tune_engine(engine.sync_engine)
+    return engine
+
+
+async def seed(engine, users=200, matches=500, seed_value=42, spread=0.1, create=True):
+    """Fill the database with random users, matches and players
+
+    With ``create`` the schema is recreated from the models first;
+    pass ``create=False`` for a database already built by migrations.
+    """
+    rnd = random.Random(seed_value)
+    if create:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+    start = datetime.utcnow()
+    match_rows, player_rows = [], []
+    for i in range(matches):
+        fmt = rnd.choice(list(FORMATS))
+        joined = rnd.sample(range(1, users + 1), rnd.randint(1, min(FORMATS[fmt], users)))
+        lat, lon = 39.4952 + rnd.uniform(-spread, spread), 67.6093 + rnd.uniform(-spread, spread)
+        match_rows.append(dict(
+            id=i + 1,
+            title=f"Match {i}",
+            stadium="Central",
+            city="Пенджикент",
+            date_time=start + timedelta(hours=i),
+            format=fmt,
+            max_players=FORMATS[fmt],
+            players_count=len(joined),
+            status="full" if len(joined) >= FORMATS[fmt] else "open",
+            created_by=rnd.randint(1, users),
+            latitude=lat,
+            longitude=lon,
+            geohash=geo.encode(lat, lon),
+            created_at=start,
+        ))
+        player_rows.extend(dict(match_id=i + 1, user_id=user_id, joined_at=start) for user_id in joined)
+
+    # Core executemany keeps seeding fast enough for large benchmark sizes
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [
+            dict(id=i + 1, telegram_id=1000 + i, username=f"user{i}", first_name=f"Player {i}",
+                 rating=settings.RATING_INITIAL, matches_played=0, wins=0, losses=0, created_at=start)
+            for i in range(users)
+        ])
+        if match_rows:
+            await conn.execute(insert(Match), match_rows)
+        if player_rows:
+            await conn.execute(insert(MatchPlayer), player_rows)
+
+
+@contextmanager
+def count_queries(engine):
+    """Collect every statement executed on ``engine`` while the block runs"""
+    statements = []
+    sync_engine = engine.sync_engine
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def override_settings(**values):
+    """Set ``settings`` fields for the block, restoring them afterwards"""
+    saved = {name: getattr(settings, name) for name in values}
+    for name, value in values.items():
+        setattr(settings, name, value)
+    try:
+        yield settings
+    finally:
+        for name, value in saved.items():
+            setattr(settings, name, value)
+
+
+@asynccontextmanager
+async def build_app(engine, cache=False, user_id=1):
+    """The production app (``app.main.create_app``) bound to ``engine``
+
+    Routes, middleware, admission control and the serializer are the
+    ones ``uvicorn app.main:app`` runs; only ``get_db`` and, unless
+    ``user_id`` is None, ``get_current_user`` are overridden. The
+    lifespan is not run, since it warms the module-level engine rather
+    than ``engine``. For the block's duration the response cache is
+    off unless ``cache`` is set, so repeated requests measure the
+    database path rather than cache hits. Per-user rate limits are off
+    while ``user_id`` fixes the caller, since every request then comes
+    from the same user. Both are restored on exit.
+    """
+    from app.main import create_app
+
+    Session = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_db():
+        async with Session() as db:
+            yield db
+
+    app = create_app()
+    app.dependency_overrides[get_db] = override_get_db
+    if user_id is not None:
+        async with Session() as db:
+            user = CurrentUser.from_user(await db.get(User, user_id))
+
+        async def override_get_current_user():
+            return user
+
+        app.dependency_overrides[get_current_user] = override_get_current_user
+
+    store = response_cache.store
+    response_cache.set_store(LocalResponseStore(settings.RESPONSE_CACHE_SIZE if cache else 0))
+    try:
+        with override_settings(RATE_LIMIT_ENABLED=settings.RATE_LIMIT_ENABLED and user_id is None):
+            yield app
+    finally:
+        response_cache.set_store(store)
+
+
+def client_for(app):
+    """In-process HTTP client driving the ASGI app directly
+
+    Paths are relative to ``/api``, like the frontend's API_BASE_URL.
+    """
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench/api")
+
+
+@asynccontextmanager
+async def serve(app):
+    """Run ``app`` under uvicorn on a free local port; yields its base URL"""
+    import uvicorn
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
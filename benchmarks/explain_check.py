@@ -0,0 +1,162 @@
+"""EXPLAIN every statement the API routes run and fail on sequential scans
+
+Run with ``python -m benchmarks.explain_check``. The schema is built by
+the Alembic migrations (downgrade base, upgrade head), so this also
+checks that the migration history creates the indexes the routes need.
+BENCH_DATABASE_URL points it at PostgreSQL (sync URL, empty database);
+the default is a throwaway SQLite file.
+
+Statements without WHERE and LIMIT (the ranking snapshot) read whole
+tables on purpose and are not checked.
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+from contextlib import contextmanager
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event
+
+from benchmarks.common import build_app, client_for, make_engine, seed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHECKED = ("SELECT", "UPDATE", "DELETE", "WITH")
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(?!\()(\S+)( AS \S+)?$")
+# Subqueries SQLite runs as co-routines or materializes: scanning their
+# (LIMITed) output is not a table scan, their own steps are checked
+SQLITE_SUBQUERY = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (\S+)$")
+
+
+def migrate(url: str):
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.downgrade(config, "base")
+    command.upgrade(config, "head")
+
+
+@contextmanager
+def capture(engine):
+    """Collect (route, statement, parameters) for statements run while active"""
+    captured = []
+    route = {"name": None}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(CHECKED) and not executemany:
+            captured.append((route["name"], statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield captured, route
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def exercise(client, route):
+    """Hit every read route with its common filter combinations"""
+    async def call(method, path, **params):
+        route["name"] = f"{method} {path} {params or ''}".strip()
+        response = await client.request(method, path, params=params)
+        assert response.status_code < 500, response.text
+        return response
+
+    first = await call("GET", "/matches/")
+    cursor = first.headers.get("X-Next-Cursor")
+    await call("GET", "/matches/", limit=20)
+    if cursor:
+        await call("GET", "/matches/", cursor=cursor)
+    await call("GET", "/matches/", city="Пенджикент")
+    await call("GET", "/matches/", city="Пенджикент", format="5x5")
+    await call("GET", "/matches/", status="full", city="Пенджикент")
+    await call("GET", "/matches/", status="")
+    await call("GET", "/matches/nearby", lat=39.4952, lon=67.6093, radius=2)
+    await call("GET", "/matches/nearby", bbox="67.55,39.45,67.65,39.55")
+    await call("GET", "/matches/nearby", bbox="67.0,39.0,68.0,40.0", cluster="true")
+
+    match_id = first.json()[0]["id"]
+    await call("GET", f"/matches/{match_id}")
+    await call("POST", f"/matches/{match_id}/join")
+    await call("POST", f"/matches/{match_id}/leave")
+
+    history = await call("GET", "/users/1/matches", limit=5)
+    if history.headers.get("X-Next-Cursor"):
+        await call("GET", "/users/1/matches", cursor=history.headers["X-Next-Cursor"])
+    await call("GET", "/users/1/matches", status="open")
+    await call("GET", "/users/2")
+    await call("GET", "/leaderboard/")
+
+
+def _is_bulk_load(statement: str) -> bool:
+    words = set(statement.upper().split())
+    return "SELECT" in words and "WHERE" not in words and "LIMIT" not in words
+
+
+def _postgres_seq_scans(plan) -> list:
+    found = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if node.get("Node Type") == "Seq Scan":
+            found.append(f"Seq Scan on {node.get('Relation Name')}")
+        stack.extend(node.get("Plans", ()))
+    return found
+
+
+async def explain(engine, statement, parameters) -> list:
+    """Sequential scans in the plan of one captured statement"""
+    async with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            steps = [row[-1] for row in (await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)).all()]
+            subqueries = {m.group(1) for m in map(SQLITE_SUBQUERY.match, steps) if m}
+            return [
+                step for step in steps
+                if (m := SQLITE_FULL_SCAN.match(step)) and m.group(1) not in subqueries
+            ]
+        # Small seeded tables make a seq scan the cheapest plan; ask the
+        # planner whether an index path exists at all
+        await conn.exec_driver_sql("SET enable_seqscan = off")
+        plan = (await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return _postgres_seq_scans(plan[0]["Plan"])
+
+
+async def main():
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if not url:
+        url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "explain.db")
+    migrate(url)
+
+    engine = make_engine(url)
+    try:
+        await seed(engine, users=2000, matches=20000, create=False)
+        # Production planners work from statistics (autovacuum, PRAGMA optimize)
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("ANALYZE")
+        with capture(engine) as (captured, route):
+            async with build_app(engine) as app, client_for(app) as client:
+                await exercise(client, route)
+
+        failures, checked, seen = 0, 0, set()
+        for name, statement, parameters in captured:
+            if _is_bulk_load(statement) or (statement, repr(parameters)) in seen:
+                continue
+            seen.add((statement, repr(parameters)))
+            checked += 1
+            scans = await explain(engine, statement, parameters)
+            if scans:
+                failures += 1
+                print(f"FAIL {name}: {', '.join(scans)}\n     {' '.join(statement.split())[:200]}")
+    finally:
+        await engine.dispose()
+
+    print(f"{checked} statements checked, {failures} with sequential scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
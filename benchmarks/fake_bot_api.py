@@ -0,0 +1,83 @@
+"""A local stand-in for the Telegram Bot API that enforces its flood limits
+
+Point TELEGRAM_API_URL at it (``benchmarks.common.serve(FakeBotAPI().app)``)
+to exercise app.notifications without Telegram. Only sendMessage is
+implemented. Like Telegram it answers 429 with ``retry_after`` when the
+bot exceeds ``global_rate`` messages per second or sends to one chat
+more often than every ``chat_interval`` seconds, 403 for chats in
+``blocked`` and, with ``error_rate``, random 500s.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Set
+from urllib.parse import parse_qsl
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class Sent(NamedTuple):
+    chat_id: int
+    text: str
+    at: float
+
+
+class FakeBotAPI:
+    def __init__(self, global_rate: float = 30, chat_interval: float = 1.0, blocked: Set[int] = frozenset(),
+                 error_rate: float = 0.0, latency: float = 0.0, seed: int = 1):
+        self.global_rate = global_rate
+        self.chat_interval = chat_interval
+        self.blocked = set(blocked)
+        self.error_rate = error_rate
+        self.latency = latency
+        self.sent: List[Sent] = []
+        self.rejected: Dict[int, int] = {}  # status code -> count
+        self._window: Deque[float] = deque()
+        self._last_by_chat: Dict[int, float] = {}
+        self._rnd = random.Random(seed)
+        self.app = FastAPI()
+        self.app.post("/bot{token}/{method}")(self.handle)
+
+    def _reject(self, status: int, description: str, **parameters) -> JSONResponse:
+        self.rejected[status] = self.rejected.get(status, 0) + 1
+        body = {"ok": False, "error_code": status, "description": description}
+        if parameters:
+            body["parameters"] = parameters
+        return JSONResponse(body, status_code=status)
+
+    async def handle(self, token: str, method: str, request: Request):
+        if method != "sendMessage":
+            return self._reject(404, "Not Found: method not found")
+        body = await request.body()
+        if request.headers.get("content-type", "").startswith("multipart/"):
+            fields = {key: str(value) for key, value in (await request.form()).items()}
+        else:
+            fields = dict(parse_qsl(body.decode()))
+        chat_id, text = int(fields["chat_id"]), fields.get("text", "")
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        now = time.monotonic()
+        while self._window and self._window[0] <= now - 1:
+            self._window.popleft()
+        # Small slack: client and server clocks tick at slightly different moments
+        if len(self._window) >= self.global_rate * 1.1:
+            return self._reject(429, "Too Many Requests: retry after 1", retry_after=1)
+        if now - self._last_by_chat.get(chat_id, -1e9) < self.chat_interval * 0.9:
+            return self._reject(429, "Too Many Requests: retry after 1", retry_after=1)
+        if chat_id in self.blocked:
+            return self._reject(403, "Forbidden: bot was blocked by the user")
+        if self.error_rate and self._rnd.random() < self.error_rate:
+            return self._reject(500, "Internal Server Error")
+
+        self._window.append(now)
+        self._last_by_chat[chat_id] = now
+        self.sent.append(Sent(chat_id, text, now))
+        return {"ok": True, "result": {
+            "message_id": len(self.sent),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": text,
+        }}
@@ -0,0 +1,399 @@
+"""A local stand-in for Redis: enough of the protocol for app.state
+
+Point REDIS_URL at it to run several workers with shared state where no
+Redis server is installed::
+
+    python -m benchmarks.fake_redis --port 6390
+    REDIS_URL=redis://127.0.0.1:6390/0 uvicorn app.main:app --workers 2
+
+or in-process with ``await FakeRedis().start()``. It speaks RESP2 and
+implements the string, counter, set, expiry, pub/sub and
+MULTI/EXEC/WATCH commands app.state sends, single-threaded like Redis,
+so every command and every EXEC is atomic. ``disconnect_all`` drops
+every client, to exercise reconnects. Not a database: nothing is
+persisted and there is no eviction.
+"""
+import argparse
+import asyncio
+import fnmatch
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+class Status(str):
+    """A simple-string reply (+OK)"""
+
+
+class Error(Exception):
+    pass
+
+
+class Raw(bytes):
+    """A reply that is already encoded"""
+
+
+def encode(value: Any) -> bytes:
+    if isinstance(value, Raw):
+        return bytes(value)
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, Status):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, Error):
+        return b"-" + str(value).encode() + b"\r\n"
+    if isinstance(value, bool):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, (list, tuple, set)):
+        return b"*%d\r\n" % len(value) + b"".join(encode(item) for item in value)
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+OK = Status("OK")
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()  # inline command, as typed into telnet
+    args = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+class Client:
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.channels: Set[bytes] = set()
+        self.queued: Optional[List[List[bytes]]] = None  # inside MULTI
+        self.watched: Dict[bytes, int] = {}  # key -> version at WATCH
+
+    def send(self, value: Any):
+        self.writer.write(encode(value))
+
+
+class FakeRedis:
+    def __init__(self):
+        self._data: Dict[bytes, Tuple[Any, float]] = {}  # key -> (bytes or set, expires_at)
+        self._versions: Dict[bytes, int] = {}
+        self._channels: Dict[bytes, Set[Client]] = {}
+        self._clients: Set[Client] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.commands = 0
+
+    # Server ----------------------------------------------------------------
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start listening; returns the redis:// URL"""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"redis://{host}:{port}/0"
+
+    async def stop(self):
+        self.disconnect_all()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def disconnect_all(self):
+        for client in list(self._clients):
+            client.writer.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client = Client(writer)
+        self._clients.add(client)
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                if args:
+                    client.send(self._run(client, args))
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.discard(client)
+            for channel in client.channels:
+                self._channels.get(channel, set()).discard(client)
+            writer.close()
+
+    # Dispatch --------------------------------------------------------------
+
+    def _run(self, client: Client, args: List[bytes]) -> Any:
+        self.commands += 1
+        name = args[0].upper().decode()
+        if client.queued is not None and name not in ("EXEC", "DISCARD", "MULTI", "WATCH"):
+            client.queued.append(args)
+            return Status("QUEUED")
+        if client.channels and name not in ("SUBSCRIBE", "UNSUBSCRIBE", "PING", "QUIT"):
+            return Error(f"ERR Can't execute '{name.lower()}' in subscribed mode")
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            return Error(f"ERR unknown command '{name}'")
+        try:
+            return handler(client, *args[1:])
+        except TypeError:
+            return Error(f"ERR wrong number of arguments for '{name.lower()}' command")
+        except Error as e:
+            return e
+        except ValueError:
+            return Error("ERR value is not an integer or out of range")
+
+    def _get(self, key: bytes) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry[0]
+
+    def _put(self, key: bytes, value: Any, expires_at: float = float("inf")):
+        self._data[key] = (value, expires_at)
+        self._touch(key)
+
+    def _touch(self, key: bytes):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _expires_at(self, key: bytes) -> float:
+        return self._data[key][1] if self._get(key) is not None else float("inf")
+
+    # Connection ------------------------------------------------------------
+
+    def cmd_ping(self, client, message=None):
+        if client.channels:
+            return [b"pong", message or b""]
+        return message if message is not None else Status("PONG")
+
+    def cmd_echo(self, client, message):
+        return message
+
+    def cmd_client(self, client, *args):
+        return OK
+
+    def cmd_select(self, client, db):
+        return OK
+
+    def cmd_quit(self, client):
+        return OK
+
+    def cmd_flushdb(self, client, *args):
+        for key in list(self._data):
+            self._touch(key)
+        self._data.clear()
+        return OK
+
+    cmd_flushall = cmd_flushdb
+
+    def cmd_dbsize(self, client):
+        return sum(self._get(key) is not None for key in list(self._data))
+
+    def cmd_keys(self, client, pattern):
+        return [key for key in list(self._data) if self._get(key) is not None and fnmatch.fnmatchcase(key, pattern)]
+
+    # Strings and counters --------------------------------------------------
+
+    def cmd_get(self, client, key):
+        value = self._get(key)
+        if isinstance(value, set):
+            raise Error("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def cmd_mget(self, client, *keys):
+        return [value if isinstance(value, bytes) else None for value in map(self._get, keys)]
+
+    def cmd_set(self, client, key, value, *options):
+        expires_at, only_new, only_existing = float("inf"), False, False
+        options = [option.upper() for option in options]
+        i = 0
+        while i < len(options):
+            if options[i] == b"EX":
+                expires_at, i = time.monotonic() + int(options[i + 1]), i + 1
+            elif options[i] == b"PX":
+                expires_at, i = time.monotonic() + int(options[i + 1]) / 1000, i + 1
+            elif options[i] == b"NX":
+                only_new = True
+            elif options[i] == b"XX":
+                only_existing = True
+            else:
+                raise Error("ERR syntax error")
+            i += 1
+        exists = self._get(key) is not None
+        if (only_new and exists) or (only_existing and not exists):
+            return None
+        self._put(key, value, expires_at)
+        return OK
+
+    def cmd_del(self, client, *keys):
+        deleted = 0
+        for key in keys:
+            if self._get(key) is not None:
+                del self._data[key]
+                self._touch(key)
+                deleted += 1
+        return deleted
+
+    def cmd_exists(self, client, *keys):
+        return sum(self._get(key) is not None for key in keys)
+
+    def cmd_incrby(self, client, key, amount):
+        value = int(self._get(key) or 0) + int(amount)
+        self._put(key, str(value).encode(), self._expires_at(key))
+        return value
+
+    def cmd_incr(self, client, key):
+        return self.cmd_incrby(client, key, b"1")
+
+    def cmd_decrby(self, client, key, amount):
+        return self.cmd_incrby(client, key, b"%d" % -int(amount))
+
+    def cmd_decr(self, client, key):
+        return self.cmd_incrby(client, key, b"-1")
+
+    def cmd_pexpire(self, client, key, milliseconds):
+        value = self._get(key)
+        if value is None:
+            return 0
+        self._put(key, value, time.monotonic() + int(milliseconds) / 1000)
+        return 1
+
+    def cmd_expire(self, client, key, seconds):
+        return self.cmd_pexpire(client, key, b"%d" % (int(seconds) * 1000))
+
+    def cmd_pttl(self, client, key):
+        if self._get(key) is None:
+            return -2
+        expires_at = self._data[key][1]
+        return -1 if expires_at == float("inf") else int((expires_at - time.monotonic()) * 1000)
+
+    def cmd_ttl(self, client, key):
+        ttl = self.cmd_pttl(client, key)
+        return ttl if ttl < 0 else (ttl + 999) // 1000
+
+    # Sets ------------------------------------------------------------------
+
+    def _set(self, key: bytes) -> Set[bytes]:
+        value = self._get(key)
+        if value is not None and not isinstance(value, set):
+            raise Error("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value or set()
+
+    def cmd_sadd(self, client, key, *members):
+        members_set = self._set(key)
+        added = len(set(members) - members_set)
+        self._put(key, members_set | set(members), self._expires_at(key))
+        return added
+
+    def cmd_srem(self, client, key, *members):
+        members_set = self._set(key)
+        removed = len(members_set & set(members))
+        remaining = members_set - set(members)
+        if remaining:
+            self._put(key, remaining, self._expires_at(key))
+        else:
+            self.cmd_del(client, key)
+        return removed
+
+    def cmd_smembers(self, client, key):
+        return sorted(self._set(key))
+
+    def cmd_scard(self, client, key):
+        return len(self._set(key))
+
+    def cmd_sismember(self, client, key, member):
+        return int(member in self._set(key))
+
+    # Transactions ----------------------------------------------------------
+
+    def cmd_multi(self, client):
+        if client.queued is not None:
+            raise Error("ERR MULTI calls can not be nested")
+        client.queued = []
+        return OK
+
+    def cmd_discard(self, client):
+        if client.queued is None:
+            raise Error("ERR DISCARD without MULTI")
+        client.queued = None
+        client.watched = {}
+        return OK
+
+    def cmd_watch(self, client, *keys):
+        if client.queued is not None:
+            raise Error("ERR WATCH inside MULTI is not allowed")
+        for key in keys:
+            client.watched[key] = self._versions.get(key, 0)
+        return OK
+
+    def cmd_unwatch(self, client):
+        client.watched = {}
+        return OK
+
+    def cmd_exec(self, client):
+        if client.queued is None:
+            raise Error("ERR EXEC without MULTI")
+        queued, client.queued = client.queued, None
+        watched, client.watched = client.watched, {}
+        if any(self._versions.get(key, 0) != version for key, version in watched.items()):
+            return None  # a watched key changed: abort
+        return [self._run(client, args) for args in queued]
+
+    # Pub/sub ---------------------------------------------------------------
+
+    def cmd_publish(self, client, channel, message):
+        subscribers = self._channels.get(channel, ())
+        payload = encode([b"message", channel, message])
+        for subscriber in subscribers:
+            subscriber.writer.write(payload)
+        return len(subscribers)
+
+    def cmd_subscribe(self, client, *channels):
+        replies = []
+        for channel in channels:
+            client.channels.add(channel)
+            self._channels.setdefault(channel, set()).add(client)
+            replies.append(encode([b"subscribe", channel, len(client.channels)]))
+        # Several replies to one command: written here, the dispatcher's
+        # own reply is skipped
+        client.writer.write(b"".join(replies[:-1]))
+        return Raw(replies[-1])
+
+    def cmd_unsubscribe(self, client, *channels):
+        channels = channels or tuple(client.channels)
+        if not channels:
+            return [b"unsubscribe", None, 0]
+        replies = []
+        for channel in channels:
+            client.channels.discard(channel)
+            subscribers = self._channels.get(channel)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self._channels[channel]
+            replies.append(encode([b"unsubscribe", channel, len(client.channels)]))
+        client.writer.write(b"".join(replies[:-1]))
+        return Raw(replies[-1])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    server = FakeRedis()
+    url = await server.start(args.host, args.port)
+    print(f"listening on {url}", flush=True)
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+"""Many concurrent joiners race for the last slots of one match
+
+Run with ``python -m benchmarks.load_join [joiners]``. Uses a temporary
+SQLite file unless BENCH_DATABASE_URL points at PostgreSQL.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import make_engine
+from app.database import Base
+from app.models import User, Match, MatchPlayer
+from app.routers import matches
+
+
+async def main():
+    joiners = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/load_join.db"
+    engine = make_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async with Session() as db:
+        users = [User(telegram_id=5000 + i, first_name=f"Joiner {i}") for i in range(joiners + 1)]
+        db.add_all(users)
+        await db.flush()
+        match = Match(
+            title="Evening 5x5", stadium="Central",
+            date_time=datetime.utcnow() + timedelta(hours=3),
+            format="5x5", max_players=10, players_count=1,
+            status="open", created_by=users[0].id,
+        )
+        db.add(match)
+        await db.flush()
+        db.add(MatchPlayer(match_id=match.id, user_id=users[0].id))
+        await db.commit()
+        match_id = match.id
+
+    async def join(user):
+        async with Session() as db:
+            try:
+                await matches.join_match(match_id, None, db, user)
+                return "joined"
+            except HTTPException as exc:
+                return exc.detail
+
+    outcomes = await asyncio.gather(*(join(user) for user in users[1:]))
+
+    async with Session() as db:
+        match = await db.get(Match, match_id)
+        rows = (await db.execute(
+            select(func.count()).select_from(MatchPlayer).where(MatchPlayer.match_id == match_id)
+        )).scalar()
+
+    await engine.dispose()
+
+    joined = outcomes.count("joined")
+    print(f"joiners={joiners} joined={joined} rejected={len(outcomes) - joined}")
+    print(f"players_count={match.players_count} rows={rows} max_players={match.max_players} status={match.status}")
+    assert match.players_count == rows <= match.max_players
+    if joiners >= match.max_players - 1:
+        assert match.status == "full"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
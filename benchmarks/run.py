@@ -0,0 +1,322 @@
+"""Benchmark every API route at several data sizes and save the results as JSON
+
+    python -m benchmarks.run [--sizes 1000 10000 100000 1000000] [--mode asgi uvicorn]
+                             [--requests 500] [--concurrency 10] [--compare OLD.json]
+
+For each size the database is filled by the synthetic generator
+(app.bulk) and each scenario is driven in-process through the ASGI
+transport and/or over HTTP against uvicorn on a local port. The report
+has p50/p95/p99 latency, throughput and SQL statements per request.
+
+BENCH_DATABASE_URL points it at a local PostgreSQL database (sync URL;
+its tables are dropped and recreated). By default SQLite files are kept
+in --data-dir and reused while their size and seed match, since seeding
+1M matches (about 11M roster rows) takes several minutes.
+
+The response cache is off, so numbers measure the database path. The
+uvicorn server runs in the benchmark's event loop, so its latencies
+include the client's share of the CPU too.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple
+
+import httpx
+from sqlalchemy import and_, exists, func, inspect, select
+
+from app.bulk import Generator, chunked, load_rows
+from app.database import Base
+from app.models import Match, MatchPlayer, User
+from app.pagination import encode_cursor
+from benchmarks.common import build_app, client_for, count_queries, make_engine, serve
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = (1000, 10000)
+SEED = 42
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    paths: Callable[[int], List[str]]  # request count -> paths to hit, in order
+
+
+class Result(NamedTuple):
+    size: int
+    mode: str
+    scenario: str
+    requests: int
+    errors: int
+    concurrency: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    throughput_rps: float
+    queries_per_request: float
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+# Data ---------------------------------------------------------------------
+
+def _current_schema(sync_conn) -> bool:
+    inspector = inspect(sync_conn)
+    return all(
+        inspector.has_table(table.name)
+        and {column["name"] for column in inspector.get_columns(table.name)} == set(table.c.keys())
+        for table in Base.metadata.sorted_tables
+    )
+
+
+async def prepare(engine, size: int) -> bool:
+    """Seed ``size`` matches unless the database already holds them; True when seeded"""
+    async with engine.connect() as conn:
+        existing = None
+        if await conn.run_sync(_current_schema):
+            existing = (await conn.execute(select(func.count()).select_from(Match))).scalar()
+    if existing == size:
+        return False
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    generator = Generator(users=max(200, size // 4), matches=size, seed=SEED)
+    async with engine.connect() as conn:
+        await load_rows(conn, "users", chunked(generator.user_rows()))
+        for match_rows, player_rows in generator.match_chunks():
+            await load_rows(conn, "matches", [match_rows])
+            await load_rows(conn, "match_players", [player_rows])
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("ANALYZE")
+    return True
+
+
+async def scenarios(engine) -> List[Scenario]:
+    """Request paths drawn from the seeded data (fixed seed, so runs compare)"""
+    async with engine.connect() as conn:
+        max_match = (await conn.execute(select(func.max(Match.id)))).scalar()
+        max_user = (await conn.execute(select(func.max(User.id)))).scalar()
+        cursor_page = await conn.execute(
+            select(Match.date_time, Match.id).where(Match.status == "open")
+            .order_by(Match.date_time, Match.id).offset(50).limit(1)
+        )
+        # Open matches with a free slot that user 1 (the benchmark user)
+        # neither plays in nor created, so join and leave both succeed
+        joinable = (await conn.execute(
+            select(Match.id)
+            .where(
+                Match.status == "open",
+                Match.players_count < Match.max_players,
+                Match.created_by != 1,
+                ~exists().where(and_(MatchPlayer.match_id == Match.id, MatchPlayer.user_id == 1))
+            )
+            .order_by(Match.id)
+        )).scalars().all()
+    cursor_row = cursor_page.first()
+
+    rnd = random.Random(SEED)
+
+    def repeat(path):
+        return lambda n: [path] * n
+
+    def random_ids(template, top):
+        return lambda n: [template.format(rnd.randint(1, top)) for _ in range(n)]
+
+    page_two = "/matches/"
+    if cursor_row is not None:
+        page_two += "?cursor=" + encode_cursor((cursor_row.date_time, cursor_row.id))
+
+    return [
+        Scenario("GET /matches", "GET", repeat("/matches/")),
+        Scenario("GET /matches page 2", "GET", repeat(page_two)),
+        Scenario("GET /matches?status=all", "GET", repeat("/matches/?status=")),
+        Scenario("GET /matches/nearby", "GET", repeat("/matches/nearby?lat=39.4952&lon=67.6093&radius=3")),
+        Scenario("GET /matches/{id}", "GET", random_ids("/matches/{}", max_match)),
+        Scenario("POST /matches/{id}/join", "POST", lambda n: [f"/matches/{i}/join" for i in joinable[:n]]),
+        Scenario("POST /matches/{id}/leave", "POST", lambda n: [f"/matches/{i}/leave" for i in joinable[:n]]),
+        Scenario("GET /leaderboard", "GET", repeat("/leaderboard/")),
+        Scenario("GET /users/{id}/matches", "GET", random_ids("/users/{}/matches", max_user)),
+    ]
+
+
+# Driving ------------------------------------------------------------------
+
+async def drive(client: httpx.AsyncClient, engine, scenario: Scenario, requests: int,
+                concurrency: int, size: int, mode: str) -> Result:
+    paths = scenario.paths(requests)
+    latencies: List[float] = []
+    errors = 0
+    queue = iter(paths)
+
+    async def worker():
+        nonlocal errors
+        for path in queue:
+            started = time.perf_counter()
+            response = await client.request(scenario.method, path)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    with count_queries(engine) as statements:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+    done = len(latencies)
+    return Result(
+        size, mode, scenario.name, done, errors, concurrency,
+        round(percentile(latencies, 50) * 1000, 3),
+        round(percentile(latencies, 95) * 1000, 3),
+        round(percentile(latencies, 99) * 1000, 3),
+        round(sum(latencies) / done * 1000, 3) if done else 0.0,
+        round(done / wall, 1) if wall else 0.0,
+        round(len(statements) / done, 2) if done else 0.0,
+    )
+
+
+@asynccontextmanager
+async def uvicorn_client(app, concurrency: int):
+    """HTTP client for ``app`` served by uvicorn for the block's duration"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with serve(app) as base_url:
+        async with httpx.AsyncClient(base_url=base_url + "/api", limits=limits) as client:
+            yield client
+
+
+def _client(mode: str, app, concurrency: int):
+    return client_for(app) if mode == "asgi" else uvicorn_client(app, concurrency)
+
+
+async def bench_size(url: str, size: int, modes: List[str], requests: int, concurrency: int) -> List[Result]:
+    engine = make_engine(url)
+    try:
+        started = time.perf_counter()
+        if await prepare(engine, size):
+            print(f"Seeded {size} matches in {time.perf_counter() - started:.1f}s")
+        cases = await scenarios(engine)
+
+        results = []
+        async with build_app(engine) as app:
+            for mode in modes:
+                async with _client(mode, app, concurrency) as client:
+                    for scenario in cases:
+                        if scenario.method == "GET":
+                            # Warm-up: connections, statement caches, the database's page cache
+                            await drive(client, engine, scenario, 20, concurrency, size, mode)
+                        result = await drive(client, engine, scenario, requests, concurrency, size, mode)
+                        results.append(result)
+                        print(
+                            f"{size:>8} {mode:<8} {result.scenario:<26} {result.p50_ms:>8.2f} "
+                            f"{result.p95_ms:>8.2f} {result.p99_ms:>8.2f} {result.throughput_rps:>9.1f} "
+                            f"{result.queries_per_request:>6.2f}"
+                            + (f"  {result.errors} errors" if result.errors else "")
+                        )
+    finally:
+        await engine.dispose()
+    return results
+
+
+# Reporting ----------------------------------------------------------------
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old_path: str, results: List[Result], threshold: float) -> int:
+    """Print p95 and query count changes against an earlier run; count regressions
+
+    More statements per request always counts; latency only past ``threshold``,
+    since p95 on a shared machine moves by tens of percent between runs.
+    """
+    with open(old_path) as f:
+        old = {(r["size"], r["mode"], r["scenario"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\nAgainst {old_path} (p95 regression threshold {threshold:.0%}):")
+    for result in results:
+        before = old.get((result.size, result.mode, result.scenario))
+        if not before or not before["p95_ms"]:
+            continue
+        change = result.p95_ms / before["p95_ms"] - 1
+        flag = ""
+        if change > threshold or result.queries_per_request > before["queries_per_request"]:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(
+            f"{result.size:>8} {result.mode:<8} {result.scenario:<26} p95 {before['p95_ms']:>8.2f} -> "
+            f"{result.p95_ms:>8.2f} ({change:+.0%}), queries {before['queries_per_request']} -> "
+            f"{result.queries_per_request}{flag}"
+        )
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--mode", nargs="+", choices=("asgi", "uvicorn"), default=["asgi", "uvicorn"])
+    parser.add_argument("--requests", type=int, default=500, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "dribbling-bench"))
+    parser.add_argument("--output", help="results file (default benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument("--compare", help="an earlier results file to diff against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 growth counted as a regression")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    print(f"{'size':>8} {'mode':<8} {'scenario':<26} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'req/s':>9} {'sql/r':>6}")
+    results: List[Result] = []
+    for size in args.sizes:
+        url = os.environ.get("BENCH_DATABASE_URL")
+        if not url:
+            os.makedirs(args.data_dir, exist_ok=True)
+            url = "sqlite:///" + os.path.join(args.data_dir, f"bench-{size}-{SEED}.db")
+        results += await bench_size(url, size, args.mode, args.requests, args.concurrency)
+
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"{commit}-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    report: Dict = {
+        "commit": commit,
+        "created_at": datetime.utcnow().isoformat(),
+        "database": "postgresql" if os.environ.get("BENCH_DATABASE_URL", "").startswith("postgres") else "sqlite",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "results": [result._asdict() for result in results],
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        return 1 if compare(args.compare, results, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
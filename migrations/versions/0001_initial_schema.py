@@ -0,0 +1,75 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-06-01 12:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("telegram_id", sa.Integer(), nullable=True),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("first_name", sa.String(), nullable=True),
+        sa.Column("photo_url", sa.String(), nullable=True),
+        sa.Column("rating", sa.Integer(), nullable=True),
+        sa.Column("matches_played", sa.Integer(), nullable=True),
+        sa.Column("wins", sa.Integer(), nullable=True),
+        sa.Column("losses", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_telegram_id", "users", ["telegram_id"], unique=True)
+
+    op.create_table(
+        "matches",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=True),
+        sa.Column("stadium", sa.String(), nullable=True),
+        sa.Column("city", sa.String(), nullable=True),
+        sa.Column("date_time", sa.DateTime(), nullable=True),
+        sa.Column("format", sa.String(), nullable=True),
+        sa.Column("max_players", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("created_by", sa.Integer(), nullable=True),
+        sa.Column("latitude", sa.Float(), nullable=True),
+        sa.Column("longitude", sa.Float(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["created_by"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_matches_id", "matches", ["id"])
+
+    op.create_table(
+        "match_players",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("match_id", sa.Integer(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("team", sa.String(), nullable=True),
+        sa.Column("joined_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["match_id"], ["matches.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_match_players_id", "match_players", ["id"])
+
+
+def downgrade():
+    op.drop_index("ix_match_players_id", table_name="match_players")
+    op.drop_table("match_players")
+    op.drop_index("ix_matches_id", table_name="matches")
+    op.drop_table("matches")
+    op.drop_index("ix_users_telegram_id", table_name="users")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_table("users")
@@ -0,0 +1,43 @@
+"""denormalised players_count and one row per player per match
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-06-01 12:10:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Double joins from before the constraint: keep the earliest row
+    op.execute(
+        "DELETE FROM match_players WHERE id NOT IN ("
+        " SELECT MIN(id) FROM match_players GROUP BY match_id, user_id"
+        ")"
+    )
+
+    with op.batch_alter_table("matches") as batch_op:
+        batch_op.add_column(
+            sa.Column("players_count", sa.Integer(), nullable=False, server_default="0")
+        )
+    op.execute(
+        "UPDATE matches SET players_count = ("
+        " SELECT COUNT(*) FROM match_players WHERE match_players.match_id = matches.id"
+        ")"
+    )
+
+    with op.batch_alter_table("match_players") as batch_op:
+        batch_op.create_unique_constraint("uq_match_players_match_user", ["match_id", "user_id"])
+
+
+def downgrade():
+    with op.batch_alter_table("match_players") as batch_op:
+        batch_op.drop_constraint("uq_match_players_match_user", type_="unique")
+    with op.batch_alter_table("matches") as batch_op:
+        batch_op.drop_column("players_count")
@@ -0,0 +1,47 @@
+"""indexes for the hot route predicates
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-06-01 12:20:00
+
+- GET /matches: (date_time, id) keyset order, (status, city, date_time, id)
+  for city lists and a partial (date_time, id) index over open matches
+  for the default feed
+- GET /users/{id}/matches: match_players(user_id, match_id)
+- GET /leaderboard: users(rating, wins, matches_played, id)
+
+match_players(match_id, user_id) lookups use the unique constraint from 0002.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+OPEN = sa.text("status = 'open'")
+
+
+def upgrade():
+    op.create_index("ix_matches_date_time_id", "matches", ["date_time", "id"])
+    op.create_index(
+        "ix_matches_status_city_date_time", "matches", ["status", "city", "date_time", "id"]
+    )
+    op.create_index(
+        "ix_matches_open_date_time", "matches", ["date_time", "id"],
+        postgresql_where=OPEN, sqlite_where=OPEN
+    )
+    op.create_index("ix_match_players_user_match", "match_players", ["user_id", "match_id"])
+    op.create_index(
+        "ix_users_leaderboard", "users", ["rating", "wins", "matches_played", "id"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_users_leaderboard", table_name="users")
+    op.drop_index("ix_match_players_user_match", table_name="match_players")
+    op.drop_index("ix_matches_open_date_time", table_name="matches")
+    op.drop_index("ix_matches_status_city_date_time", table_name="matches")
+    op.drop_index("ix_matches_date_time_id", table_name="matches")
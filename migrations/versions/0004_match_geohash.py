@@ -0,0 +1,61 @@
+"""geohash column for nearby search, backfilled from latitude/longitude
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-06-01 12:30:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.geo import encode
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    with op.batch_alter_table("matches") as batch_op:
+        batch_op.add_column(sa.Column("geohash", sa.String(length=12), nullable=True))
+
+    matches = sa.table(
+        "matches",
+        sa.column("id", sa.Integer),
+        sa.column("latitude", sa.Float),
+        sa.column("longitude", sa.Float),
+        sa.column("geohash", sa.String)
+    )
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(matches.c.id, matches.c.latitude, matches.c.longitude)
+            .where(
+                matches.c.id > last_id,
+                matches.c.latitude.isnot(None),
+                matches.c.longitude.isnot(None)
+            )
+            .order_by(matches.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            matches.update()
+            .where(matches.c.id == sa.bindparam("match_id"))
+            .values(geohash=sa.bindparam("value")),
+            [{"match_id": row.id, "value": encode(row.latitude, row.longitude)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+    op.create_index("ix_matches_status_geohash", "matches", ["status", "geohash"])
+
+
+def downgrade():
+    op.drop_index("ix_matches_status_geohash", table_name="matches")
+    with op.batch_alter_table("matches") as batch_op:
+        batch_op.drop_column("geohash")
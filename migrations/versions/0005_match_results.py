@@ -0,0 +1,46 @@
+"""match results and team Elo ratings
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-06-08 10:00:00
+
+users.rating used to count games; nothing recorded results, so every
+user starts over at the initial Elo rating.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+INITIAL_RATING = 1000
+
+
+def upgrade():
+    op.create_table(
+        "match_results",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("match_id", sa.Integer(), nullable=False),
+        sa.Column("score_a", sa.Integer(), nullable=False),
+        sa.Column("score_b", sa.Integer(), nullable=False),
+        sa.Column("submitted_by", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["match_id"], ["matches.id"]),
+        sa.ForeignKeyConstraint(["submitted_by"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("match_id")
+    )
+    op.create_index("ix_match_results_id", "match_results", ["id"])
+    op.execute(
+        sa.text("UPDATE users SET rating = :rating, matches_played = 0, wins = 0, losses = 0")
+        .bindparams(rating=INITIAL_RATING)
+    )
+
+
+def downgrade():
+    op.drop_index("ix_match_results_id", table_name="match_results")
+    op.drop_table("match_results")
+    op.execute("UPDATE users SET rating = 0")
@@ -0,0 +1,37 @@
+"""persistent state of background jobs
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-06-15 10:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "scheduled_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("interval_seconds", sa.Integer(), nullable=False),
+        sa.Column("next_run_at", sa.DateTime(), nullable=False),
+        sa.Column("locked_until", sa.DateTime(), nullable=True),
+        sa.Column("last_run_at", sa.DateTime(), nullable=True),
+        sa.Column("last_status", sa.String(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("run_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name")
+    )
+    op.create_index("ix_scheduled_jobs_id", "scheduled_jobs", ["id"])
+
+
+def downgrade():
+    op.drop_index("ix_scheduled_jobs_id", table_name="scheduled_jobs")
+    op.drop_table("scheduled_jobs")
@@ -0,0 +1,70 @@
+"""archive tables for old finished matches
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-06-22 10:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "matches_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("title", sa.String(), nullable=True),
+        sa.Column("stadium", sa.String(), nullable=True),
+        sa.Column("city", sa.String(), nullable=True),
+        sa.Column("date_time", sa.DateTime(), nullable=True),
+        sa.Column("format", sa.String(), nullable=True),
+        sa.Column("max_players", sa.Integer(), nullable=True),
+        sa.Column("players_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("created_by", sa.Integer(), nullable=True),
+        sa.Column("latitude", sa.Float(), nullable=True),
+        sa.Column("longitude", sa.Float(), nullable=True),
+        sa.Column("geohash", sa.String(length=12), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("archived_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_matches_archive_date_time_id", "matches_archive", ["date_time", "id"])
+
+    op.create_table(
+        "match_players_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("match_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("team", sa.String(), nullable=True),
+        sa.Column("joined_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_match_players_archive_match", "match_players_archive", ["match_id"])
+    op.create_index("ix_match_players_archive_user_match", "match_players_archive", ["user_id", "match_id"])
+
+    op.create_table(
+        "match_results_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("match_id", sa.Integer(), nullable=False),
+        sa.Column("score_a", sa.Integer(), nullable=False),
+        sa.Column("score_b", sa.Integer(), nullable=False),
+        sa.Column("submitted_by", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("match_id")
+    )
+
+
+def downgrade():
+    op.drop_table("match_results_archive")
+    op.drop_index("ix_match_players_archive_user_match", table_name="match_players_archive")
+    op.drop_index("ix_match_players_archive_match", table_name="match_players_archive")
+    op.drop_table("match_players_archive")
+    op.drop_index("ix_matches_archive_date_time_id", table_name="matches_archive")
+    op.drop_table("matches_archive")
@@ -0,0 +1,27 @@
+"""reminded_at on matches for kickoff reminders
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2024-06-29 10:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The archive keeps the same columns: archive_matches copies by name
+    for table in ("matches", "matches_archive"):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column("reminded_at", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    for table in ("matches_archive", "matches"):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("reminded_at")
@@ -0,0 +1,27 @@
+"""cover latitude/longitude in the nearby-search index
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2024-07-06 10:00:00
+"""
+from alembic import op
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The viewport filter and the cluster averages read the position from
+    # the index instead of looking up every matching row
+    op.create_index(
+        "ix_matches_status_geohash_position", "matches", ["status", "geohash", "latitude", "longitude"]
+    )
+    op.drop_index("ix_matches_status_geohash", table_name="matches")
+
+
+def downgrade():
+    op.create_index("ix_matches_status_geohash", "matches", ["status", "geohash"])
+    op.drop_index("ix_matches_status_geohash_position", table_name="matches")
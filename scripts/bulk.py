@@ -0,0 +1,121 @@
+"""Bulk export/import of users, matches and players, and a synthetic data generator
+
+    python -m scripts.bulk export DIR [--format csv|jsonl] [--tables users matches ...]
+    python -m scripts.bulk import DIR [--format csv|jsonl] [--tables ...]
+    python -m scripts.bulk generate --users N --matches M [--seed S] [--out DIR --format F]
+
+Files are named ``<table>.<format>`` inside DIR. Import expects the
+schema from ``alembic upgrade head`` and tables that do not hold the
+incoming ids yet; ``generate`` without ``--out`` loads straight into
+DATABASE_URL. Everything streams in chunks of --chunk rows, so memory
+does not grow with the row count.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from app.bulk import (
+    CHUNK_SIZE, FILE_FORMATS, TABLES, Generator, RowWriter, chunked, export_table, import_table, load_rows,
+    reset_sequences
+)
+from app.database import engine
+
+
+def _path(directory: str, name: str, file_format: str) -> str:
+    return os.path.join(directory, f"{name}.{file_format}")
+
+
+def _report(action: str, name: str, count: int, started: float):
+    elapsed = time.perf_counter() - started
+    print(f"{action} {count} {name} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+async def export(args):
+    os.makedirs(args.directory, exist_ok=True)
+    async with engine.connect() as conn:
+        for name in args.tables:
+            started = time.perf_counter()
+            with open(_path(args.directory, name, args.format), "wb") as out:
+                count = await export_table(conn, name, out, args.format, args.chunk)
+            _report("Exported", name, count, started)
+
+
+async def import_(args):
+    async with engine.connect() as conn:
+        # Parents before children, whatever order --tables lists them in
+        for name in [name for name in TABLES if name in args.tables]:
+            started = time.perf_counter()
+            with open(_path(args.directory, name, args.format), "rb") as source:
+                count = await import_table(conn, name, source, args.format, args.chunk)
+            _report("Imported", name, count, started)
+        await reset_sequences(conn, args.tables)
+
+
+async def generate(args):
+    generator = Generator(args.users, args.matches, seed=args.seed)
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        files = {name: open(_path(args.out, name, args.format), "wb") for name in TABLES}
+        try:
+            writers = {name: RowWriter(files[name], TABLES[name], args.format) for name in TABLES}
+            for chunk in chunked(generator.user_rows(), args.chunk):
+                writers["users"].write(chunk)
+            for matches, players in generator.match_chunks(args.chunk):
+                writers["matches"].write(matches)
+                writers["match_players"].write(players)
+        finally:
+            for out in files.values():
+                out.close()
+        for name, writer in writers.items():
+            print(f"Wrote {writer.count} {name} to {files[name].name}")
+        return
+
+    async with engine.connect() as conn:
+        started = time.perf_counter()
+        count = await load_rows(conn, "users", chunked(generator.user_rows(), args.chunk))
+        _report("Generated", "users", count, started)
+
+        started = time.perf_counter()
+        matches = players = 0
+        for match_rows, player_rows in generator.match_chunks(args.chunk):
+            matches += await load_rows(conn, "matches", [match_rows])
+            players += await load_rows(conn, "match_players", [player_rows])
+        _report("Generated", "matches", matches, started)
+        print(f"  with {players} match_players")
+        await reset_sequences(conn, TABLES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for command in ("export", "import"):
+        sub = commands.add_parser(command)
+        sub.add_argument("directory")
+        sub.add_argument("--format", choices=FILE_FORMATS, default="csv")
+        sub.add_argument("--tables", nargs="+", choices=list(TABLES), default=list(TABLES))
+        sub.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+
+    sub = commands.add_parser("generate")
+    sub.add_argument("--users", type=int, required=True)
+    sub.add_argument("--matches", type=int, required=True)
+    sub.add_argument("--seed", type=int, default=42)
+    sub.add_argument("--out", help="write files here instead of loading the database")
+    sub.add_argument("--format", choices=FILE_FORMATS, default="csv")
+    sub.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+
+    args = parser.parse_args()
+    handler = {"export": export, "import": import_, "generate": generate}[args.command]
+
+    async def run():
+        try:
+            await handler(args)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""Replay every stored match result and rewrite all users' ratings
+
+Run with ``python -m scripts.recompute_ratings`` after changing the
+rating formula (RATING_INITIAL, RATING_K_FACTOR or app.rating itself).
+Running API workers keep their in-process leaderboard and cached pages;
+restart them afterwards.
+"""
+import asyncio
+import time
+
+from app.database import SessionLocal, engine
+from app.rating import recompute_all
+
+
+async def main():
+    started = time.perf_counter()
+    async with SessionLocal() as db:
+        updated = await recompute_all(db)
+    await engine.dispose()
+    print(f"Recomputed ratings of {updated} users in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
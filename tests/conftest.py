@@ -0,0 +1,9 @@
+import os
+
+# app.config requires these; the tests never talk to Telegram
+os.environ.setdefault("BOT_TOKEN", "123456:test")
+os.environ.setdefault("WEBAPP_URL", "https://example.invalid/app")
+# Nothing in the tests should open ./dribbling.db or start background work
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SCHEDULER_ENABLED", "false")
+os.environ.setdefault("NOTIFICATIONS_ENABLED", "false")
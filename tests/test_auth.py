@@ -0,0 +1,87 @@
+"""Telegram initData: signature, expiry, and the verified-session cache"""
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import urlencode
+
+from benchmarks.common import build_app, client_for, make_engine, override_settings, seed
+from app.auth import verify_telegram_auth
+from app.config import settings
+
+
+def sign(fields: dict, token: str = None) -> str:
+    """initData for ``fields`` with the hash Telegram would add"""
+    check = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", (token or settings.BOT_TOKEN).encode(), hashlib.sha256).digest()
+    return urlencode({**fields, "hash": hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()})
+
+
+def init_data(telegram_id=555, auth_date=None, **user) -> str:
+    return sign({
+        "auth_date": str(int(time.time()) if auth_date is None else auth_date),
+        "user": json.dumps({"id": telegram_id, "first_name": "Test", **user}),
+    })
+
+
+def verify(value):
+    return asyncio.run(verify_telegram_auth(value))
+
+
+def test_valid_init_data_yields_the_user():
+    user = verify(init_data(telegram_id=777, username="striker"))
+    assert user["id"] == 777
+    assert user["username"] == "striker"
+
+
+def test_other_bot_token_is_rejected():
+    fields = {"auth_date": str(int(time.time())), "user": json.dumps({"id": 1})}
+    assert verify(sign(fields, token="999:other")) is None
+
+
+def test_edited_field_is_rejected():
+    forged = init_data(telegram_id=1).replace("%22id%22%3A+1", "%22id%22%3A+2")
+    assert forged != init_data(telegram_id=1)
+    assert verify(forged) is None
+
+
+def test_missing_hash_or_user_is_rejected():
+    assert verify(urlencode({"auth_date": str(int(time.time())), "user": json.dumps({"id": 1})})) is None
+    assert verify(sign({"auth_date": str(int(time.time()))})) is None
+    assert verify("%%%") is None
+
+
+def test_expired_init_data_is_rejected():
+    stale = int(time.time()) - settings.AUTH_MAX_AGE - 10
+    assert verify(init_data(auth_date=stale)) is None
+    with override_settings(AUTH_MAX_AGE=0):
+        assert verify(init_data(auth_date=stale))["id"] == 555
+
+
+async def _requests(*steps):
+    """Status of GET /users/me for each (init_data, seconds to wait first)"""
+    engine = make_engine()
+    try:
+        await seed(engine, users=3, matches=0)
+        statuses = []
+        async with build_app(engine, user_id=None) as app, client_for(app) as client:
+            for value, wait in steps:
+                await asyncio.sleep(wait)
+                response = await client.get("/users/me", headers={"X-Telegram-Init-Data": value})
+                statuses.append(response.status_code)
+        return statuses
+    finally:
+        await engine.dispose()
+
+
+def test_requests_need_valid_init_data():
+    stale = init_data(telegram_id=901, auth_date=int(time.time()) - settings.AUTH_MAX_AGE - 10)
+    assert asyncio.run(_requests((init_data(telegram_id=900), 0), (stale, 0), ("hash=0", 0))) == [200, 401, 401]
+
+
+def test_cached_session_expires_with_its_init_data():
+    with override_settings(AUTH_MAX_AGE=2):
+        value = init_data(telegram_id=902)
+        # The second request comes from the session cache, the third is past auth_date + AUTH_MAX_AGE
+        assert asyncio.run(_requests((value, 0), (value, 0), (value, 2.1))) == [200, 200, 401]
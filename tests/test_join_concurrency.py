@@ -0,0 +1,81 @@
+"""Concurrent joins and leaves keep players_count equal to the roster, within max_players"""
+import asyncio
+import random
+from datetime import datetime
+
+from fastapi import Request
+from sqlalchemy import func, insert, select
+
+from benchmarks.common import build_app, client_for, make_engine, seed
+from app.auth import CurrentUser, get_current_user
+from app.models import Match, MatchPlayer, User
+
+USERS = 40
+MAX_PLAYERS = 10
+CREATOR = USERS  # never leaves: a creator leaving deletes the match
+
+
+async def _roster(engine):
+    async with engine.connect() as conn:
+        match = (await conn.execute(
+            select(Match.players_count, Match.max_players, Match.status).where(Match.id == 1)
+        )).one()
+        rows = (await conn.execute(
+            select(func.count()).select_from(MatchPlayer).where(MatchPlayer.match_id == 1)
+        )).scalar()
+    return match, rows
+
+
+def _assert_consistent(match, rows):
+    assert match.players_count == rows <= match.max_players
+    assert match.status == ("full" if rows == match.max_players else "open")
+
+
+async def _run(path):
+    # A file, not :memory:, so requests hold separate pooled connections
+    engine = make_engine("sqlite:///" + path)
+    try:
+        await seed(engine, users=USERS, matches=0)
+        now = datetime.utcnow()
+        async with engine.begin() as conn:
+            await conn.execute(insert(Match), [dict(
+                id=1, title="Match", stadium="Central", city="Пенджикент", date_time=now,
+                format="5x5", max_players=MAX_PLAYERS, players_count=1, status="open",
+                created_by=CREATOR, created_at=now,
+            )])
+            await conn.execute(insert(MatchPlayer), [dict(match_id=1, user_id=CREATOR, joined_at=now)])
+            users = {
+                user.id: CurrentUser.from_user(user)
+                for user in (await conn.execute(select(User))).all()
+            }
+
+        async with build_app(engine, user_id=None) as app, client_for(app) as client:
+            # Each request acts as the user named in its X-User header
+            async def as_header_user(request: Request):
+                return users[int(request.headers["X-User"])]
+
+            app.dependency_overrides[get_current_user] = as_header_user
+
+            async def call(action, user_id):
+                response = await client.post(f"/matches/1/{action}", headers={"X-User": str(user_id)})
+                assert response.status_code in (200, 400, 404), response.text
+                return response.status_code
+
+            # Everyone rushes the last nine slots at once
+            statuses = await asyncio.gather(*(call("join", user_id) for user_id in range(1, CREATOR)))
+            assert statuses.count(200) == MAX_PLAYERS - 1
+            _assert_consistent(*await _roster(engine))
+
+            # Then a mix of leaves and joins, several rounds of it
+            rnd = random.Random(7)
+            for _ in range(5):
+                await asyncio.gather(*(
+                    call(rnd.choice(("join", "leave")), user_id) for user_id in range(1, CREATOR)
+                ))
+                _assert_consistent(*await _roster(engine))
+    finally:
+        await engine.dispose()
+
+
+def test_concurrent_joins_and_leaves_keep_count_in_step(tmp_path):
+    asyncio.run(_run(str(tmp_path / "join.db")))
@@ -0,0 +1,109 @@
+"""429 from per-user budgets, before any pooled connection, and 503 from admission control"""
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import urlencode
+
+from fastapi import Request
+from sqlalchemy import event
+
+from benchmarks.common import build_app, client_for, make_engine, override_settings, seed
+from app.auth import get_current_user
+from app.config import settings
+from app.database import pool_wait
+
+
+def init_data(telegram_id: int) -> str:
+    fields = {"auth_date": str(int(time.time())), "user": json.dumps({"id": telegram_id, "first_name": "Limit"})}
+    check = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", settings.BOT_TOKEN.encode(), hashlib.sha256).digest()
+    return urlencode({**fields, "hash": hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()})
+
+
+async def _rate_limited(path):
+    # A file, so connections come from the metered queue pool
+    engine = make_engine("sqlite:///" + path)
+    checkouts = []
+    event.listen(engine.sync_engine, "checkout", lambda *args: checkouts.append(args))
+    try:
+        await seed(engine, users=3, matches=3)
+        results = []
+        with override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMIT_JOIN=1, RATE_LIMIT_BURST=2):
+            async with build_app(engine, user_id=None) as app, client_for(app) as client:
+                # Telegram ids unique to this test: buckets live in the process-wide state
+                for telegram_id in (7001, 7001, 7001, 7002):
+                    before = len(checkouts)
+                    response = await client.post(
+                        "/matches/1/leave", headers={"X-Telegram-Init-Data": init_data(telegram_id)}
+                    )
+                    results.append((response.status_code, response.headers.get("retry-after"),
+                                    len(checkouts) - before))
+        return results
+    finally:
+        await engine.dispose()
+
+
+def test_over_budget_is_429_without_a_checkout(tmp_path):
+    first, second, third, other = asyncio.run(_rate_limited(str(tmp_path / "limits.db")))
+    # Not on the roster: 404, but each attempt is charged
+    assert first[0] == second[0] == 404
+    status, retry_after, checkouts = third
+    assert (status, checkouts) == (429, 0)
+    assert int(retry_after) >= 1
+    # Another user has a bucket of their own
+    assert other[0] == 404
+
+
+async def _shed(scenario):
+    engine = make_engine()
+    try:
+        await seed(engine, users=3, matches=3)
+        async with build_app(engine) as app, client_for(app) as client:
+            return await scenario(app, client)
+    finally:
+        await engine.dispose()
+
+
+def test_long_pool_waits_shed_with_503():
+    async def scenario(app, client):
+        with override_settings(ADMISSION_MAX_POOL_WAIT_MS=5):
+            ticket = pool_wait.start()
+            try:
+                await asyncio.sleep(0.02)
+                shed = await client.get("/matches/")
+                health = await client.get("/health")
+            finally:
+                pool_wait.finish(ticket)
+            admitted = await client.get("/matches/")
+        return shed, health, admitted
+
+    shed, health, admitted = asyncio.run(_shed(scenario))
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == str(settings.ADMISSION_RETRY_AFTER)
+    assert health.status_code == 200
+    assert admitted.status_code == 200
+
+
+def test_requests_over_max_in_flight_shed_with_503():
+    async def scenario(app, client):
+        entered, release = asyncio.Event(), asyncio.Event()
+        user = app.dependency_overrides[get_current_user]
+
+        async def slow_user(request: Request):
+            entered.set()
+            await release.wait()
+            return await user()
+
+        app.dependency_overrides[get_current_user] = slow_user
+        with override_settings(ADMISSION_MAX_IN_FLIGHT=1):
+            held = asyncio.create_task(client.get("/matches/"))
+            await entered.wait()
+            shed = await client.get("/matches/")
+            release.set()
+            return await held, shed
+
+    held, shed = asyncio.run(_shed(scenario))
+    assert held.status_code == 200
+    assert shed.status_code == 503
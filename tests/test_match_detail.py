@@ -0,0 +1,43 @@
+"""GET /matches/{id} loads the match and its roster in one statement"""
+import asyncio
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from benchmarks.common import build_app, client_for, make_engine, seed
+from app.models import Match, MatchPlayer
+
+
+SQL_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+async def _queries_for_roster(size: int) -> int:
+    engine = make_engine()
+    try:
+        await seed(engine, users=30, matches=0)
+        now = datetime.utcnow()
+        async with engine.begin() as conn:
+            await conn.execute(insert(Match), [dict(
+                id=1, title="Match", stadium="Central", city="Пенджикент", date_time=now,
+                format="11x11", max_players=22, players_count=size,
+                status="full" if size >= 22 else "open", created_by=1, created_at=now,
+            )])
+            await conn.execute(insert(MatchPlayer), [
+                dict(match_id=1, user_id=user_id, joined_at=now) for user_id in range(1, size + 1)
+            ])
+
+        async with build_app(engine) as app, client_for(app) as client:
+            response = await client.get("/matches/1")
+        assert response.status_code == 200, response.text
+        assert len(response.json()["players"]) == size
+        # Counted by app.instrumentation's middleware for this request
+        return int(SQL_QUERIES.search(response.headers["server-timing"]).group(1))
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.parametrize("size", [8, 22])
+def test_match_detail_is_one_query(size):
+    assert asyncio.run(_queries_for_roster(size)) == 1
@@ -0,0 +1,82 @@
+"""Keyset cursors walk a list exactly once, and forged cursors are refused"""
+import asyncio
+import base64
+import json
+
+import pytest
+from sqlalchemy import select, update
+
+from benchmarks.common import build_app, client_for, make_engine, seed
+from app.models import Match, MatchPlayer
+from app.pagination import NEXT_CURSOR_HEADER, encode_cursor
+
+
+async def _walk(client, path, params):
+    """Ids of every page of ``path``, following X-Next-Cursor"""
+    ids, cursor = [], None
+    while True:
+        response = await client.get(path, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        ids.extend(item["id"] for item in response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return ids
+
+
+async def _round_trips():
+    engine = make_engine()
+    try:
+        await seed(engine, users=5, matches=60)
+        async with engine.begin() as conn:
+            # Ties on date_time: the id half of the key must break them
+            first = (await conn.execute(select(Match.date_time).where(Match.id == 1))).scalar()
+            await conn.execute(update(Match).where(Match.id <= 12).values(date_time=first))
+            expected = (await conn.execute(select(Match.id).order_by(Match.date_time, Match.id))).scalars().all()
+            history = (await conn.execute(
+                select(Match.id).join(MatchPlayer, MatchPlayer.match_id == Match.id)
+                .where(MatchPlayer.user_id == 1).order_by(Match.date_time.desc(), Match.id.desc())
+            )).scalars().all()
+
+        assert len(history) > 5  # several pages
+        async with build_app(engine) as app, client_for(app) as client:
+            assert await _walk(client, "/matches/", {"status": "", "limit": 7}) == expected
+            assert await _walk(client, "/users/1/matches", {"limit": 5}) == history
+    finally:
+        await engine.dispose()
+
+
+def test_cursor_pages_cover_the_list_once():
+    asyncio.run(_round_trips())
+
+
+def _raw(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+TAMPERED = [
+    "not a cursor!",
+    _raw({"date_time": "2024-01-01T00:00:00", "id": 1}),
+    _raw(["2024-01-01T00:00:00"]),
+    _raw(["2024-01-01T00:00:00", 1, 2]),
+    _raw(["yesterday", 1]),
+    _raw(["2024-01-01T00:00:00", "one"]),
+    encode_cursor(["2024-01-01T00:00:00", None]),
+]
+
+
+async def _tampered(path, cursor):
+    engine = make_engine()
+    try:
+        await seed(engine, users=5, matches=10)
+        async with build_app(engine) as app, client_for(app) as client:
+            return await client.get(path, params={"cursor": cursor})
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.parametrize("path", ["/matches/", "/users/1/matches"])
+@pytest.mark.parametrize("cursor", TAMPERED)
+def test_tampered_cursor_is_400(path, cursor):
+    response = asyncio.run(_tampered(path, cursor))
+    assert response.status_code == 400, response.text
+    assert response.json() == {"detail": "Invalid cursor"}
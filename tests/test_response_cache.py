@@ -0,0 +1,63 @@
+"""Cached GETs: ETag revalidation answers 304, and writes invalidate what they change"""
+import asyncio
+import re
+
+from sqlalchemy import select
+
+from benchmarks.common import build_app, client_for, make_engine, seed
+from app.models import Match, MatchPlayer
+
+SQL_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def queries(response) -> int:
+    return int(SQL_QUERIES.search(response.headers["server-timing"]).group(1))
+
+
+async def _run():
+    engine = make_engine()
+    try:
+        await seed(engine, users=30, matches=20)
+        async with engine.connect() as conn:
+            # An open match user 1 is not on, so user 1 can join it
+            joined = select(MatchPlayer.match_id).where(MatchPlayer.user_id == 1)
+            match_id = (await conn.execute(
+                select(Match.id).where(Match.status == "open", Match.id.not_in(joined)).order_by(Match.id)
+            )).scalars().first()
+        assert match_id is not None
+
+        async with build_app(engine, cache=True) as app, client_for(app) as client:
+            detail = f"/matches/{match_id}"
+            first = await client.get(detail)
+            assert first.status_code == 200
+            etag = first.headers["etag"]
+
+            # Served from the cache: no SQL, and 304 when the client has it
+            again = await client.get(detail)
+            assert (again.status_code, again.headers["etag"], queries(again)) == (200, etag, 0)
+            revalidated = await client.get(detail, headers={"If-None-Match": f'"other", {etag}'})
+            assert (revalidated.status_code, revalidated.content, queries(revalidated)) == (304, b"", 0)
+            assert (await client.get(detail, headers={"If-None-Match": '"other"'})).status_code == 200
+
+            listing = await client.get("/matches/", params={"status": "", "limit": 100})
+            list_etag = listing.headers["etag"]
+
+            # A join changes the match and every list showing it
+            assert (await client.post(f"{detail}/join")).status_code == 200
+            changed = await client.get(detail, headers={"If-None-Match": etag})
+            assert changed.status_code == 200
+            assert changed.headers["etag"] != etag
+            assert queries(changed) > 0
+            assert changed.json()["players_count"] == first.json()["players_count"] + 1
+
+            relisted = await client.get(
+                "/matches/", params={"status": "", "limit": 100}, headers={"If-None-Match": list_etag}
+            )
+            assert relisted.status_code == 200
+            assert relisted.headers["etag"] != list_etag
+    finally:
+        await engine.dispose()
+
+
+def test_etag_revalidation_and_invalidation_on_write():
+    asyncio.run(_run())